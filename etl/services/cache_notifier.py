@@ -0,0 +1,50 @@
+import json
+
+from redis import Redis
+from redis.exceptions import RedisError
+
+from etl.utils.backoff_decorator import backoff
+from etl.utils.etl_logging import logger
+from etl.utils.settings import redis_settings
+
+
+class CacheInvalidationPublisher:
+    """Publish ids of loaded entities for the API to drop its caches."""
+
+    def __init__(self, settings=redis_settings):
+        self.settings = settings
+        self.stream = settings.CACHE_INVALIDATION_STREAM
+        self.client = Redis(
+            host=settings.REDIS_HOST, port=settings.REDIS_PORT
+        )
+
+    def publish(self, entity: str, ids: list[str]) -> None:
+        """Publish an invalidation event, log the error if Redis is down.
+
+        A lost event only means the cached data lives until its TTL,
+        so it must not stop the load.
+        """
+
+        if not ids:
+            return
+
+        try:
+            self._xadd(entity, ids)
+        except RedisError as exc:
+            logger.error(
+                'Failed to publish cache invalidation of %d %s entities: %s',
+                len(ids), entity, exc
+            )
+
+    @backoff(exception=RedisError, max_attempts=3)
+    def _xadd(self, entity: str, ids: list[str]) -> None:
+        self.client.xadd(
+            self.stream,
+            {'entity': entity, 'ids': json.dumps(ids)},
+            maxlen=self.settings.CACHE_INVALIDATION_STREAM_MAXLEN,
+            approximate=True
+        )
+
+    def close(self):
+        self.client.close()
+        logger.info('Redis connection closed.')
@@ -73,6 +73,27 @@ class ElasticsearchLoader:
                 else:
                     logger.warning('No schema for index "%s".', index_name)
 
+    def scan_films(self, fields: list[str], size: int):
+        """Generate batches of the fields given of all indexed films."""
+
+        batch: list = []
+
+        for hit in helpers.scan(
+            client=self.client,
+            index=self.film_index_name,
+            query={'query': {'match_all': {}}},
+            _source=fields,
+            size=size
+        ):
+            batch.append(hit['_source'])
+
+            if len(batch) == size:
+                yield batch
+                batch = []
+
+        if batch:
+            yield batch
+
     @backoff(exception=ConnectionError)
     def transfer_films(self, actions) -> None:
         """Add data packets to Elasticsearch."""
@@ -0,0 +1,113 @@
+import json
+
+from redis import Redis
+from redis.exceptions import RedisError
+
+from etl.utils.backoff_decorator import backoff
+from etl.utils.etl_logging import logger
+from etl.utils.settings import redis_settings
+from src.utils.film_ranking import (FILM_GENRES_KEY, READY_KEY,
+                                    SHORT_FILMS_KEY, ranking_key)
+
+# Films without a rating come last, as in ElasticSearch.
+NO_RATING_SCORE = '-inf'
+
+
+class FilmRankingUpdater:
+    """Keep the Redis rankings of films by rating for the API."""
+
+    def __init__(self, settings=redis_settings):
+        self.settings = settings
+        self.client = Redis(
+            host=settings.REDIS_HOST, port=settings.REDIS_PORT
+        )
+
+    def is_ready(self) -> bool:
+        """Check whether the rankings hold all of the indexed films."""
+
+        try:
+            return bool(self.client.exists(READY_KEY))
+        except RedisError as exc:
+            # Not to start a build while Redis is down.
+            logger.error('Failed to check the film rankings: %s', exc)
+            return True
+
+    def build(self, batches) -> None:
+        """Rank the batches of films given, all of the indexed ones,
+        and mark the rankings as ready for the API.
+        """
+
+        try:
+            for films in batches:
+                self._update(films)
+
+            self.client.set(READY_KEY, 1)
+        except RedisError as exc:
+            logger.error('Failed to build the film rankings: %s', exc)
+        else:
+            logger.info('Film rankings built.')
+
+    def update(self, films: list[dict]) -> None:
+        """Rank the loaded films anew.
+
+        If Redis is down, the rankings are marked as not ready, so that
+        the API lists films from Elasticsearch until they are rebuilt.
+        """
+
+        try:
+            self._update(films)
+        except RedisError as exc:
+            logger.error(
+                'Failed to rank %d films, dropping the rankings: %s',
+                len(films), exc
+            )
+            self._drop_ready()
+
+    @backoff(exception=RedisError, max_attempts=3)
+    def _update(self, films: list[dict]) -> None:
+        if not films:
+            return
+
+        film_ids = [str(film['id']) for film in films]
+        old_genres = self.client.hmget(FILM_GENRES_KEY, film_ids)
+
+        # The ETL is the only writer, the API never sees a film
+        # half moved between the genres.
+        pipe = self.client.pipeline(transaction=True)
+
+        for film_id, film, old in zip(film_ids, films, old_genres):
+            rating = film.get('imdb_rating')
+            score = rating if rating is not None else NO_RATING_SCORE
+            genres = {
+                str(genre['id']) for genre in film.get('genres') or []
+            }
+            dropped = {
+                genre_id for genre_id in (old or b'').decode().split(',')
+                if genre_id
+            } - genres
+
+            pipe.hset(SHORT_FILMS_KEY, film_id, json.dumps({
+                'id': film_id,
+                'title': film.get('title'),
+                'imdb_rating': rating,
+            }))
+            pipe.hset(FILM_GENRES_KEY, film_id, ','.join(sorted(genres)))
+            pipe.zadd(ranking_key(), {film_id: score})
+
+            for genre_id in dropped:
+                pipe.zrem(ranking_key(genre_id), film_id)
+
+            for genre_id in genres:
+                pipe.zadd(ranking_key(genre_id), {film_id: score})
+
+        pipe.execute()
+
+    def _drop_ready(self) -> None:
+        try:
+            self.client.delete(READY_KEY)
+        except RedisError as exc:
+            logger.error('Failed to drop the film rankings: %s', exc)
+
+    def close(self):
+        self.client.close()
+        logger.info('Redis connection closed.')
@@ -1,13 +1,16 @@
 import time
+import uuid
 from datetime import datetime
 from pathlib import Path
 
+from etl.services.cache_notifier import CacheInvalidationPublisher
 from etl.services.es_loader import ElasticsearchLoader
+from etl.services.film_ranking import FilmRankingUpdater
 from etl.services.postgres_extractor import PostgresExtractor
 from etl.utils import models_validation
 from etl.utils.etl_logging import logger
 from etl.utils.etl_state import JsonFileStorage, State
-from etl.utils.settings import etl_settings
+from etl.utils.settings import etl_settings, redis_settings
 
 
 class ETL:
@@ -18,6 +21,8 @@ class ETL:
         self.state = state
         self.pg_client = None
         self.es_client = None
+        self.cache_notifier = None
+        self.film_ranking = None
         self.states = None
 
     def __enter__(self):
@@ -29,6 +34,12 @@ class ETL:
         try:
             self.pg_client = PostgresExtractor()
             self.es_client = ElasticsearchLoader()
+
+            if redis_settings.CACHE_INVALIDATION_ENABLED:
+                self.cache_notifier = CacheInvalidationPublisher()
+
+            if redis_settings.FILM_RANKING_ENABLED:
+                self.film_ranking = FilmRankingUpdater()
         except Exception as exc:
             self.state.set_state('etl_process', 'stopped')
             raise exc
@@ -47,6 +58,12 @@ class ETL:
         if self.pg_client is not None:
             self.pg_client.close()
 
+        if self.cache_notifier is not None:
+            self.cache_notifier.close()
+
+        if self.film_ranking is not None:
+            self.film_ranking.close()
+
         logger.info('ETL process stopped.')
         self.state.set_state('etl_process', 'stopped')
         logger.info('Load paused for %s seconds', etl_settings.LOAD_PAUSE)
@@ -109,16 +126,38 @@ class ETL:
 
     def extract_persons(self) -> tuple:
         """
-        Retrieve all new or modified data (persons) from PostgreSQL.
+        Retrieve all new or modified data (persons with their films
+        and roles) from PostgreSQL, including persons whose films
+        or roles have been modified.
         Return the number of unique person ids and person instances.
         """
 
         modified_person2: str = self.states.get('person2') or datetime.min
+        modified_person_film: str = (
+            self.states.get('person_film') or datetime.min
+        )
+        last_person_film_id: str = (
+            self.states.get('person_film_id') or str(uuid.UUID(int=0))
+        )
         persons = self.pg_client.fetch_persons(timestamp=modified_person2)
 
         if persons:
             self.states['person2'] = f'{persons[-1]["modified"]}'
 
+        roles = self.pg_client.fetch_persons_by_modified_filmworks(
+            timestamp=modified_person_film, last_id=last_person_film_id
+        )
+
+        if roles:
+            self.states['person_film'] = f'{roles[-1].modified}'
+            self.states['person_film_id'] = f'{roles[-1].id}'
+            extracted = {str(person['id']) for person in persons}
+            persons.extend(
+                self.pg_client.fetch_persons_by_id(ids=tuple(
+                    {str(role.person_id) for role in roles} - extracted
+                ))
+            )
+
         return len(persons), persons
 
     def extract_genres(self) -> tuple:
@@ -212,16 +251,29 @@ class ETL:
     def transform_persons(self, modified_data: list):
         """
         Transform extracted person instances for Elasticsearch.
-        Generate a list of unique persons.
+        Generate a list of unique persons with their films
+        and the roles they played in each film.
         """
 
         if modified_data is not None:
             transformed_data: list = []
 
             for person in modified_data:
+                films: dict[str, list[str]] = {}
+
+                for film in person.get('films') or []:
+                    roles = films.setdefault(str(film.get('id')), [])
+
+                    if film.get('role') not in roles:
+                        roles.append(film.get('role'))
+
                 new_person = {
                     'id': person.get('id'),
-                    'full_name': person.get('full_name')
+                    'full_name': person.get('full_name'),
+                    'films': [
+                        {'id': film_id, 'roles': roles}
+                        for film_id, roles in films.items()
+                    ]
                 }
                 transformed_data.append(new_person)
 
@@ -257,11 +309,14 @@ class ETL:
             actions.append(data)
             if len(actions) == self.conf.LIMIT:
                 self.es_client.transfer_films(actions=actions)
+                self.rank_films(actions)
+                self.invalidate_cache('film', actions)
                 actions.clear()
         else:
             if actions:
                 self.es_client.transfer_films(actions=actions)
-                pass
+                self.rank_films(actions)
+                self.invalidate_cache('film', actions)
 
     def load_persons(self, transformed_data):
         """Generate person packets and upload them to Elasticsearch."""
@@ -272,11 +327,12 @@ class ETL:
             actions.append(data)
             if len(actions) == self.conf.LIMIT:
                 self.es_client.transfer_persons(actions=actions)
+                self.invalidate_cache('person', actions)
                 actions.clear()
         else:
             if actions:
                 self.es_client.transfer_persons(actions=actions)
-                pass
+                self.invalidate_cache('person', actions)
 
     def load_genres(self, transformed_data):
         """Generate genre packets and upload them to Elasticsearch."""
@@ -287,11 +343,38 @@ class ETL:
             actions.append(data)
             if len(actions) == self.conf.LIMIT:
                 self.es_client.transfer_genres(actions=actions)
+                self.invalidate_cache('genre', actions)
                 actions.clear()
         else:
             if actions:
                 self.es_client.transfer_genres(actions=actions)
-                pass
+                self.invalidate_cache('genre', actions)
+
+    def build_film_ranking(self) -> None:
+        """Rank all indexed films unless the rankings are complete."""
+
+        if self.film_ranking is None or self.film_ranking.is_ready():
+            return
+
+        logger.info('Building film rankings from Elasticsearch.')
+        self.film_ranking.build(self.es_client.scan_films(
+            fields=['id', 'title', 'imdb_rating', 'genres'],
+            size=self.conf.LIMIT
+        ))
+
+    def rank_films(self, actions: list) -> None:
+        """Update the ratings and genres of the films in the rankings."""
+
+        if self.film_ranking is not None:
+            self.film_ranking.update(actions)
+
+    def invalidate_cache(self, entity: str, actions: list) -> None:
+        """Notify the API that the cached entities are outdated."""
+
+        if self.cache_notifier is not None:
+            self.cache_notifier.publish(
+                entity, [str(action['id']) for action in actions]
+            )
 
     def save_state(self):
         """Save the last ETL state."""
@@ -311,6 +394,9 @@ def load_to_es():
     while True:
         with ETL(state=State(storage=storage)) as etl:
 
+            # rankings of the films indexed before they were kept
+            etl.build_film_ranking()
+
             # films ETL process
             logger.info('Starting extraction of films from PostgreSQL.')
             number_data, modified_data = etl.extract_films()
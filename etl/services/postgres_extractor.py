@@ -161,6 +161,40 @@ class PostgresExtractor:
 
         return []
 
+    def fetch_persons_by_modified_filmworks(
+        self,
+        timestamp: datetime,
+        last_id: str
+    ) -> list:
+        """Return roles of persons whose films or roles have been
+        modified after the role given by its time and id.
+        """
+
+        roles = self.execute_query(
+            query=queries.get_persons_by_modified_filmworks(
+                timestamp=timestamp, last_id=last_id
+            )
+        )
+
+        return [
+            models_validation.PGPersonRoleModel(**role) for role in roles
+        ]
+
+    def fetch_persons_by_id(self, ids: tuple) -> list:
+        """Return a list with persons data by ids."""
+
+        if not ids:
+            return []
+
+        persons = self.execute_query(
+            query=queries.get_persons_by_id(ids=ids)
+        )
+
+        return [
+            models_validation.PGPFullersonModel(**person).dict()
+            for person in persons
+        ]
+
     def fetch_genres_with_films(self, timestamp: datetime) -> list[tuple]:
         """Return genres' instances."""
 
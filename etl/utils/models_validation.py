@@ -36,6 +36,12 @@ class PGPersonFilmworkModel(UUIDMixin, ModifiedMixin):
     """A model for movies with specific persons."""
 
 
+class PGPersonRoleModel(UUIDMixin, ModifiedMixin):
+    """A model for changed roles of persons in movies."""
+
+    person_id: uuid.UUID
+
+
 class ESPersonModel(UUIDMixin):
     """A model for Elasticsearch person instances."""
 
@@ -46,10 +52,17 @@ class ESGenreAndFilmModel(UUIDMixin):
     name: str
 
 
+class ESPersonFilmModel(UUIDMixin):
+    """A model for Elasticsearch person's film and roles instances."""
+
+    roles: list[str]
+
+
 class ESFullPersonModel(UUIDMixin):
     """A model for Elasticsearch full person instances."""
 
     full_name: str
+    films: list[ESPersonFilmModel] = []
 
 
 class ESFilmworkModel(UUIDMixin):
@@ -71,7 +84,14 @@ class PGGenreAndFilmModel(UUIDMixin, ModifiedMixin):
     description: str | None
 
 
+class PGPersonFilmRoleModel(UUIDMixin):
+    """A model for PostgreSQL person's role in a film."""
+
+    role: str
+
+
 class PGPFullersonModel(UUIDMixin, ModifiedMixin):
     """A model for PostgreSQL full person instances."""
 
     full_name: str
+    films: list[PGPersonFilmRoleModel] = []
@@ -19,16 +19,74 @@ def get_modified_genres(timestamp: datetime) -> str:
 
 
 def get_persons(timestamp: datetime) -> str:
-    """A query to get persons modified."""
+    """A query to get persons modified along with their films and roles."""
 
     return """
-            SELECT person.id, person.full_name, person.modified
+            SELECT
+                person.id,
+                person.full_name,
+                person.modified,
+                COALESCE(
+                    JSONB_AGG(DISTINCT jsonb_build_object(
+                        'id', pfw.film_work_id, 'role', pfw.role
+                    )) FILTER (WHERE pfw.film_work_id IS NOT NULL),
+                    '[]'
+                ) AS films
             FROM content.person person
+            LEFT JOIN content.person_film_work pfw ON pfw.person_id = person.id
             WHERE person.modified > '{}'
+            GROUP BY person.id
             ORDER BY person.modified DESC;
         """.format(timestamp)
 
 
+def get_persons_by_id(ids: tuple) -> str:
+    """A query to get persons by ids along with their films and roles."""
+
+    condition = f'IN {tuple(ids)}' if len(ids) > 1 else f"= '{ids[0]}'"
+
+    return """
+            SELECT
+                person.id,
+                person.full_name,
+                person.modified,
+                COALESCE(
+                    JSONB_AGG(DISTINCT jsonb_build_object(
+                        'id', pfw.film_work_id, 'role', pfw.role
+                    )) FILTER (WHERE pfw.film_work_id IS NOT NULL),
+                    '[]'
+                ) AS films
+            FROM content.person person
+            LEFT JOIN content.person_film_work pfw ON pfw.person_id = person.id
+            WHERE person.id {}
+            GROUP BY person.id;
+        """.format(condition)
+
+
+def get_persons_by_modified_filmworks(
+    timestamp: datetime,
+    last_id: str
+) -> str:
+    """
+    A query to get persons whose filmography changed during the given
+    period of time: their films were modified or their roles added.
+    Roles are paged by the time of the change and their id, as many
+    of them change at once with a film.
+    """
+
+    return """
+        SELECT
+            pfw.id,
+            pfw.person_id,
+            GREATEST(fw.modified, pfw.created) AS modified
+        FROM content.person_film_work pfw
+        JOIN content.film_work fw ON fw.id = pfw.film_work_id
+        WHERE (GREATEST(fw.modified, pfw.created), pfw.id) > ('{}', '{}')
+        ORDER BY modified, pfw.id
+        LIMIT {};
+        """.format(timestamp, last_id, etl_settings.LIMIT)
+
+
 def get_modified_persons(timestamp: datetime) -> str:
     """
     A query to get persons which were
@@ -44,6 +44,20 @@ class ESSettings(BaseSettings):
         env_file = config.BASE_DIR / '.env'
 
 
+class RedisSettings(BaseSettings):
+    """Settings for Redis cache invalidation and film rankings."""
+
+    REDIS_HOST: str = conf.REDIS_HOST
+    REDIS_PORT: int = conf.REDIS_PORT
+    CACHE_INVALIDATION_ENABLED: bool = conf.CACHE_INVALIDATION_ENABLED
+    CACHE_INVALIDATION_STREAM: str = conf.CACHE_INVALIDATION_STREAM
+    CACHE_INVALIDATION_STREAM_MAXLEN: int = 10_000
+    FILM_RANKING_ENABLED: bool = conf.FILM_RANKING_ENABLED
+
+    class Config:
+        env_file = config.BASE_DIR / '.env'
+
+
 class ETLSettings(BaseSettings):
     """Settings for ETL pipeline."""
 
@@ -58,4 +72,5 @@ class ETLSettings(BaseSettings):
 
 pg_settings = PGSettings()
 es_settings = ESSettings()
+redis_settings = RedisSettings()
 etl_settings = ETLSettings()
@@ -0,0 +1,112 @@
+import secrets
+from http import HTTPStatus
+from typing import Annotated
+
+from fastapi import APIRouter, Depends, Header, HTTPException, Query
+from fastapi.responses import PlainTextResponse
+
+from api.v1.schemes import ProfilerStatus
+from core.config import settings
+from core.profiler import profiler
+from utils.constants import ADMIN_TOKEN_REQUIRED, PROFILER_RUNNING
+
+
+async def verify_admin_token(
+    x_admin_token: Annotated[str | None, Header()] = None
+) -> None:
+    """Allow requests with the admin token only.
+
+    The admin endpoints are off until ADMIN_TOKEN is set.
+    """
+
+    if not settings.ADMIN_TOKEN or not x_admin_token or not (
+        secrets.compare_digest(x_admin_token, settings.ADMIN_TOKEN)
+    ):
+        raise HTTPException(
+            status_code=HTTPStatus.FORBIDDEN, detail=ADMIN_TOKEN_REQUIRED
+        )
+
+
+router = APIRouter(dependencies=[Depends(verify_admin_token)])
+
+
+def _status() -> ProfilerStatus:
+    return ProfilerStatus(
+        running=profiler.running,
+        started_at=profiler.started_at,
+        samples=profiler.sample_count(),
+    )
+
+
+@router.post(
+    '/profiler',
+    response_model=ProfilerStatus,
+    summary='Start the sampling profiler'
+)
+async def start_profiler(
+    seconds: Annotated[
+        int,
+        Query(
+            description='Profiling time window',
+            ge=1,
+            le=settings.PROFILER_MAX_DURATION_SECONDS
+        )
+    ] = 30
+) -> ProfilerStatus:
+    """
+    Start sampling the worker's event loop for the time window given:
+
+    - **running**: whether the profiler is sampling
+    - **started_at**: Unix time the profiling started at
+    - **samples**: number of stacks sampled
+    """
+
+    if not profiler.start(seconds):
+        raise HTTPException(
+            status_code=HTTPStatus.CONFLICT, detail=PROFILER_RUNNING
+        )
+
+    return _status()
+
+
+@router.get(
+    '/profiler',
+    response_model=ProfilerStatus,
+    summary='Sampling profiler state'
+)
+async def profiler_status() -> ProfilerStatus:
+    """Return the state of the worker's sampling profiler."""
+
+    return _status()
+
+
+@router.delete(
+    '/profiler',
+    response_model=ProfilerStatus,
+    summary='Stop the sampling profiler'
+)
+async def stop_profiler() -> ProfilerStatus:
+    """Stop the worker's sampling profiler before its time window ends."""
+
+    profiler.stop()
+
+    return _status()
+
+
+@router.get(
+    '/profiler/flamegraph',
+    response_class=PlainTextResponse,
+    summary='Download the profile'
+)
+async def download_profile() -> PlainTextResponse:
+    """
+    Return the stacks sampled in the folded format
+    of flamegraph.pl, speedscope and inferno.
+    """
+
+    return PlainTextResponse(
+        profiler.folded(),
+        headers={
+            'Content-Disposition': 'attachment; filename="profile.folded"'
+        },
+    )
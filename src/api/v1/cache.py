@@ -0,0 +1,33 @@
+from fastapi import APIRouter
+
+from api.v1.schemes import CacheStats
+from db.local_cache import local_cache
+from db.redis import stale_stats
+
+router = APIRouter()
+
+
+@router.get(
+    '/stats',
+    response_model=CacheStats,
+    summary='Cache statistics'
+)
+async def cache_stats() -> CacheStats:
+    """
+    Return counters of the worker's caches:
+
+    - **enabled**: whether the in-process cache is turned on
+    - **entries**: number of cached objects
+    - **bytes**: total size of cached payloads
+    - **hits**: number of lookups served from the cache
+    - **misses**: number of lookups passed to Redis
+    - **evictions**: number of objects evicted to fit the bounds
+    - **stale_served**: number of stale objects served while refreshing
+    - **stale_if_error_served**: number of stale objects served
+      because ElasticSearch failed
+    """
+
+    if local_cache is None:
+        return CacheStats(enabled=False, **stale_stats)
+
+    return CacheStats(enabled=True, **local_cache.stats(), **stale_stats)
@@ -2,11 +2,17 @@ from http import HTTPStatus
 from typing import Annotated
 from uuid import UUID
 
-from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi import (APIRouter, BackgroundTasks, Depends, HTTPException,
+                     Query, Request)
+from fastapi.responses import ORJSONResponse, Response
 
-from api.v1.schemes import FilmFull, FilmList
+from api.v1.schemes import FilmBatch, FilmFull, FilmList, FilmShort
+from core.config import settings
 from services.film import FilmService, get_film_service
-from utils.constants import FILM_NOT_FOUND
+from services.response_cache import response_cache
+from utils.constants import FILM_NOT_FOUND, INVALID_CURSOR
+from utils.cursor import InvalidCursorError, next_page_link
+from utils.fields import FieldsQuery, include_fields, include_results
 from utils.paginator_page_size_calc import get_page_size
 
 router = APIRouter()
@@ -18,6 +24,7 @@ router = APIRouter()
     summary='List of films'
 )
 async def filmlist(
+    request: Request,
     page_number: Annotated[
         int, Query(description='Pagination page number', ge=1)
     ] = 1,
@@ -25,19 +32,58 @@ async def filmlist(
         int, Query(description='Pagination page size', ge=1)
     ] = 20,
     genre: Annotated[UUID, Query(description='Search by genre id')] = None,
+    cursor: Annotated[
+        str, Query(description="Pagination cursor, '*' for the first page")
+    ] = None,
+    fields: tuple[str, ...] | None = Depends(FieldsQuery(FilmShort)),
     film_service: FilmService = Depends(get_film_service)
-) -> FilmList:
+) -> FilmList | Response:
     """
     Return list of films with parameters:
 
     - **total**: total number of all films in database
-    - **page**: current page number
+    - **page**: current page number, empty in cursor mode
     - **size**: size of page
     - **prev**: link to previous page
     - **next**: link to next page
+    - **next_cursor**: cursor of the next page in cursor mode
     - **results**: list of film information
     """
 
+    if cursor is not None:
+        try:
+            total, filmlist, next_cursor = (
+                await film_service.get_films_by_cursor(
+                    cursor=cursor, size=page_size, genre=genre
+                )
+            )
+        except InvalidCursorError:
+            raise HTTPException(
+                status_code=HTTPStatus.BAD_REQUEST,
+                detail=INVALID_CURSOR
+            )
+
+        return ORJSONResponse(FilmList(
+            total=total,
+            page=None,
+            size=len(filmlist),
+            prev=None,
+            next=next_page_link(
+                '/films', next_cursor, genre=genre, page_size=page_size
+            ),
+            next_cursor=next_cursor,
+            results=[{
+                "id": film.id,
+                "title": film.title,
+                "imdb_rating": film.imdb_rating
+            } for film in filmlist]
+        ).dict(include=include_results(FilmList, fields)))
+
+    cached = await response_cache.get(request)
+
+    if cached is not None:
+        return cached
+
     total, filmlist = await film_service.get_films(
         page=page_number, size=page_size, genre=genre
     )
@@ -57,7 +103,7 @@ async def filmlist(
         )
         size = get_page_size(page_number, total, page_size, next)
 
-    return FilmList(
+    return await response_cache.render(request, FilmList(
         total=total,
         page=page_number,
         size=size,
@@ -68,31 +114,76 @@ async def filmlist(
             "title": film.title,
             "imdb_rating": film.imdb_rating
         } for film in filmlist] if total else []
-    )
+    ), include=include_results(FilmList, fields))
 
 
 @router.get('/search', response_model=FilmList, summary='Film search')
 async def film_search(
+        request: Request,
         query: Annotated[str, Query(description='Film search query')],
+        background_tasks: BackgroundTasks,
         page_number: Annotated[
             int, Query(description='Pagination page number', ge=1)
         ] = 1,
         page_size: Annotated[
             int, Query(description='Pagination page size', ge=1)
         ] = 20,
+        cursor: Annotated[
+            str, Query(description="Pagination cursor, '*' for the first page")
+        ] = None,
+        fields: tuple[str, ...] | None = Depends(FieldsQuery(FilmShort)),
         film_service: FilmService = Depends(get_film_service)
-) -> FilmList:
+) -> FilmList | Response:
     """
     Return list of films by query:
 
     - **total**: total number of all films in database
-    - **page**: current page number
+    - **page**: current page number, empty in cursor mode
     - **size**: size of page
     - **prev**: link to previous page
     - **next**: link to next page
+    - **next_cursor**: cursor of the next page in cursor mode
     - **results**: list of film information
     """
 
+    if cursor is not None:
+        try:
+            total, filmlist, next_cursor = (
+                await film_service.search_films_by_cursor(
+                    cursor=cursor, size=page_size, query=query
+                )
+            )
+        except InvalidCursorError:
+            raise HTTPException(
+                status_code=HTTPStatus.BAD_REQUEST,
+                detail=INVALID_CURSOR
+            )
+
+        return ORJSONResponse(FilmList(
+            total=total,
+            page=None,
+            size=len(filmlist),
+            prev=None,
+            next=next_page_link(
+                '/films/search', next_cursor, query=query, page_size=page_size
+            ),
+            next_cursor=next_cursor,
+            results=[{
+                "id": film.id,
+                "title": film.title,
+                "imdb_rating": film.imdb_rating
+            } for film in filmlist]
+        ).dict(include=include_results(FilmList, fields)))
+
+    if page_number == 1:
+        # Not to delay the response with a Redis write.
+        background_tasks.add_task(film_service.count_search_query, query)
+
+    cached = await response_cache.get(request)
+
+    if cached is not None:
+        return cached
+
     total, filmlist = await film_service.search_films(
         query=query, page=page_number, size=page_size
     )
@@ -113,7 +204,7 @@ async def film_search(
 
         size = get_page_size(page_number, total, page_size, next)
 
-    return FilmList(
+    return await response_cache.render(request, FilmList(
         total=total,
         page=page_number,
         size=size,
@@ -124,14 +215,49 @@ async def film_search(
             "title": film.title,
             "imdb_rating": film.imdb_rating
         } for film in filmlist] if total else []
-    )
+    ), include=include_results(FilmList, fields))
+
+
+@router.get('/batch', response_model=FilmBatch, summary='Films by ids')
+async def film_batch(
+    request: Request,
+    ids: Annotated[
+        list[str],
+        Query(description='Film ids', min_items=1,
+              max_items=settings.BATCH_MAX_IDS)
+    ],
+    fields: tuple[str, ...] | None = Depends(FieldsQuery(FilmFull)),
+    film_service: FilmService = Depends(get_film_service)
+) -> FilmBatch | Response:
+    """
+    Return information on several films at once:
+
+    - **results**: list of film information in the order of ids
+    - **not_found**: ids of films not found
+    """
+
+    cached = await response_cache.get(request)
+
+    if cached is not None:
+        return cached
+
+    film_ids = list(dict.fromkeys(ids))
+    films = await film_service.get_by_ids(film_ids)
+    found = {film.id for film in films}
+
+    return await response_cache.render(request, FilmBatch(
+        results=films,
+        not_found=[film_id for film_id in film_ids if film_id not in found],
+    ), include=include_results(FilmBatch, fields))
 
 
 @router.get('/{film_id}', response_model=FilmFull, summary='Film detail')
 async def film_details(
+    request: Request,
     film_id: str,
+    fields: tuple[str, ...] | None = Depends(FieldsQuery(FilmFull)),
     film_service: FilmService = Depends(get_film_service)
-) -> FilmFull:
+) -> FilmFull | Response:
     """
     Return film information:
 
@@ -142,13 +268,22 @@ async def film_details(
     - **directors**: film directors
     """
 
-    film = await film_service.get_by_id(film_id)
+    cached = await response_cache.get(request)
+
+    if cached is not None:
+        return cached
+
+    film = await film_service.get_by_id(film_id, fields)
     if not film:
         raise HTTPException(
             status_code=HTTPStatus.NOT_FOUND,
             detail=FILM_NOT_FOUND
         )
-    return FilmFull(
+    if fields is not None:
+        return await response_cache.render(
+            request, FilmFull.construct(**film.dict()), include_fields(fields)
+        )
+    return await response_cache.render(request, FilmFull(
         id=film.id,
         title=film.title,
         imdb_rating=film.imdb_rating,
@@ -157,4 +292,4 @@ async def film_details(
         actors=film.actors,
         writers=film.writers,
         directors=film.directors,
-    )
+    ))
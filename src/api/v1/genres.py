@@ -1,37 +1,75 @@
 from http import HTTPStatus
 from typing import Annotated
 
-from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from fastapi.responses import Response
 from utils.paginator_page_size_calc import get_page_size
 
 from api.v1.schemes import Genre, GenreList
 from services.genre import GenreService, get_genre_service
-from utils.constants import GENRE_NOT_FOUND
+from services.response_cache import response_cache
+from utils.constants import GENRE_NOT_FOUND, INVALID_CURSOR
+from utils.cursor import InvalidCursorError, next_page_link
 
 router = APIRouter()
 
 
 @router.get('/', response_model=GenreList, summary='Genre list')
 async def genre_list(
+    request: Request,
     genre_service: GenreService = Depends(get_genre_service),
     page_number: Annotated[
         int, Query(description='Pagination page number', ge=1)
     ] = 1,
     page_size: Annotated[
-        int, Query(description='Pagination page size')
-    ] = 10
-) -> GenreList:
+        int, Query(description='Pagination page size', ge=1)
+    ] = 10,
+    cursor: Annotated[
+        str, Query(description="Pagination cursor, '*' for the first page")
+    ] = None
+) -> GenreList | Response:
     """
     Return list of genres with parameters:
 
     - **total**: total number of all genres
-    - **page**: current page number
+    - **page**: current page number, empty in cursor mode
     - **size**: size of page
     - **prev**: link to previous page
     - **next**: link to next page
+    - **next_cursor**: cursor of the next page in cursor mode
     - **results**: Genre object list
     """
 
+    if cursor is not None:
+        try:
+            total, genrelist, next_cursor = (
+                await genre_service.get_genre_list_by_cursor(
+                    cursor=cursor, page_size=page_size
+                )
+            )
+        except InvalidCursorError:
+            raise HTTPException(
+                status_code=HTTPStatus.BAD_REQUEST, detail=INVALID_CURSOR
+            )
+
+        return GenreList(
+            total=total,
+            page=None,
+            size=len(genrelist),
+            prev=None,
+            next=next_page_link('/genres', next_cursor, page_size=page_size),
+            next_cursor=next_cursor,
+            results=[{
+                "id": genre.id,
+                "name": genre.name
+            } for genre in genrelist]
+        )
+
+    cached = await response_cache.get(request)
+
+    if cached is not None:
+        return cached
+
     total, genrelist = await genre_service.get_genre_list(
         page=page_number, page_size=page_size
     )
@@ -50,7 +88,7 @@ async def genre_list(
         )
         size = get_page_size(page_number, total, page_size, next)
 
-    return GenreList(
+    return await response_cache.render(request, GenreList(
         total=total,
         page=page_number,
         size=size,
@@ -60,14 +98,15 @@ async def genre_list(
             "id": genre.id,
             "name": genre.name
         } for genre in genrelist] if total else []
-    )
+    ))
 
 
 @router.get('/{genre_id}', response_model=Genre, summary='Genre detail')
 async def genre_detail(
+    request: Request,
     genre_id: str,
     genre_service: GenreService = Depends(get_genre_service)
-) -> Genre | HTTPException:
+) -> Genre | Response:
     """
     Return genre information:
 
@@ -75,6 +114,11 @@ async def genre_detail(
     - **name**: genre name
     """
 
+    cached = await response_cache.get(request)
+
+    if cached is not None:
+        return cached
+
     genre = await genre_service.get_by_id(genre_id)
 
     if not genre:
@@ -82,4 +126,6 @@ async def genre_detail(
             status_code=HTTPStatus.NOT_FOUND, detail=GENRE_NOT_FOUND
         )
 
-    return Genre(id=genre.id, name=genre.name)
+    return await response_cache.render(
+        request, Genre(id=genre.id, name=genre.name)
+    )
@@ -1,39 +1,86 @@
 from http import HTTPStatus
 from typing import Annotated
 
-from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from fastapi.responses import ORJSONResponse, Response
 from utils.paginator_page_size_calc import get_page_size
 
-from api.v1.schemes import (Person, PersonList, PersonShortFilmInfo,
-                            PersonShortFilmInfoList)
+from api.v1.schemes import (Person, PersonBatch, PersonList,
+                            PersonShortFilmInfo, PersonShortFilmInfoList)
+from core.config import settings
 from services.person import PersonService, get_person_service
-from utils.constants import PERSON_NOT_FOUND
+from services.response_cache import response_cache
+from utils.constants import INVALID_CURSOR, PERSON_NOT_FOUND
+from utils.cursor import InvalidCursorError, next_page_link
+from utils.fields import FieldsQuery, include_fields, include_results
 
 router = APIRouter()
 
 
 @router.get('/search', response_model=PersonList, summary='Person list')
 async def person_list_search(
+    request: Request,
     person_service: PersonService = Depends(get_person_service),
+    fields: tuple[str, ...] | None = Depends(FieldsQuery(Person)),
     page_number: Annotated[
         int, Query(description='Pagination page number', ge=1)
     ] = 1,
     page_size: Annotated[
         int, Query(description='Pagination page size', ge=1)
     ] = 10,
-    query: str | None = None
-) -> PersonList:
+    query: str | None = None,
+    cursor: Annotated[
+        str, Query(description="Pagination cursor, '*' for the first page")
+    ] = None
+) -> PersonList | Response:
     """
     Return person list by query:
 
     - **total**: total number of all persons found
-    - **page**: current page number
+    - **page**: current page number, empty in cursor mode
     - **size**: size of page
     - **prev**: link to previous page
     - **next**: link to next page
+    - **next_cursor**: cursor of the next page in cursor mode
     - **results**: list of persons
     """
 
+    if cursor is not None:
+        try:
+            total, objects, next_cursor = (
+                await person_service.get_person_list_by_cursor(
+                    cursor, page_size, query
+                )
+            )
+        except InvalidCursorError:
+            raise HTTPException(
+                status_code=HTTPStatus.BAD_REQUEST, detail=INVALID_CURSOR
+            )
+
+        return ORJSONResponse(PersonList(
+            total=total,
+            page=None,
+            size=len(objects),
+            prev=None,
+            next=next_page_link(
+                '/persons/search', next_cursor, query=query,
+                page_size=page_size
+            ),
+            next_cursor=next_cursor,
+            results=[
+                Person(
+                    id=person.id,
+                    full_name=person.full_name,
+                    films=person.films
+                ) for person in objects
+            ]
+        ).dict(include=include_results(PersonList, fields)))
+
+    cached = await response_cache.get(request)
+
+    if cached is not None:
+        return cached
+
     total, objects = await person_service.get_person_list(
         page_number,
         page_size,
@@ -55,7 +102,7 @@ async def person_list_search(
         )
         size = get_page_size(page_number, total, page_size, next)
 
-    return PersonList(
+    return await response_cache.render(request, PersonList(
         total=total,
         page=page_number,
         size=size,
@@ -68,14 +115,58 @@ async def person_list_search(
                 films=person.films
             ) for person in objects
         ]
-    )
+    ), include=include_results(PersonList, fields))
+
+
+@router.get('/batch', response_model=PersonBatch, summary='Persons by ids')
+async def person_batch(
+    request: Request,
+    ids: Annotated[
+        list[str],
+        Query(description='Person ids', min_items=1,
+              max_items=settings.BATCH_MAX_IDS)
+    ],
+    fields: tuple[str, ...] | None = Depends(FieldsQuery(Person)),
+    person_service: PersonService = Depends(get_person_service)
+) -> PersonBatch | Response:
+    """
+    Return information on several persons at once:
+
+    - **results**: list of person information in the order of ids
+    - **not_found**: ids of persons not found
+    """
+
+    cached = await response_cache.get(request)
+
+    if cached is not None:
+        return cached
+
+    person_ids = list(dict.fromkeys(ids))
+    persons = await person_service.get_by_ids(person_ids)
+    found = {person.id for person in persons}
+
+    return await response_cache.render(request, PersonBatch(
+        results=[
+            Person(
+                id=person.id,
+                full_name=person.full_name,
+                films=person.films,
+            )
+            for person in persons
+        ],
+        not_found=[
+            person_id for person_id in person_ids if person_id not in found
+        ],
+    ), include=include_results(PersonBatch, fields))
 
 
 @router.get('/{person_id}', response_model=Person, summary='Person detail')
 async def person_detail(
+    request: Request,
     person_id: str,
+    fields: tuple[str, ...] | None = Depends(FieldsQuery(Person)),
     person_service: PersonService = Depends(get_person_service)
-) -> Person | HTTPException:
+) -> Person | Response:
     """
     Return person information:
 
@@ -84,18 +175,28 @@ async def person_detail(
     - **films**: list of films and the person's roles
     """
 
-    person = await person_service.get_by_id(person_id)
+    cached = await response_cache.get(request)
+
+    if cached is not None:
+        return cached
+
+    person = await person_service.get_by_id(person_id, fields)
 
     if not person:
         raise HTTPException(
             status_code=HTTPStatus.NOT_FOUND, detail=PERSON_NOT_FOUND
         )
 
-    return Person(
+    if fields is not None:
+        return await response_cache.render(
+            request, Person.construct(**person.dict()), include_fields(fields)
+        )
+
+    return await response_cache.render(request, Person(
         id=person.id,
         full_name=person.full_name,
         films=person.films,
-    )
+    ))
 
 
 @router.get(
@@ -104,9 +205,10 @@ async def person_detail(
     summary='List of person\'s films'
 )
 async def person_films_detail(
+    request: Request,
     person_id: str,
     person_service: PersonService = Depends(get_person_service)
-) -> PersonShortFilmInfoList:
+) -> PersonShortFilmInfoList | Response:
     """
     Return list of films in which the person participated:
 
@@ -114,6 +216,11 @@ async def person_films_detail(
     - **results**: list of films
     """
 
+    cached = await response_cache.get(request)
+
+    if cached is not None:
+        return cached
+
     total, films = await person_service.get_person_films_list(person_id)
 
     if not films:
@@ -121,7 +228,7 @@ async def person_films_detail(
             status_code=HTTPStatus.NOT_FOUND, detail=PERSON_NOT_FOUND
         )
 
-    return PersonShortFilmInfoList(
+    return await response_cache.render(request, PersonShortFilmInfoList(
         total=total,
         results=[
             PersonShortFilmInfo(
@@ -130,4 +237,4 @@ async def person_films_detail(
                 imdb_rating=film.imdb_rating,
             ) for film in films
         ]
-    )
+    ))
@@ -19,10 +19,11 @@ class FilmList(BaseModel):
 
     """
     total: int
-    page: int
+    page: int | None
     size: int | None
     prev: str | None
     next: str | None
+    next_cursor: str | None
     results: list[FilmShort]
 
 
@@ -54,6 +55,14 @@ class FilmFull(FilmShort, BaseModel):
     directors: list[PersonInFilm] | None = Field(default=[])
 
 
+class FilmBatch(BaseModel):
+    """An API model to represent films requested by IDs.
+
+    """
+    results: list[FilmFull]
+    not_found: list[str]
+
+
 class Genre(BaseModel):
     id: str
     name: str
@@ -61,10 +70,11 @@ class Genre(BaseModel):
 
 class GenreList(BaseModel):
     total: int
-    page: int
+    page: int | None
     size: int | None
     prev: str | None
     next: str | None
+    next_cursor: str | None
     results: list[Genre]
 
 
@@ -90,10 +100,39 @@ class Person(BaseModel):
     films: list[FilmPersonRoles]
 
 
+class PersonBatch(BaseModel):
+    results: list[Person]
+    not_found: list[str]
+
+
 class PersonList(BaseModel):
     total: int
-    page: int
+    page: int | None
     size: int | None
     prev: str | None
     next: str | None
+    next_cursor: str | None
     results: list[Person]
+
+
+class CacheStats(BaseModel):
+    """An API model to represent cache counters of a worker.
+
+    """
+    enabled: bool
+    entries: int = 0
+    bytes: int = 0
+    hits: int = 0
+    misses: int = 0
+    evictions: int = 0
+    stale_served: int = 0
+    stale_if_error_served: int = 0
+
+
+class ProfilerStatus(BaseModel):
+    """An API model to represent the state of the sampling profiler.
+
+    """
+    running: bool
+    started_at: float | None
+    samples: int
@@ -0,0 +1,210 @@
+"""Admission control of requests doing work the cache can not serve.
+
+A request takes a slot of its route group on its first ElasticSearch
+request and keeps it to the end, so requests served from the cache
+never wait. Once the slots of a group are taken, requests wait
+in a bounded queue; when it is full or the wait is too long,
+they are rejected with OverloadedError rather than piling up.
+"""
+
+import asyncio
+from collections import deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Iterator
+
+from starlette.types import ASGIApp, Receive, Scope, Send
+
+from core.config import settings
+from core.metrics import ADMISSION_IN_USE, ADMISSION_REJECTIONS
+
+
+class OverloadedError(Exception):
+    """The request was rejected to shed the load."""
+
+    def __init__(self, retry_after: float) -> None:
+        super().__init__('Too many requests in progress')
+        self.retry_after = retry_after
+
+
+class AdmissionLimiter:
+    """Limit concurrency to `limit` with at most `queue_size` waiting."""
+
+    def __init__(
+        self,
+        name: str,
+        limit: int,
+        queue_size: int,
+        timeout: float
+    ) -> None:
+        self.name = name
+        self.limit = limit
+        self.queue_size = queue_size
+        self.timeout = timeout
+        self.in_use = 0
+        self._waiters: deque[asyncio.Future] = deque()
+
+    async def acquire(self) -> None:
+        """Take a slot, waiting in the queue for one if needed."""
+
+        if self.in_use < self.limit and not self._waiters:
+            self._take()
+            return
+
+        if len(self._waiters) >= self.queue_size:
+            self._reject()
+
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+
+        try:
+            await asyncio.wait([waiter], timeout=self.timeout)
+        except BaseException:
+            self._abandon(waiter)
+            raise
+
+        if not waiter.done():
+            self._abandon(waiter)
+            self._reject()
+
+    def release(self) -> None:
+        """Give the slot to the next waiter or free it."""
+
+        while self._waiters:
+            waiter = self._waiters.popleft()
+
+            if not waiter.done():
+                waiter.set_result(None)
+                return
+
+        self.in_use -= 1
+        ADMISSION_IN_USE.labels(self.name).dec()
+
+    def _take(self) -> None:
+        self.in_use += 1
+        ADMISSION_IN_USE.labels(self.name).inc()
+
+    def _abandon(self, waiter: asyncio.Future) -> None:
+        if waiter.done():
+            # The slot was handed over meanwhile.
+            self.release()
+        else:
+            waiter.cancel()
+            self._waiters.remove(waiter)
+
+    def _reject(self) -> None:
+        ADMISSION_REJECTIONS.labels(self.name).inc()
+        raise OverloadedError(settings.ADMISSION_RETRY_AFTER_SECONDS)
+
+
+limiters = {
+    'search': AdmissionLimiter(
+        'search',
+        settings.ADMISSION_SEARCH_CONCURRENCY,
+        settings.ADMISSION_QUEUE_SIZE,
+        settings.ADMISSION_QUEUE_TIMEOUT_SECONDS,
+    ),
+    'default': AdmissionLimiter(
+        'default',
+        settings.ADMISSION_CONCURRENCY,
+        settings.ADMISSION_QUEUE_SIZE,
+        settings.ADMISSION_QUEUE_TIMEOUT_SECONDS,
+    ),
+}
+
+
+def route_group(route_path: str) -> str:
+    """Return the limiter group of a route: searches cost the most."""
+
+    return 'search' if route_path.endswith('/search') else 'default'
+
+
+class _Admission:
+    """The slot of a request."""
+
+    def __init__(self, scope: Scope) -> None:
+        self.scope = scope
+        self.limiter: AdmissionLimiter | None = None
+        self.acquiring: asyncio.Task | None = None
+        self.finished = False
+
+    def release(self) -> None:
+        self.finished = True
+
+        if self.acquiring is None:
+            return
+
+        if not self.acquiring.done():
+            # The request ended while waiting, the limiter cleans up.
+            self.acquiring.cancel()
+        elif (
+            not self.acquiring.cancelled()
+            and self.acquiring.exception() is None
+        ):
+            self.limiter.release()
+
+
+_admission: ContextVar[_Admission | None] = ContextVar(
+    'admission', default=None
+)
+
+
+async def admit() -> None:
+    """Take a slot for the current request, if it has none yet.
+
+    Work outside of requests, like warming up the cache or refreshing
+    it after the response, is not limited.
+    """
+
+    admission = _admission.get()
+
+    if admission is None or admission.finished:
+        return
+
+    if admission.acquiring is None:
+        route = admission.scope.get('route')
+        group = route_group(route.path if route is not None else '')
+        admission.limiter = limiters[group]
+        # Shared by the concurrent calls of the request.
+        admission.acquiring = asyncio.ensure_future(
+            admission.limiter.acquire()
+        )
+
+    await asyncio.shield(admission.acquiring)
+
+
+@contextmanager
+def no_admission() -> Iterator[None]:
+    """Run the block outside of the slot of the current request.
+
+    Used for work shared with other requests, which have taken
+    their own slots.
+    """
+
+    token = _admission.set(None)
+
+    try:
+        yield
+    finally:
+        _admission.reset(token)
+
+
+class AdmissionMiddleware:
+    """Release the slot taken by a request when it ends."""
+
+    def __init__(self, app: ASGIApp) -> None:
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope['type'] != 'http' or not settings.ADMISSION_ENABLED:
+            await self.app(scope, receive, send)
+            return
+
+        admission = _Admission(scope)
+        token = _admission.set(admission)
+
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            _admission.reset(token)
+            admission.release()
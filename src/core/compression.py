@@ -0,0 +1,142 @@
+"""Compression of responses with content negotiation."""
+
+import gzip
+
+import brotli
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from core.config import settings
+from core.timing import phase
+
+# In the order of preference.
+ENCODINGS = ('br', 'gzip')
+COMPRESSIBLE_TYPES = ('application/json', 'text/')
+
+
+def choose_encoding(accept_encoding: str | None) -> str | None:
+    """Return the preferred encoding the Accept-Encoding header allows."""
+
+    if not accept_encoding:
+        return None
+
+    accepted = {}
+
+    for item in accept_encoding.split(','):
+        coding, _, params = item.strip().partition(';')
+        quality = 1.0
+
+        if params.strip().startswith('q='):
+            try:
+                quality = float(params.strip()[2:])
+            except ValueError:
+                continue
+
+        accepted[coding.strip().lower()] = quality
+
+    for encoding in ENCODINGS:
+        if accepted.get(encoding, accepted.get('*', 0)) > 0:
+            return encoding
+
+    return None
+
+
+def compress(body: bytes, encoding: str) -> bytes:
+    """Compress a response body with the encoding given."""
+
+    with phase('compress'):
+        if encoding == 'br':
+            return brotli.compress(
+                body, quality=settings.COMPRESSION_BROTLI_QUALITY
+            )
+
+        return gzip.compress(
+            body, compresslevel=settings.COMPRESSION_GZIP_LEVEL, mtime=0
+        )
+
+
+def weak_etag(etag: str) -> str:
+    """Return the entity tag of a compressed variant of a body.
+
+    The bytes differ from the ones the strong tag was made of,
+    but the content is the same.
+    """
+
+    return etag if etag.startswith('W/') else f'W/{etag}'
+
+
+class CompressionMiddleware:
+    """Compress responses of COMPRESSION_MIN_SIZE bytes or more.
+
+    Only complete bodies of JSON and text are compressed. Responses
+    already encoded, like the pre-compressed ones of the response
+    cache, are sent as they are.
+    """
+
+    def __init__(self, app: ASGIApp) -> None:
+        self.app = app
+        self.min_size = settings.COMPRESSION_MIN_SIZE
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope['type'] != 'http':
+            await self.app(scope, receive, send)
+            return
+
+        encoding = choose_encoding(
+            Headers(scope=scope).get('accept-encoding')
+        )
+
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+
+        start = None
+
+        async def send_wrapper(message: Message) -> None:
+            nonlocal start
+
+            if message['type'] == 'http.response.start':
+                # Held back until the body shows whether to compress.
+                start = message
+                return
+
+            if start is None:
+                await send(message)
+                return
+
+            response_start, start = start, None
+            headers = MutableHeaders(scope=response_start)
+            body = message.get('body', b'')
+
+            if self._should_compress(headers, body, message):
+                body = compress(body, encoding)
+                headers['Content-Encoding'] = encoding
+                headers['Content-Length'] = str(len(body))
+
+                if 'accept-encoding' not in headers.get('vary', '').lower():
+                    headers.add_vary_header('Accept-Encoding')
+
+                if 'etag' in headers:
+                    headers['ETag'] = weak_etag(headers['etag'])
+
+                message = {**message, 'body': body}
+
+            await send(response_start)
+            await send(message)
+
+        await self.app(scope, receive, send_wrapper)
+
+    def _should_compress(
+        self,
+        headers: MutableHeaders,
+        body: bytes,
+        message: Message
+    ) -> bool:
+        return (
+            not message.get('more_body', False)
+            and len(body) >= self.min_size
+            and 'content-encoding' not in headers
+            and headers.get('content-type', '').startswith(
+                COMPRESSIBLE_TYPES
+            )
+        )
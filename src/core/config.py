@@ -1,7 +1,8 @@
+import secrets
 from pathlib import Path
 from logging import config as logging_config
 
-from pydantic import BaseSettings, Field
+from pydantic import BaseSettings, Field, validator
 
 from src.core.logger import LOGGING
 
@@ -16,16 +17,110 @@ class Settings(BaseSettings):
 
     REDIS_HOST: str = Field(env='REDIS_HOST')
     REDIS_PORT: int = Field(env='REDIS_PORT')
+    REDIS_MAX_CONNECTIONS: int = 100
+    REDIS_POOL_TIMEOUT: float = 1.0
+    REDIS_SOCKET_TIMEOUT: float = 5.0
+    REDIS_SOCKET_CONNECT_TIMEOUT: float = 1.0
+    REDIS_SOCKET_KEEPALIVE: bool = True
+    REDIS_RETRY_ON_TIMEOUT: bool = True
+    REDIS_HEALTH_CHECK_INTERVAL: int = 30
 
     ELASTIC_SCHEME: str = Field(env='ELASTIC_SCHEME')
     ELASTIC_HOST: str = Field(env='ELASTIC_HOST')
     ELASTIC_PORT: int = Field(env='ELASTIC_PORT')
+    ES_CONNECTIONS_PER_NODE: int = 50
+    ES_KEEPALIVE_SECONDS: float = 60
+    ES_REQUEST_TIMEOUT: float = 5.0
+    ES_MAX_RETRIES: int = 2
+    ES_RETRY_ON_TIMEOUT: bool = True
+    ES_HTTP_COMPRESS: bool = True
+    ES_BREAKER_ENABLED: bool = True
+    ES_BREAKER_WINDOW_SECONDS: int = 10
+    ES_BREAKER_MIN_CALLS: int = 20
+    ES_BREAKER_ERROR_RATE: float = 0.5
+    ES_BREAKER_SLOW_CALL_SECONDS: float = 1.0
+    ES_BREAKER_SLOW_CALL_RATE: float = 0.5
+    ES_BREAKER_OPEN_SECONDS: float = 10
+    ES_BREAKER_PROBES: int = 3
 
     ES_MOVIE_INDEX: str
     ES_GENRE_INDEX: str
     ES_PERSON_INDEX: str
+    ES_PIT_KEEP_ALIVE: str = '1m'
+    # Key signing pagination cursors. Random by default, so to be set
+    # when several processes serve the API.
+    CURSOR_SECRET: str = Field(default_factory=lambda: secrets.token_hex(32))
 
-    REDIS_CACHE_EXPIRES_IN_SECONDS = 60 * 5
+    REDIS_CACHE_EXPIRES_IN_SECONDS: int = 60 * 60
+    REDIS_CACHE_STALE_WHILE_REVALIDATE_SECONDS: int = 60
+    REDIS_CACHE_STALE_IF_ERROR_SECONDS: int = 60 * 60
+    LIST_CACHE_WINDOW_SIZE: int = 100
+    FILM_RANKING_ENABLED: bool = True
+    BATCH_MAX_IDS: int = 100
+    NEGATIVE_CACHE_EXPIRES_IN_SECONDS: int = 60
+    NEGATIVE_CACHE_MAX_ENTRIES: int = 100_000
+
+    CACHE_INVALIDATION_ENABLED: bool = True
+    CACHE_INVALIDATION_STREAM: str = 'cache_invalidation'
+    CACHE_INVALIDATION_GROUP: str = 'api'
+
+    WARMUP_ON_STARTUP: bool = True
+    WARMUP_AFTER_INVALIDATION: bool = True
+    WARMUP_COOLDOWN_SECONDS: int = 60
+    WARMUP_CONCURRENCY: int = 4
+    WARMUP_TOP_FILMS: int = 100
+    WARMUP_LIST_PAGES: int = 5
+    WARMUP_PAGE_SIZE: int = 20
+    WARMUP_SEARCH_QUERIES: int = 50
+
+    COMPRESSION_MIN_SIZE: int = 1024
+    COMPRESSION_GZIP_LEVEL: int = 6
+    COMPRESSION_BROTLI_QUALITY: int = 5
+    RESPONSE_CACHE_PRECOMPRESS: bool = True
+
+    ADMISSION_ENABLED: bool = True
+    ADMISSION_CONCURRENCY: int = 32
+    ADMISSION_SEARCH_CONCURRENCY: int = 8
+    ADMISSION_QUEUE_SIZE: int = 64
+    ADMISSION_QUEUE_TIMEOUT_SECONDS: float = 1.0
+    ADMISSION_RETRY_AFTER_SECONDS: float = 1.0
+
+    REQUEST_DEADLINE_ENABLED: bool = True
+    REQUEST_TIMEOUT_SECONDS: float = 2.0
+    REQUEST_SEARCH_TIMEOUT_SECONDS: float = 4.0
+    REQUEST_TIMEOUT_MAX_SECONDS: float = 10.0
+
+    RATE_LIMIT_ENABLED: bool = True
+    RATE_LIMIT_REQUESTS_PER_SECOND: float = 20
+    RATE_LIMIT_REQUESTS_BURST: int = 100
+    RATE_LIMIT_UNCACHED_PER_SECOND: float = 2
+    RATE_LIMIT_UNCACHED_BURST: int = 20
+    RATE_LIMIT_API_KEYS: set[str] = set()
+    RATE_LIMIT_TRUST_PROXY: bool = False
+
+    SLOW_REQUEST_THRESHOLD_MS: float = 500
+    PROFILER_INTERVAL_SECONDS: float = 0.005
+    PROFILER_MAX_DURATION_SECONDS: int = 300
+    ADMIN_TOKEN: str | None = None
+
+    SINGLE_FLIGHT_REDIS_LOCK: bool = False
+    SINGLE_FLIGHT_LOCK_TIMEOUT: float = 5.0
+
+    LOCAL_CACHE_ENABLED: bool = False
+    LOCAL_CACHE_MAX_ENTRIES: int = 10_000
+    LOCAL_CACHE_MAX_BYTES: int = 64 * 1024 * 1024
+    LOCAL_CACHE_EXPIRES_IN_SECONDS: float = 30
+
+    @validator('LOCAL_CACHE_EXPIRES_IN_SECONDS')
+    def local_cache_expires_before_redis(cls, value, values):
+        redis_expires = values.get('REDIS_CACHE_EXPIRES_IN_SECONDS')
+
+        if redis_expires is not None and value >= redis_expires:
+            raise ValueError(
+                'Local cache must expire before the Redis cache.'
+            )
+
+        return value
 
     class Config:
         env_file = BASE_DIR / '.env'
@@ -0,0 +1,131 @@
+"""Time budgets of requests.
+
+A request has REQUEST_TIMEOUT_SECONDS to complete, searches have
+REQUEST_SEARCH_TIMEOUT_SECONDS. A client may set its own budget
+in seconds with the X-Request-Timeout header, up to
+REQUEST_TIMEOUT_MAX_SECONDS. Redis and ElasticSearch calls made
+for the request wait for at most the rest of its budget and raise
+DeadlineExceededError once it is spent.
+"""
+
+import asyncio
+import time
+from contextlib import asynccontextmanager, contextmanager
+from contextvars import ContextVar
+from typing import AsyncIterator, Iterator
+
+import async_timeout
+from starlette.datastructures import Headers
+from starlette.types import ASGIApp, Receive, Scope, Send
+
+from core.admission import route_group
+from core.config import settings
+
+DEADLINE_HEADER = 'x-request-timeout'
+
+# Administration may legitimately take long.
+EXEMPT_PREFIXES = ('/api/v1/admin',)
+
+
+class DeadlineExceededError(Exception):
+    """The time budget of the request is spent."""
+
+    def __init__(self) -> None:
+        super().__init__('Request time budget is spent')
+
+
+_deadline: ContextVar[float | None] = ContextVar('deadline', default=None)
+
+
+def remaining() -> float | None:
+    """Return seconds left of the budget of the current request."""
+
+    deadline = _deadline.get()
+
+    if deadline is None:
+        return None
+
+    return deadline - time.monotonic()
+
+
+@asynccontextmanager
+async def within_deadline() -> AsyncIterator[None]:
+    """Time out the block when the budget of the request is spent."""
+
+    left = remaining()
+
+    if left is None:
+        yield
+        return
+
+    if left <= 0:
+        raise DeadlineExceededError()
+
+    # asyncio.timeout is not available before Python 3.11.
+    try:
+        async with async_timeout.timeout(left) as timeout:
+            yield
+    except asyncio.TimeoutError:
+        if timeout.expired:
+            raise DeadlineExceededError() from None
+
+        raise
+
+
+@contextmanager
+def no_deadline() -> Iterator[None]:
+    """Run the block regardless of the budget of the request.
+
+    Used for work which is worth completing after the client has
+    given up, like caching what was already loaded.
+    """
+
+    token = _deadline.set(None)
+
+    try:
+        yield
+    finally:
+        _deadline.reset(token)
+
+
+def request_budget(scope: Scope) -> float:
+    """Return the time budget of a request in seconds."""
+
+    header = Headers(scope=scope).get(DEADLINE_HEADER)
+
+    if header is not None:
+        try:
+            budget = float(header)
+        except ValueError:
+            budget = 0
+
+        if budget > 0:
+            return min(budget, settings.REQUEST_TIMEOUT_MAX_SECONDS)
+
+    if route_group(scope['path'].rstrip('/')) == 'search':
+        return settings.REQUEST_SEARCH_TIMEOUT_SECONDS
+
+    return settings.REQUEST_TIMEOUT_SECONDS
+
+
+class DeadlineMiddleware:
+    """Set the time budget of each request."""
+
+    def __init__(self, app: ASGIApp) -> None:
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if (
+            scope['type'] != 'http'
+            or not settings.REQUEST_DEADLINE_ENABLED
+            or scope['path'].startswith(EXEMPT_PREFIXES)
+        ):
+            await self.app(scope, receive, send)
+            return
+
+        token = _deadline.set(time.monotonic() + request_budget(scope))
+
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            _deadline.reset(token)
@@ -0,0 +1,57 @@
+"""Marking responses served without ElasticSearch as degraded."""
+
+from contextvars import ContextVar
+
+from starlette.datastructures import MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+DEGRADED_HEADER = 'X-Degraded'
+
+# Reasons the current request is served degraded for.
+_reasons: ContextVar[set[str] | None] = ContextVar('reasons', default=None)
+
+
+def mark_degraded(reason: str) -> None:
+    """Mark the response to the current request as degraded."""
+
+    reasons = _reasons.get()
+
+    if reasons is not None:
+        reasons.add(reason)
+
+
+def is_degraded() -> bool:
+    """Check whether the current request is served degraded."""
+
+    return bool(_reasons.get())
+
+
+class DegradedMiddleware:
+    """Add the X-Degraded header to degraded responses.
+
+    The header lists the reasons: `stale` for cached data past its
+    expiry, `partial` for data left out because of an error.
+    """
+
+    def __init__(self, app: ASGIApp) -> None:
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope['type'] != 'http':
+            await self.app(scope, receive, send)
+            return
+
+        reasons = set()
+        token = _reasons.set(reasons)
+
+        async def send_wrapper(message: Message) -> None:
+            if message['type'] == 'http.response.start' and reasons:
+                headers = MutableHeaders(scope=message)
+                headers[DEGRADED_HEADER] = ', '.join(sorted(reasons))
+
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            _reasons.reset(token)
@@ -0,0 +1,272 @@
+"""Prometheus metrics of the API.
+
+With several worker processes set PROMETHEUS_MULTIPROC_DIR
+to an empty directory to aggregate the metrics of all workers.
+"""
+
+import os
+import time
+from contextlib import contextmanager
+from typing import Iterator
+
+from prometheus_client import (CONTENT_TYPE_LATEST, REGISTRY,
+                               CollectorRegistry, Counter, Gauge, Histogram,
+                               generate_latest)
+from prometheus_client.core import CounterMetricFamily, GaugeMetricFamily
+from prometheus_client.multiprocess import MultiProcessCollector
+from starlette.requests import Request
+from starlette.responses import Response
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from core.timing import record_phase
+from db.local_cache import local_cache
+
+MULTIPROCESS = 'PROMETHEUS_MULTIPROC_DIR' in os.environ
+
+REQUEST_LATENCY = Histogram(
+    'http_request_duration_seconds',
+    'HTTP request latency by route.',
+    ['method', 'route', 'status'],
+)
+REQUESTS_IN_FLIGHT = Gauge(
+    'http_requests_in_flight',
+    'HTTP requests being served.',
+    multiprocess_mode='livesum',
+)
+CACHE_REQUESTS = Counter(
+    'cache_requests_total',
+    'Cache lookups by key family and result.',
+    ['family', 'result'],
+)
+ES_LATENCY = Histogram(
+    'elasticsearch_request_duration_seconds',
+    'ElasticSearch request latency by operation.',
+    ['operation'],
+)
+ES_ERRORS = Counter(
+    'elasticsearch_request_errors_total',
+    'Failed ElasticSearch requests by operation.',
+    ['operation'],
+)
+ES_CIRCUIT_STATE = Gauge(
+    'elasticsearch_circuit_state',
+    'State of the ElasticSearch circuit breaker, 1 for the current one.',
+    ['state'],
+    multiprocess_mode='max',
+)
+ES_CIRCUIT_REJECTIONS = Counter(
+    'elasticsearch_circuit_rejections_total',
+    'ElasticSearch requests rejected by the open circuit breaker.',
+)
+ADMISSION_IN_USE = Gauge(
+    'admission_slots_in_use',
+    'Admission slots taken by requests by route group.',
+    ['group'],
+    multiprocess_mode='livesum',
+)
+ADMISSION_REJECTIONS = Counter(
+    'admission_rejections_total',
+    'Requests rejected to shed the load by route group.',
+    ['group'],
+)
+REDIS_LATENCY = Histogram(
+    'redis_command_duration_seconds',
+    'Redis command latency by command.',
+    ['command'],
+)
+REDIS_ERRORS = Counter(
+    'redis_command_errors_total',
+    'Failed Redis commands by command.',
+    ['command'],
+)
+
+
+@contextmanager
+def observe_call(
+    latency: Histogram,
+    errors: Counter,
+    operation: str,
+    phase: str
+) -> Iterator[None]:
+    """Measure latency of a call to a backend and count its failures.
+
+    The time is also added to the `phase` of the current request.
+    """
+
+    started = time.perf_counter()
+
+    try:
+        yield
+    except Exception:
+        errors.labels(operation).inc()
+        raise
+    finally:
+        elapsed = time.perf_counter() - started
+        latency.labels(operation).observe(elapsed)
+        record_phase(phase, elapsed)
+
+
+def observe_cache(cache_key: str, result: str) -> None:
+    """Count a cache lookup by the family of its key."""
+
+    CACHE_REQUESTS.labels(cache_key.split(':', 1)[0], result).inc()
+
+
+class CacheStatsCollector:
+    """Collect counters the caches keep themselves."""
+
+    def describe(self):
+        # Nothing to check for duplicates, and collect() must not run
+        # at registration: db.redis is not imported yet.
+        return []
+
+    def collect(self):
+        # Imported here, db.redis imports this module.
+        from db.redis import stale_stats
+
+        stale = CounterMetricFamily(
+            'cache_stale_served',
+            'Stale cache entries served by reason.',
+            labels=['reason'],
+        )
+        stale.add_metric(['revalidate'], stale_stats['stale_served'])
+        stale.add_metric(['error'], stale_stats['stale_if_error_served'])
+        yield stale
+
+        if local_cache is None:
+            return
+
+        stats = local_cache.stats()
+
+        for name in ('entries', 'bytes'):
+            yield GaugeMetricFamily(
+                f'local_cache_{name}',
+                f'In-process cache {name}.',
+                value=stats[name],
+            )
+
+        for name in ('hits', 'misses', 'evictions'):
+            yield CounterMetricFamily(
+                f'local_cache_{name}',
+                f'In-process cache {name}.',
+                value=stats[name],
+            )
+
+
+class PoolStatsCollector:
+    """Collect usage of the Redis and ElasticSearch connection pools.
+
+    Requests waiting for a connection mean the pool is saturated.
+    """
+
+    STATES = ('in_use', 'idle', 'waiting')
+
+    def describe(self):
+        return []
+
+    def collect(self):
+        # Imported here, the db modules import this module.
+        from db import elastic, redis
+
+        stats = redis.pool_stats()
+
+        if stats is not None:
+            connections = GaugeMetricFamily(
+                'redis_pool_connections',
+                'Redis pool connections by state.',
+                labels=['state'],
+            )
+
+            for state in self.STATES:
+                connections.add_metric([state], stats[state])
+
+            yield connections
+            yield GaugeMetricFamily(
+                'redis_pool_max_connections',
+                'Redis pool connections allowed.',
+                value=stats['max'],
+            )
+
+        connections = GaugeMetricFamily(
+            'elasticsearch_pool_connections',
+            'ElasticSearch pool connections by node and state.',
+            labels=['node', 'state'],
+        )
+        limits = GaugeMetricFamily(
+            'elasticsearch_pool_max_connections',
+            'ElasticSearch pool connections allowed per node.',
+            labels=['node'],
+        )
+
+        for stats in elastic.pool_stats():
+            for state in self.STATES:
+                connections.add_metric([stats['node'], state], stats[state])
+
+            limits.add_metric([stats['node']], stats['max'])
+
+        yield connections
+        yield limits
+
+
+class MetricsMiddleware:
+    """Measure latency of requests by route and count requests in flight.
+
+    A plain ASGI middleware, so that it adds no extra tasks per request.
+    """
+
+    def __init__(self, app: ASGIApp) -> None:
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope['type'] != 'http':
+            await self.app(scope, receive, send)
+            return
+
+        status = 500
+
+        async def send_wrapper(message: Message) -> None:
+            nonlocal status
+
+            if message['type'] == 'http.response.start':
+                status = message['status']
+
+            await send(message)
+
+        started = time.perf_counter()
+        REQUESTS_IN_FLIGHT.inc()
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            REQUESTS_IN_FLIGHT.dec()
+            # The route template keeps the label cardinality bounded.
+            route = scope.get('route')
+            REQUEST_LATENCY.labels(
+                scope['method'],
+                route.path if route is not None else 'unmatched',
+                status,
+            ).observe(time.perf_counter() - started)
+
+
+def _registry() -> CollectorRegistry:
+    if not MULTIPROCESS:
+        REGISTRY.register(CacheStatsCollector())
+        REGISTRY.register(PoolStatsCollector())
+        return REGISTRY
+
+    registry = CollectorRegistry()
+    MultiProcessCollector(registry)
+
+    return registry
+
+
+registry = _registry()
+
+
+async def metrics(request: Request) -> Response:
+    """Expose the metrics in the Prometheus text format."""
+
+    return Response(
+        generate_latest(registry),
+        headers={'Content-Type': CONTENT_TYPE_LATEST}
+    )
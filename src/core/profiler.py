@@ -0,0 +1,97 @@
+"""A sampling profiler of the event loop thread."""
+
+import sys
+import threading
+import time
+from collections import Counter
+from types import FrameType
+
+from core.config import settings
+
+
+class SamplingProfiler:
+    """Sample stacks of a thread for a time window.
+
+    The result is in the folded stacks format: one line per stack,
+    frames from the outermost separated by semicolons and the number
+    of samples, as read by flamegraph.pl, speedscope and inferno.
+    """
+
+    def __init__(self, interval: float) -> None:
+        self.interval = interval
+        self.started_at: float | None = None
+        self.until: float | None = None
+        self._samples: Counter[str] = Counter()
+        self._lock = threading.Lock()
+        self._thread: threading.Thread | None = None
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self, duration: float) -> bool:
+        """Start sampling the calling thread, False if already started."""
+
+        if self.running:
+            return False
+
+        self._samples = Counter()
+        self.started_at = time.time()
+        self.until = time.monotonic() + duration
+        self._thread = threading.Thread(
+            target=self._sample,
+            args=(threading.get_ident(),),
+            name='sampling-profiler',
+            daemon=True,
+        )
+        self._thread.start()
+
+        return True
+
+    def stop(self) -> None:
+        """Stop sampling before the end of the time window."""
+
+        self.until = time.monotonic()
+
+    def sample_count(self) -> int:
+        with self._lock:
+            return sum(self._samples.values())
+
+    def folded(self) -> str:
+        """Return the samples collected in the folded stacks format."""
+
+        with self._lock:
+            samples = list(self._samples.items())
+
+        return ''.join(f'{stack} {count}\n' for stack, count in samples)
+
+    def _sample(self, thread_id: int) -> None:
+        while time.monotonic() < self.until:
+            frame = sys._current_frames().get(thread_id)
+
+            if frame is None:
+                return
+
+            stack = self._fold(frame)
+            del frame
+
+            with self._lock:
+                self._samples[stack] += 1
+
+            time.sleep(self.interval)
+
+    @staticmethod
+    def _fold(frame: FrameType) -> str:
+        stack = []
+
+        while frame is not None:
+            code = frame.f_code
+            stack.append(
+                f'{code.co_name} ({code.co_filename}:{code.co_firstlineno})'
+            )
+            frame = frame.f_back
+
+        return ';'.join(reversed(stack))
+
+
+profiler = SamplingProfiler(settings.PROFILER_INTERVAL_SECONDS)
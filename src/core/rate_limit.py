@@ -0,0 +1,316 @@
+"""Rate limiting of clients with token buckets kept in Redis.
+
+Each client, identified by its API key or its IP address, has two
+buckets: one for all of its requests and a smaller one for requests
+reaching ElasticSearch, so that cache misses, like searches with
+random queries, run out long before cached reads do.
+
+Both buckets are checked by one Lua script at the first Redis
+round trip of the request, sent along with the response cache
+lookup when there is one. A request reaching ElasticSearch later
+is let through if the second bucket had a token left, and the token
+is taken in the background.
+"""
+
+import asyncio
+import logging
+from contextlib import contextmanager
+from contextvars import ContextVar
+from hashlib import blake2b
+from typing import Iterator
+
+from redis.asyncio import Redis
+from redis.asyncio.client import Pipeline
+from redis.exceptions import NoScriptError, RedisError
+from starlette.datastructures import Headers
+from starlette.types import ASGIApp, Receive, Scope, Send
+
+from core.config import settings
+from core.deadline import no_deadline
+
+API_KEY_HEADER = 'x-api-key'
+REAL_IP_HEADER = 'x-real-ip'
+
+# Public endpoints only.
+LIMITED_PREFIXES = ('/api/v1/films', '/api/v1/genres', '/api/v1/persons')
+
+# Takes tokens from the buckets KEYS[1] of all requests and KEYS[2]
+# of uncached ones. ARGV holds the rate per second, the burst and
+# the cost of each; a bucket with a zero cost is only checked to
+# have a token left. Returns whether the tokens were taken, whether
+# the uncached bucket has a token and milliseconds to wait for each.
+TOKEN_BUCKETS_SCRIPT = """
+local time = redis.call('TIME')
+local now = time[1] * 1000 + time[2] / 1000
+local buckets = {}
+
+for i = 1, 2 do
+    local rate = tonumber(ARGV[i * 3 - 2])
+    local burst = tonumber(ARGV[i * 3 - 1])
+    local cost = tonumber(ARGV[i * 3])
+    local state = redis.call('HMGET', KEYS[i], 'tokens', 'updated')
+    local tokens = tonumber(state[1]) or burst
+    local updated = tonumber(state[2]) or now
+
+    tokens = math.min(burst, tokens + math.max(now - updated, 0) * rate / 1000)
+
+    local needed = math.max(cost, 1)
+    local wait = 0
+
+    if tokens < needed then
+        wait = math.ceil((needed - tokens) * 1000 / rate)
+    end
+
+    buckets[i] = {tokens = tokens, rate = rate, burst = burst,
+                  cost = cost, wait = wait}
+end
+
+local allowed = true
+
+for i = 1, 2 do
+    if buckets[i].cost > 0 and buckets[i].wait > 0 then
+        allowed = false
+    end
+end
+
+if allowed then
+    for i = 1, 2 do
+        local bucket = buckets[i]
+
+        if bucket.cost > 0 then
+            redis.call('HSET', KEYS[i], 'tokens', bucket.tokens - bucket.cost,
+                       'updated', now)
+            redis.call('PEXPIRE', KEYS[i],
+                       math.ceil(bucket.burst * 1000 / bucket.rate))
+        end
+    end
+end
+
+return {allowed and 1 or 0, buckets[2].wait == 0 and 1 or 0,
+        buckets[1].wait, buckets[2].wait}
+"""
+
+
+class RateLimitedError(Exception):
+    """The client has run out of its budget of requests."""
+
+    def __init__(self, retry_after: float) -> None:
+        super().__init__('Too many requests')
+        self.retry_after = retry_after
+
+
+def client_id(scope: Scope) -> str:
+    """Return the API key of the client if known, else its address.
+
+    With RATE_LIMIT_TRUST_PROXY on the address is taken from X-Real-IP,
+    so it is only to be turned on behind a proxy setting the header
+    of every request, like the nginx of docker-compose.yml. Otherwise
+    a client would pick its own address.
+    """
+
+    headers = Headers(scope=scope)
+    api_key = headers.get(API_KEY_HEADER)
+
+    if api_key and api_key in settings.RATE_LIMIT_API_KEYS:
+        # The key itself is not written to Redis.
+        return 'key:' + blake2b(api_key.encode(), digest_size=8).hexdigest()
+
+    if settings.RATE_LIMIT_TRUST_PROXY and REAL_IP_HEADER in headers:
+        return 'ip:' + headers[REAL_IP_HEADER]
+
+    client = scope.get('client')
+
+    return 'ip:' + (client[0] if client else 'unknown')
+
+
+class _RateLimit:
+    """The rate limit check of a request."""
+
+    def __init__(self, client: str) -> None:
+        self.keys = [
+            f'rate_limit:{{{client}}}:requests',
+            f'rate_limit:{{{client}}}:uncached',
+        ]
+        self.checked = False
+        self.uncached_allowed = False
+        self.uncached_wait = 0.0
+        self.uncached_taken = False
+        self.finished = False
+
+    @staticmethod
+    def args(cost: int, uncached_cost: int) -> list:
+        return [
+            settings.RATE_LIMIT_REQUESTS_PER_SECOND,
+            settings.RATE_LIMIT_REQUESTS_BURST,
+            cost,
+            settings.RATE_LIMIT_UNCACHED_PER_SECOND,
+            settings.RATE_LIMIT_UNCACHED_BURST,
+            uncached_cost,
+        ]
+
+    def apply(self, reply: list) -> None:
+        """Take the reply of the script, raise if the request is denied."""
+
+        allowed, uncached_allowed, wait, uncached_wait = reply
+        self.checked = True
+        self.uncached_allowed = bool(uncached_allowed)
+        self.uncached_wait = uncached_wait / 1000
+
+        if not allowed:
+            raise RateLimitedError(max(wait, uncached_wait) / 1000)
+
+    def fail_open(self, exc: Exception) -> None:
+        """Let the request through, Redis being down is no reason
+        to refuse it.
+        """
+
+        logging.warning('Failed to check the rate limit: %s', exc)
+        self.checked = True
+        self.uncached_allowed = True
+
+
+class RateLimiter:
+    """Class to check the rate limits of the current request."""
+
+    def __init__(self, redis: Redis) -> None:
+        self.redis = redis
+        self.script = redis.register_script(TOKEN_BUCKETS_SCRIPT)
+        self._charges: set[asyncio.Task] = set()
+
+    async def execute(self, pipe: Pipeline) -> list:
+        """Execute a pipeline along with the check of the current request,
+        if it is not done yet, in a single round trip.
+        """
+
+        rate_limit = _rate_limit.get()
+
+        if rate_limit is None or rate_limit.checked or rate_limit.finished:
+            return await pipe.execute()
+
+        pipe.evalsha(
+            self.script.sha, 2, *rate_limit.keys, *rate_limit.args(1, 0)
+        )
+        *results, reply = await pipe.execute(raise_on_error=False)
+
+        for result in results:
+            if isinstance(result, Exception):
+                raise result
+
+        if isinstance(reply, NoScriptError):
+            # Redis has restarted or flushed its scripts.
+            await self._check(rate_limit, 1, 0)
+        elif isinstance(reply, RedisError):
+            rate_limit.fail_open(reply)
+        else:
+            rate_limit.apply(reply)
+
+        return results
+
+    async def check(self) -> None:
+        """Check the budget of all requests of the client."""
+
+        rate_limit = _rate_limit.get()
+
+        if rate_limit is None or rate_limit.checked or rate_limit.finished:
+            return
+
+        await self._check(rate_limit, 1, 0)
+
+    async def check_uncached(self) -> None:
+        """Check the budget of uncached requests of the client,
+        before the current request reaches ElasticSearch.
+        """
+
+        rate_limit = _rate_limit.get()
+
+        if rate_limit is None or rate_limit.finished:
+            return
+
+        if not rate_limit.checked:
+            await self._check(rate_limit, 1, 1)
+            rate_limit.uncached_taken = True
+            return
+
+        if not rate_limit.uncached_allowed:
+            raise RateLimitedError(rate_limit.uncached_wait)
+
+        if not rate_limit.uncached_taken:
+            rate_limit.uncached_taken = True
+            # Not to add a round trip to the request.
+            task = asyncio.ensure_future(self._take_uncached(rate_limit))
+            self._charges.add(task)
+            task.add_done_callback(self._charges.discard)
+
+    async def _check(
+        self,
+        rate_limit: _RateLimit,
+        cost: int,
+        uncached_cost: int
+    ) -> None:
+        try:
+            reply = await self.script(
+                rate_limit.keys, rate_limit.args(cost, uncached_cost)
+            )
+        except RedisError as exc:
+            rate_limit.fail_open(exc)
+            return
+
+        rate_limit.apply(reply)
+
+    async def _take_uncached(self, rate_limit: _RateLimit) -> None:
+        try:
+            with no_deadline():
+                await self.script(rate_limit.keys, rate_limit.args(0, 1))
+        except RedisError as exc:
+            logging.warning('Failed to take an uncached token: %s', exc)
+
+
+_rate_limit: ContextVar[_RateLimit | None] = ContextVar(
+    'rate_limit', default=None
+)
+
+
+@contextmanager
+def no_rate_limit() -> Iterator[None]:
+    """Run the block without charging the client of the current request.
+
+    Used for work shared with other requests, which are charged
+    for it themselves.
+    """
+
+    token = _rate_limit.set(None)
+
+    try:
+        yield
+    finally:
+        _rate_limit.reset(token)
+
+
+class RateLimitMiddleware:
+    """Set up the rate limit check of each request to public endpoints.
+
+    The check itself is done by the response cache or the ElasticSearch
+    client, whichever reaches Redis first.
+    """
+
+    def __init__(self, app: ASGIApp) -> None:
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if (
+            scope['type'] != 'http'
+            or not settings.RATE_LIMIT_ENABLED
+            or not scope['path'].startswith(LIMITED_PREFIXES)
+        ):
+            await self.app(scope, receive, send)
+            return
+
+        rate_limit = _RateLimit(client_id(scope))
+        token = _rate_limit.set(rate_limit)
+
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            _rate_limit.reset(token)
+            # Work going on in the background is not charged.
+            rate_limit.finished = True
@@ -0,0 +1,97 @@
+"""Per-phase timings of requests and the slow request log."""
+
+import logging
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Iterator
+
+from starlette.types import ASGIApp, Receive, Scope, Send
+
+from core.config import settings
+
+logger = logging.getLogger(__name__)
+
+# Seconds spent and calls made per phase of the current request.
+_timings: ContextVar[dict[str, list] | None] = ContextVar(
+    'timings', default=None
+)
+
+
+def record_phase(name: str, seconds: float) -> None:
+    """Add time spent in a phase to the timings of the current request."""
+
+    timings = _timings.get()
+
+    if timings is None:
+        return
+
+    phase = timings.setdefault(name, [0.0, 0])
+    phase[0] += seconds
+    phase[1] += 1
+
+
+@contextmanager
+def phase(name: str) -> Iterator[None]:
+    """Measure a phase of the current request."""
+
+    started = time.perf_counter()
+
+    try:
+        yield
+    finally:
+        record_phase(name, time.perf_counter() - started)
+
+
+def format_timings(timings: dict[str, list], total: float) -> str:
+    """Return a breakdown like `es=12.1ms/2 redis=0.8ms/3 other=1.0ms`.
+
+    Phases overlap when run concurrently, so `other` is approximate.
+    """
+
+    parts = [
+        f'{name}={seconds * 1000:.1f}ms/{calls}'
+        for name, (seconds, calls) in sorted(timings.items())
+    ]
+    other = total - sum(seconds for seconds, _ in timings.values())
+    parts.append(f'other={max(other, 0) * 1000:.1f}ms')
+
+    return ' '.join(parts)
+
+
+class SlowRequestMiddleware:
+    """Collect phase timings of requests and log the slow ones.
+
+    A request slower than SLOW_REQUEST_THRESHOLD_MS is logged
+    with the time spent in Redis, ElasticSearch, decoding cached data
+    and serializing the response.
+    """
+
+    def __init__(self, app: ASGIApp) -> None:
+        self.app = app
+        self.threshold = settings.SLOW_REQUEST_THRESHOLD_MS / 1000
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope['type'] != 'http':
+            await self.app(scope, receive, send)
+            return
+
+        timings = {}
+        token = _timings.set(timings)
+        started = time.perf_counter()
+
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            total = time.perf_counter() - started
+            _timings.reset(token)
+
+            if total >= self.threshold:
+                logger.warning(
+                    'Slow request %s %s?%s %.1fms: %s',
+                    scope['method'],
+                    scope['path'],
+                    scope['query_string'].decode(),
+                    total * 1000,
+                    format_timings(timings, total)
+                )
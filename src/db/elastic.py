@@ -1,8 +1,19 @@
 from abc import ABC, abstractmethod
 
-from elasticsearch import AsyncElasticsearch
+from elastic_transport import AiohttpHttpNode
+from elasticsearch import ApiError, AsyncElasticsearch, TransportError
 
+from core.admission import admit
 from core.config import settings
+from core.deadline import within_deadline
+from core.metrics import (ES_CIRCUIT_REJECTIONS, ES_CIRCUIT_STATE, ES_ERRORS,
+                          ES_LATENCY, observe_call)
+from db.redis import rate_limiter
+from utils.circuit_breaker import (CLOSED, HALF_OPEN, OPEN, CircuitBreaker,
+                                   CircuitOpenError)
+
+# Response parts list searches need, everything else is not sent.
+HITS_FILTER_PATH = ['hits.total.value', 'hits.hits._source']
 
 
 class AsyncSearchAbstract(ABC):
@@ -19,14 +30,141 @@ class AsyncSearchAbstract(ABC):
         pass
 
 
-elastic: AsyncElasticsearch = AsyncElasticsearch(
+class KeepAliveAiohttpNode(AiohttpHttpNode):
+    """An aiohttp node keeping idle connections open for longer.
+
+    aiohttp closes idle connections after 15 seconds, so quiet periods
+    between bursts cost new TCP handshakes.
+    """
+
+    def _create_aiohttp_session(self) -> None:
+        super()._create_aiohttp_session()
+        # The transport builds the connector itself, without a way
+        # to pass the keep-alive timeout. The attribute is private,
+        # the default is kept if aiohttp no longer has it.
+        connector = self.session.connector
+
+        if hasattr(connector, '_keepalive_timeout'):
+            connector._keepalive_timeout = settings.ES_KEEPALIVE_SECONDS
+
+
+def is_failure(exc: Exception) -> bool:
+    """Check whether an error means ElasticSearch is unhealthy.
+
+    Errors of the request itself, like a missing document, do not.
+    """
+
+    if isinstance(exc, ApiError):
+        return exc.status_code == 429 or exc.status_code >= 500
+
+    return isinstance(exc, TransportError)
+
+
+def set_circuit_state(state: str) -> None:
+    for name in (CLOSED, HALF_OPEN, OPEN):
+        ES_CIRCUIT_STATE.labels(name).set(name == state)
+
+
+breaker = CircuitBreaker(
+    is_failure,
+    window_seconds=settings.ES_BREAKER_WINDOW_SECONDS,
+    min_calls=settings.ES_BREAKER_MIN_CALLS,
+    error_rate=settings.ES_BREAKER_ERROR_RATE,
+    slow_call_seconds=settings.ES_BREAKER_SLOW_CALL_SECONDS,
+    slow_call_rate=settings.ES_BREAKER_SLOW_CALL_RATE,
+    open_seconds=settings.ES_BREAKER_OPEN_SECONDS,
+    probes=settings.ES_BREAKER_PROBES,
+    on_change=set_circuit_state,
+)
+set_circuit_state(breaker.state)
+
+
+class InstrumentedElasticsearch(AsyncElasticsearch):
+    """An ElasticSearch client measuring latency of requests.
+
+    Requests go through the circuit breaker, so that they fail fast
+    with CircuitOpenError while ElasticSearch is unhealthy. They count
+    against the uncached rate limit of the client, take an admission
+    slot of the API request they are made for and wait for at most
+    the rest of its time budget.
+    """
+
+    async def perform_request(self, method: str, path: str, **kwargs):
+        async with within_deadline():
+            await rate_limiter.check_uncached()
+            await admit()
+
+            if not settings.ES_BREAKER_ENABLED:
+                return await self._perform_request(method, path, **kwargs)
+
+            try:
+                return await breaker.call(
+                    self._perform_request, method, path, **kwargs
+                )
+            except CircuitOpenError:
+                ES_CIRCUIT_REJECTIONS.inc()
+                raise
+
+    async def _perform_request(self, method: str, path: str, **kwargs):
+        with observe_call(
+            ES_LATENCY, ES_ERRORS, self._operation(path), 'es'
+        ):
+            return await super().perform_request(method, path, **kwargs)
+
+    @staticmethod
+    def _operation(path: str) -> str:
+        """Return the API of a request path: search, mget, doc, pit..."""
+
+        for part in path.split('/'):
+            if part.startswith('_'):
+                return part[1:]
+
+        return 'other'
+
+
+elastic: AsyncElasticsearch = InstrumentedElasticsearch(
     [{
         'scheme': settings.ELASTIC_SCHEME,
         'host': settings.ELASTIC_HOST,
         'port': settings.ELASTIC_PORT
-    }]
+    }],
+    node_class=KeepAliveAiohttpNode,
+    connections_per_node=settings.ES_CONNECTIONS_PER_NODE,
+    request_timeout=settings.ES_REQUEST_TIMEOUT,
+    max_retries=settings.ES_MAX_RETRIES,
+    retry_on_timeout=settings.ES_RETRY_ON_TIMEOUT,
+    http_compress=settings.ES_HTTP_COMPRESS,
 )
 
 
+def pool_stats() -> list[dict]:
+    """Return connection pool usage of each ElasticSearch node.
+
+    aiohttp exposes no usage of its connectors, so their private
+    attributes are read, as empty if missing.
+    """
+
+    stats = []
+
+    for node in elastic.transport.node_pool.all():
+        session = getattr(node, 'session', None)
+
+        if session is None or session.closed:
+            continue
+
+        connector = session.connector
+        conns = getattr(connector, '_conns', {})
+        waiters = getattr(connector, '_waiters', {})
+        stats.append({
+            'node': node.base_url,
+            'in_use': len(getattr(connector, '_acquired', ())),
+            'idle': sum(len(idle) for idle in conns.values()),
+            'waiting': sum(len(waiting) for waiting in waiters.values()),
+            'max': connector.limit_per_host,
+        })
+
+    return stats
+
+
 async def get_elastic() -> AsyncElasticsearch:
     return elastic
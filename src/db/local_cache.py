@@ -0,0 +1,126 @@
+"""In-process cache tier in front of Redis."""
+
+import re
+import time
+from collections import OrderedDict
+from fnmatch import translate
+from typing import Any
+
+from core.config import settings
+
+
+class LocalCache:
+    """A per-worker LRU cache of already parsed objects.
+
+    Entries expire after `expires_in` seconds. The cache is bounded both
+    by the number of entries and by the total size of the raw payloads
+    the objects were parsed from.
+    """
+
+    def __init__(
+        self,
+        max_entries: int,
+        max_bytes: int,
+        expires_in: float
+    ) -> None:
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.expires_in = expires_in
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries: OrderedDict[str, tuple[float, int, Any]] = (
+            OrderedDict()
+        )
+
+    def get(self, key: str) -> Any | None:
+        """Return a fresh object by the key or None."""
+
+        entry = self._entries.get(key)
+
+        if entry is None:
+            self.misses += 1
+            return None
+
+        expires_at, _, value = entry
+
+        if expires_at <= time.monotonic():
+            self._remove(key)
+            self.misses += 1
+            return None
+
+        self._entries.move_to_end(key)
+        self.hits += 1
+
+        return value
+
+    def set(self, key: str, value: Any, size: int) -> None:
+        """Put an object parsed from a payload of `size` bytes."""
+
+        if size > self.max_bytes:
+            return
+
+        if key in self._entries:
+            self._remove(key)
+
+        self._entries[key] = (time.monotonic() + self.expires_in, size, value)
+        self.size += size
+
+        while (
+            len(self._entries) > self.max_entries
+            or self.size > self.max_bytes
+        ):
+            self._remove(next(iter(self._entries)))
+            self.evictions += 1
+
+    def delete(self, key: str) -> None:
+        """Drop an object by the key."""
+
+        if key in self._entries:
+            self._remove(key)
+
+    def delete_matching(self, *patterns: str) -> None:
+        """Drop objects with keys matching any of glob-style patterns."""
+
+        if not patterns:
+            return
+
+        # One pass over the entries however many patterns there are.
+        matcher = re.compile(
+            '|'.join(translate(pattern) for pattern in patterns)
+        )
+
+        for key in [key for key in self._entries if matcher.match(key)]:
+            self._remove(key)
+
+    def clear(self) -> None:
+        """Drop all objects."""
+
+        self._entries.clear()
+        self.size = 0
+
+    def stats(self) -> dict[str, int]:
+        """Return counters to size the cache by."""
+
+        return {
+            'entries': len(self._entries),
+            'bytes': self.size,
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+        }
+
+    def _remove(self, key: str) -> None:
+        _, size, _ = self._entries.pop(key)
+        self.size -= size
+
+
+local_cache: LocalCache | None = (
+    LocalCache(
+        max_entries=settings.LOCAL_CACHE_MAX_ENTRIES,
+        max_bytes=settings.LOCAL_CACHE_MAX_BYTES,
+        expires_in=settings.LOCAL_CACHE_EXPIRES_IN_SECONDS,
+    )
+    if settings.LOCAL_CACHE_ENABLED else None
+)
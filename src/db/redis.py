@@ -1,8 +1,77 @@
+import asyncio
+import logging
 from abc import ABC, abstractmethod
+from typing import Any, Awaitable, Callable
 
-from redis.asyncio import Redis
+from elasticsearch import ApiError, TransportError
+from redis.asyncio import BlockingConnectionPool, Redis
+from redis.asyncio.client import Pipeline
 
+from core.admission import OverloadedError, admit
 from core.config import settings
+from core.deadline import DeadlineExceededError, no_deadline, within_deadline
+from core.degraded import mark_degraded
+from core.metrics import (REDIS_ERRORS, REDIS_LATENCY, observe_cache,
+                          observe_call)
+from core.rate_limit import RateLimitedError, RateLimiter
+from core.timing import phase
+from db.local_cache import LocalCache
+from utils.cache_tags import key_tags
+from utils.circuit_breaker import CircuitOpenError
+from utils.single_flight import SingleFlight
+
+STALE_WHILE_REVALIDATE_SECONDS = (
+    settings.REDIS_CACHE_STALE_WHILE_REVALIDATE_SECONDS
+)
+STALE_IF_ERROR_SECONDS = settings.REDIS_CACHE_STALE_IF_ERROR_SECONDS
+
+# Objects are kept in Redis for this long after their soft expiry,
+# so that the cache can serve them stale.
+STALE_EXTRA_SECONDS = max(
+    STALE_WHILE_REVALIDATE_SECONDS, STALE_IF_ERROR_SECONDS
+)
+
+# Tag sets outlive the keys added to them.
+TAG_EXPIRE_IN_SECONDS = (
+    settings.REDIS_CACHE_EXPIRES_IN_SECONDS + STALE_EXTRA_SECONDS
+)
+
+# ElasticSearch was not asked or not waited for: any cached object
+# is better.
+REJECTIONS = (
+    CircuitOpenError,
+    OverloadedError,
+    DeadlineExceededError,
+    RateLimitedError,
+)
+
+NEGATIVE_CACHE_EXPIRES_IN_SECONDS = settings.NEGATIVE_CACHE_EXPIRES_IN_SECONDS
+NEGATIVE_CACHE_MAX_ENTRIES = settings.NEGATIVE_CACHE_MAX_ENTRIES
+
+# Cached under the key of an object that does not exist. Not JSON,
+# so that it never collides with a cached object.
+NOT_FOUND = b'not_found'
+# Counts negative entries written during their expiry period.
+NOT_FOUND_BUDGET_KEY = 'not_found:budget'
+
+# Counters of stale objects served by the worker.
+stale_stats: dict[str, int] = {
+    'stale_served': 0,
+    'stale_if_error_served': 0,
+}
+
+
+def add_to_tags(pipe: Pipeline, cache_key: str) -> None:
+    """Add a key written by the pipeline to the sets of its tags,
+    for the cache invalidation to find it.
+
+    The pipeline should be a transaction, so that the key is never
+    written without being tagged.
+    """
+
+    for tag in key_tags(cache_key):
+        pipe.sadd(tag, cache_key)
+        pipe.expire(tag, TAG_EXPIRE_IN_SECONDS)
 
 
 class AsyncCacheAbstract(ABC):
@@ -27,7 +96,473 @@ class AsyncCacheAbstract(ABC):
         pass
 
 
-redis: Redis = Redis(host=settings.REDIS_HOST, port=settings.REDIS_PORT)
+class RedisCacheBase(AsyncCacheAbstract):
+    """A base class for Redis cache services
+       with an optional in-process cache tier.
+
+    """
+
+    def __init__(
+        self,
+        redis: Redis,
+        local_cache: LocalCache | None = None,
+        single_flight: SingleFlight | None = None
+    ) -> None:
+        self.redis = redis
+        self.local_cache = local_cache
+        self.single_flight = single_flight or SingleFlight()
+        self._revalidations: set[asyncio.Task] = set()
+
+    async def _get_cached(
+        self,
+        cache_key: str,
+        parse: Callable[[bytes], Any]
+    ) -> Any | None:
+        """Retrieve a fresh object from the local cache or from Redis."""
+
+        entry = await self._get_cached_entry(cache_key, parse)
+
+        if entry is None or entry[1] > 0:
+            return None
+
+        return entry[0]
+
+    async def _get_cached_entry(
+        self,
+        cache_key: str,
+        parse: Callable[[bytes], Any]
+    ) -> tuple[Any, float] | None:
+        """
+        Retrieve an object from the local cache or from Redis
+        along with the number of seconds it is stale for.
+        """
+
+        if self.local_cache is not None:
+            entry = self._get_local_entry(cache_key)
+
+            if entry is not None:
+                return entry
+
+        async with self.redis.pipeline(transaction=False) as pipe:
+            pipe.get(cache_key)
+            pipe.pttl(cache_key)
+            data, expires_in = await pipe.execute()
+
+        return self._parse_entry(cache_key, data, expires_in, parse)
+
+    async def _get_cached_entries(
+        self,
+        cache_keys: list[str],
+        parse: Callable[[bytes], Any]
+    ) -> dict[str, tuple[Any, float]]:
+        """
+        Retrieve objects by keys from the local cache or from Redis
+        with a single round trip. Missing objects are left out.
+        """
+
+        entries = {}
+
+        if self.local_cache is not None:
+            for cache_key in cache_keys:
+                entry = self._get_local_entry(cache_key)
+
+                if entry is not None:
+                    entries[cache_key] = entry
+
+        remote_keys = [key for key in cache_keys if key not in entries]
+
+        if not remote_keys:
+            return entries
+
+        async with self.redis.pipeline(transaction=False) as pipe:
+            pipe.mget(remote_keys)
+
+            for cache_key in remote_keys:
+                pipe.pttl(cache_key)
+
+            data, *expires = await pipe.execute()
+
+        for cache_key, item, expires_in in zip(remote_keys, data, expires):
+            entry = self._parse_entry(cache_key, item, expires_in, parse)
+
+            if entry is not None:
+                entries[cache_key] = entry
+
+        return entries
+
+    def _get_local_entry(self, cache_key: str) -> tuple[Any, float] | None:
+        value = self.local_cache.get(cache_key)
+
+        if value is NOT_FOUND:
+            observe_cache(cache_key, 'negative_hit')
+            return None, 0
+
+        if value is not None:
+            observe_cache(cache_key, 'local_hit')
+            return value, 0
+
+        return None
+
+    def _parse_entry(
+        self,
+        cache_key: str,
+        data: bytes | None,
+        expires_in: int,
+        parse: Callable[[bytes], Any]
+    ) -> tuple[Any, float] | None:
+        """Parse data read from Redis into an object and its staleness."""
+
+        if not data:
+            observe_cache(cache_key, 'miss')
+            return None
+
+        if data == NOT_FOUND:
+            observe_cache(cache_key, 'negative_hit')
+
+            if self.local_cache is not None:
+                self.local_cache.set(cache_key, NOT_FOUND, len(data))
+
+            return None, 0
+
+        with phase('decode'):
+            value = parse(data)
+
+        stale_for = 0
+
+        # The soft expiry is the time left to live less the stale window.
+        if expires_in >= 0:
+            stale_for = STALE_EXTRA_SECONDS - expires_in / 1000
+
+        if stale_for > 0:
+            observe_cache(cache_key, 'stale')
+        else:
+            observe_cache(cache_key, 'hit')
+
+            if self.local_cache is not None:
+                self.local_cache.set(cache_key, value, len(data))
+
+        return value, stale_for
+
+    async def _get_or_load(
+        self,
+        cache_key: str,
+        parse: Callable[[bytes], Any],
+        load: Callable[[], Awaitable[Any]],
+        recheck: Callable[[], Awaitable[Any]] | None = None
+    ) -> Any:
+        """Return a cached object or the result of `load` caching it.
+
+        An object stale for less than the stale-while-revalidate window
+        is returned at once while `load` refreshes it in the background.
+        An object stale for less than the stale-if-error window
+        is returned if `load` fails to reach ElasticSearch, and any
+        cached object while the circuit breaker is open, the request
+        is rejected by admission control or the rate limit, or its time
+        budget is spent waiting for `load`. Both mark
+        the response as degraded.
+        """
+
+        entry = await self._get_cached_entry(cache_key, parse)
+
+        if entry is not None:
+            value, stale_for = entry
+
+            if stale_for <= 0:
+                return value
+
+            if stale_for <= STALE_WHILE_REVALIDATE_SECONDS:
+                stale_stats['stale_served'] += 1
+                self._revalidate(cache_key, load, recheck)
+
+                return value
+
+        try:
+            # The load is shared, so it goes on after the budget of
+            # this request is spent to cache the object for the others.
+            async with within_deadline():
+                await self._charge_load()
+                return await self.single_flight.do(cache_key, load, recheck)
+        except (ApiError, TransportError, *REJECTIONS) as exc:
+            if entry is None or (
+                entry[1] > STALE_IF_ERROR_SECONDS
+                and not isinstance(exc, REJECTIONS)
+            ):
+                raise
+
+            logging.warning('Serving stale %s: %s', cache_key, exc)
+            stale_stats['stale_if_error_served'] += 1
+            mark_degraded('stale')
+
+            return entry[0]
+
+    async def _get_or_load_many(
+        self,
+        cache_keys: list[str],
+        parse: Callable[[bytes], Any],
+        load: Callable[[list[str]], Awaitable[dict[str, Any]]]
+    ) -> dict[str, Any]:
+        """Return cached objects by keys, loading the others at once.
+
+        `load` takes the keys of the objects missing or stale in the cache
+        and not being loaded already, caches the objects it finds and
+        returns them by key. If it fails to reach ElasticSearch, stale
+        objects are returned as by `_get_or_load` and the response
+        is marked as degraded. Objects which do not exist are left out.
+        """
+
+        entries = await self._get_cached_entries(cache_keys, parse)
+        values = {
+            key: value
+            for key, (value, stale_for) in entries.items() if stale_for <= 0
+        }
+        missing = [key for key in cache_keys if key not in values]
+
+        if missing:
+            try:
+                async with within_deadline():
+                    await self._charge_load()
+                    values.update(
+                        await self.single_flight.do_many(missing, load)
+                    )
+            except (ApiError, TransportError, *REJECTIONS) as exc:
+                stale = {
+                    key: entries[key][0] for key in missing
+                    if key in entries and (
+                        entries[key][1] <= STALE_IF_ERROR_SECONDS
+                        or isinstance(exc, REJECTIONS)
+                    )
+                }
+
+                if not values and not stale:
+                    raise
+
+                logging.warning('Serving stale %s: %s', list(stale), exc)
+                stale_stats['stale_if_error_served'] += len(stale)
+                values.update(stale)
+
+                if stale:
+                    mark_degraded('stale')
+
+                if len(stale) < len(missing):
+                    mark_degraded('partial')
+
+        return {
+            key: values[key] for key in cache_keys
+            if values.get(key) is not None
+        }
+
+    @staticmethod
+    async def _charge_load() -> None:
+        """Check the limits of the current request before it starts
+        or joins a load, which runs outside of the request.
+        """
+
+        await rate_limiter.check_uncached()
+        await admit()
+
+    def _revalidate(
+        self,
+        cache_key: str,
+        load: Callable[[], Awaitable[Any]],
+        recheck: Callable[[], Awaitable[Any]] | None
+    ) -> None:
+        """Refresh a stale object in the background."""
+
+        task = asyncio.ensure_future(
+            self.single_flight.do(cache_key, load, recheck)
+        )
+        self._revalidations.add(task)
+        task.add_done_callback(self._revalidated)
+
+    def _revalidated(self, task: asyncio.Task) -> None:
+        self._revalidations.discard(task)
+
+        if task.cancelled():
+            return
+
+        exc = task.exception()
+
+        # Rejections are reported by the breaker and admission metrics.
+        if exc is not None and not isinstance(exc, REJECTIONS):
+            logging.error('Failed to refresh a stale object: %s', exc)
+
+    async def _put_cached(
+        self,
+        cache_key: str,
+        value: Any,
+        data: str,
+        expire: int
+    ) -> None:
+        """Save an object to Redis and to the local cache.
+
+        The object expires softly in `expire` seconds and is kept
+        in Redis past that to be served stale.
+        """
+
+        if self.local_cache is not None:
+            self.local_cache.set(cache_key, value, len(data))
+
+        async with self.redis.pipeline(transaction=True) as pipe:
+            pipe.set(cache_key, data, expire + STALE_EXTRA_SECONDS)
+            add_to_tags(pipe, cache_key)
+
+            # What is loaded is worth caching after the client gave up.
+            with no_deadline():
+                await pipe.execute()
+
+    async def _put_many_cached(
+        self,
+        entries: list[tuple[str, Any, str]],
+        expire: int
+    ) -> None:
+        """Save objects given as (key, object, data) with one round trip."""
+
+        async with self.redis.pipeline(transaction=True) as pipe:
+            for cache_key, value, data in entries:
+                if self.local_cache is not None:
+                    self.local_cache.set(cache_key, value, len(data))
+
+                pipe.set(cache_key, data, expire + STALE_EXTRA_SECONDS)
+                add_to_tags(pipe, cache_key)
+
+            with no_deadline():
+                await pipe.execute()
+
+    async def _put_not_found(self, cache_key: str) -> None:
+        """Remember for a short time that an object does not exist.
+
+        The entry is kept under the key of the object, so that the ETL
+        invalidation drops it as soon as the object is indexed.
+        At most NEGATIVE_CACHE_MAX_ENTRIES are written per expiry
+        period, not to let random ids flood Redis.
+        """
+
+        await self._put_many_not_found([cache_key])
+
+    async def _put_many_not_found(self, cache_keys: list[str]) -> None:
+        """Remember that objects do not exist, as `_put_not_found` does,
+        with two round trips.
+        """
+
+        if not cache_keys:
+            return
+
+        with no_deadline():
+            await self._put_not_found_entries(cache_keys)
+
+    async def _put_not_found_entries(self, cache_keys: list[str]) -> None:
+        async with self.redis.pipeline(transaction=False) as pipe:
+            pipe.set(
+                NOT_FOUND_BUDGET_KEY,
+                0,
+                ex=NEGATIVE_CACHE_EXPIRES_IN_SECONDS,
+                nx=True
+            )
+            pipe.incrby(NOT_FOUND_BUDGET_KEY, len(cache_keys))
+            _, written = await pipe.execute()
+
+        allowed = len(cache_keys) - max(
+            written - NEGATIVE_CACHE_MAX_ENTRIES, 0
+        )
+
+        if allowed <= 0:
+            return
+
+        async with self.redis.pipeline(transaction=True) as pipe:
+            for cache_key in cache_keys[:allowed]:
+                if self.local_cache is not None:
+                    self.local_cache.set(cache_key, NOT_FOUND, len(NOT_FOUND))
+
+                # Do not overwrite an object cached meanwhile.
+                pipe.set(
+                    cache_key,
+                    NOT_FOUND,
+                    NEGATIVE_CACHE_EXPIRES_IN_SECONDS,
+                    nx=True
+                )
+                add_to_tags(pipe, cache_key)
+
+            await pipe.execute()
+
+
+class InstrumentedPipeline(Pipeline):
+    """A Redis pipeline measuring latency of its executions
+    and waiting for at most the rest of the request budget.
+    """
+
+    async def execute(self, raise_on_error: bool = True) -> list:
+        async with within_deadline():
+            with observe_call(
+                REDIS_LATENCY, REDIS_ERRORS, 'PIPELINE', 'redis'
+            ):
+                return await super().execute(raise_on_error)
+
+
+class InstrumentedRedis(Redis):
+    """A Redis client measuring latency of commands
+    and waiting for at most the rest of the request budget.
+    """
+
+    async def execute_command(self, *args, **options):
+        async with within_deadline():
+            with observe_call(
+                REDIS_LATENCY, REDIS_ERRORS, str(args[0]), 'redis'
+            ):
+                return await super().execute_command(*args, **options)
+
+    def pipeline(
+        self,
+        transaction: bool = True,
+        shard_hint: str | None = None
+    ) -> Pipeline:
+        return InstrumentedPipeline(
+            self.connection_pool,
+            self.response_callbacks,
+            transaction,
+            shard_hint
+        )
+
+
+# Commands wait for a free connection rather than failing
+# when all of them are busy.
+redis: Redis = InstrumentedRedis(
+    connection_pool=BlockingConnectionPool(
+        host=settings.REDIS_HOST,
+        port=settings.REDIS_PORT,
+        max_connections=settings.REDIS_MAX_CONNECTIONS,
+        timeout=settings.REDIS_POOL_TIMEOUT,
+        socket_timeout=settings.REDIS_SOCKET_TIMEOUT,
+        socket_connect_timeout=settings.REDIS_SOCKET_CONNECT_TIMEOUT,
+        socket_keepalive=settings.REDIS_SOCKET_KEEPALIVE,
+        retry_on_timeout=settings.REDIS_RETRY_ON_TIMEOUT,
+        health_check_interval=settings.REDIS_HEALTH_CHECK_INTERVAL,
+    )
+)
+
+rate_limiter = RateLimiter(redis)
+
+
+def pool_stats() -> dict | None:
+    """Return usage of the Redis connection pool.
+
+    Counts the pool does not expose are read from its private
+    attributes, as zero if missing.
+    """
+
+    pool = redis.connection_pool
+
+    if not isinstance(pool, BlockingConnectionPool):
+        return None
+
+    # The queue holds idle connections and slots for new ones.
+    in_use = pool.max_connections - pool.pool.qsize()
+
+    return {
+        'in_use': in_use,
+        'idle': max(len(getattr(pool, '_connections', ())) - in_use, 0),
+        'waiting': len(getattr(pool.pool, '_getters', ())),
+        'max': pool.max_connections,
+    }
 
 
 async def get_redis() -> Redis:
@@ -1,23 +1,70 @@
+import asyncio
 import logging
+import math
+from contextlib import asynccontextmanager
 
 import uvicorn
-from elasticsearch import AsyncElasticsearch
 from fastapi import FastAPI, Request, status
 from fastapi.exceptions import RequestValidationError
 from fastapi.responses import ORJSONResponse
-from redis.asyncio import Redis
 
-from api.v1 import films, genres, persons
+from api.v1 import admin, cache, films, genres, persons
+from core.admission import AdmissionMiddleware, OverloadedError
+from core.compression import CompressionMiddleware
 from core.config import settings
+from core.deadline import DeadlineExceededError, DeadlineMiddleware
+from core.degraded import DegradedMiddleware
 from core.logger import LOGGING
+from core.metrics import MetricsMiddleware, metrics
+from core.rate_limit import RateLimitedError, RateLimitMiddleware
+from core.timing import SlowRequestMiddleware
 from db import elastic, redis
+from services.cache_invalidation import cache_invalidator
+from services.warmup import cache_warmer
+from utils.circuit_breaker import CircuitOpenError
+from utils.constants import (REQUEST_TIMED_OUT, SEARCH_UNAVAILABLE,
+                             SERVICE_OVERLOADED, TOO_MANY_REQUESTS)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # The clients are created once per process in the db modules,
+    # the services hold them; here they are only closed.
+    tasks = []
+
+    if settings.CACHE_INVALIDATION_ENABLED:
+        tasks.append(asyncio.create_task(cache_invalidator.run()))
+
+    # Warm up in the background not to delay readiness.
+    if settings.WARMUP_ON_STARTUP:
+        tasks.append(asyncio.create_task(cache_warmer.run()))
+
+    yield
+
+    for task in tasks:
+        task.cancel()
+
+    # Not to leave them pending when the loop closes.
+    await asyncio.gather(*tasks, return_exceptions=True)
+    await redis.redis.close(close_connection_pool=True)
+    await elastic.elastic.close()
+
 
 app = FastAPI(
     title=settings.PROJECT_NAME,
+    lifespan=lifespan,
     docs_url='/api/openapi',
     openapi_url='/api/openapi.json',
     default_response_class=ORJSONResponse,
 )
+app.add_middleware(AdmissionMiddleware)
+app.add_middleware(CompressionMiddleware)
+app.add_middleware(SlowRequestMiddleware)
+app.add_middleware(MetricsMiddleware)
+app.add_middleware(DegradedMiddleware)
+app.add_middleware(DeadlineMiddleware)
+app.add_middleware(RateLimitMiddleware)
+app.add_route('/metrics', metrics, include_in_schema=False)
 
 
 # Return 400 BAD_REQUEST instead of 422 HTTP_UNPROCESSABLE_ENTITY
@@ -31,22 +78,51 @@ async def validation_exception_handler(
     )
 
 
-@app.on_event('startup')
-async def startup():
-    redis.redis = Redis(host=settings.REDIS_HOST, port=settings.REDIS_PORT)
-    elastic.es = AsyncElasticsearch(
-        hosts=[
-            f'{settings.ELASTIC_SCHEME}://'
-            f'{settings.ELASTIC_HOST}'
-            f':{settings.ELASTIC_PORT}'
-        ]
+# ElasticSearch is down and nothing is cached: fail fast with 503
+@app.exception_handler(CircuitOpenError)
+async def circuit_open_exception_handler(
+    request: Request, exc: CircuitOpenError
+) -> ORJSONResponse:
+    return ORJSONResponse(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        content={"detail": SEARCH_UNAVAILABLE},
+        headers={'Retry-After': str(max(math.ceil(exc.retry_after), 1))},
     )
 
 
-@app.on_event('shutdown')
-async def shutdown():
-    await redis.redis.close()
-    await elastic.es.close()
+# Too many requests wait for ElasticSearch: shed the load with 503
+@app.exception_handler(OverloadedError)
+async def overloaded_exception_handler(
+    request: Request, exc: OverloadedError
+) -> ORJSONResponse:
+    return ORJSONResponse(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        content={"detail": SERVICE_OVERLOADED},
+        headers={'Retry-After': str(max(math.ceil(exc.retry_after), 1))},
+    )
+
+
+# The client has run out of its budget: 429 until it refills
+@app.exception_handler(RateLimitedError)
+async def rate_limited_exception_handler(
+    request: Request, exc: RateLimitedError
+) -> ORJSONResponse:
+    return ORJSONResponse(
+        status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+        content={"detail": TOO_MANY_REQUESTS},
+        headers={'Retry-After': str(max(math.ceil(exc.retry_after), 1))},
+    )
+
+
+# The time budget is spent and nothing is cached: give up with 504
+@app.exception_handler(DeadlineExceededError)
+async def deadline_exceeded_exception_handler(
+    request: Request, exc: DeadlineExceededError
+) -> ORJSONResponse:
+    return ORJSONResponse(
+        status_code=status.HTTP_504_GATEWAY_TIMEOUT,
+        content={"detail": REQUEST_TIMED_OUT},
+    )
 
 
 # Подключаем роутер к серверу, указав префикс /v1/films
@@ -54,6 +130,8 @@ async def shutdown():
 app.include_router(films.router, prefix='/api/v1/films', tags=['films'])
 app.include_router(genres.router, prefix='/api/v1/genres', tags=['genres'])
 app.include_router(persons.router, prefix='/api/v1/persons', tags=['persons'])
+app.include_router(cache.router, prefix='/api/v1/cache', tags=['cache'])
+app.include_router(admin.router, prefix='/api/v1/admin', tags=['admin'])
 
 if __name__ == '__main__':
     uvicorn.run(
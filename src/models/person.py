@@ -1,3 +1,5 @@
+from pydantic import Field
+
 from models.film import FilmPersonRoles
 from models.mixins import UUIDMixin, ORJSONMixin
 
@@ -14,4 +16,4 @@ class PersonFull(ORJSONMixin, UUIDMixin):
 
     """
     full_name: str
-    films: list[FilmPersonRoles]
+    films: list[FilmPersonRoles] = Field(default=[])
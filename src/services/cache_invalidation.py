@@ -0,0 +1,249 @@
+import asyncio
+import json
+import logging
+import os
+import socket
+
+from redis.asyncio import Redis
+from redis.exceptions import RedisError, ResponseError
+
+from core.config import settings
+from db.local_cache import LocalCache, local_cache
+from db.redis import redis
+from services.warmup import CacheWarmer, cache_warmer
+from utils.cache_tags import (ENTITY_KEYS, TAGGED_KEYS, entity_tag_key,
+                              tag_key)
+
+# Blocking reads must return before the socket timeout.
+READ_BLOCK_IN_MILLISECONDS = int(settings.REDIS_SOCKET_TIMEOUT * 1000 / 2)
+READ_BATCH_SIZE = 100
+RETRY_PAUSE_IN_SECONDS = 1
+# Events read by a worker which has gone away are taken over
+# after this long.
+CLAIM_IDLE_IN_MILLISECONDS = 60_000
+
+# Keys of the entities of each kind by their ids. Keys derived
+# from them are dropped by the sets of the entities.
+DEPENDENT_KEYS = {
+    'film': ('film:{id}',),
+    'person': ('person:{id}', 'person_films:{id}'),
+    'genre': ('genre:{id}',),
+}
+
+# Tags of the cache keys dropped on any change of an entity of each kind.
+DEPENDENT_TAGS = {
+    'film': ('films', 'person_films'),
+    'person': ('persons',),
+    'genre': ('genres',),
+}
+
+# Drops the members of the tag sets KEYS along with the sets at once,
+# so that no key is tagged in between and left behind. Returns
+# the number of keys dropped.
+DROP_TAGGED_SCRIPT = """
+local dropped = 0
+
+for _, tag in ipairs(KEYS) do
+    local keys = redis.call('SMEMBERS', tag)
+
+    for i = 1, #keys, 1000 do
+        redis.call('UNLINK', unpack(keys, i, math.min(i + 999, #keys)))
+    end
+
+    dropped = dropped + #keys
+    redis.call('DEL', tag)
+end
+
+return dropped
+"""
+
+
+class CacheInvalidator:
+    """Class to represent a consumer of cache invalidation events.
+
+    The ETL publishes ids of the films, persons and genres it loads
+    to a Redis stream. The workers share the events in a consumer
+    group to drop the dependent keys from Redis once, while every
+    worker reads all of them to drop its in-process cache.
+    """
+
+    def __init__(
+        self,
+        redis: Redis,
+        local_cache: LocalCache | None,
+        stream: str,
+        group: str,
+        warmer: CacheWarmer | None = None
+    ) -> None:
+        self.redis = redis
+        self.local_cache = local_cache
+        self.stream = stream
+        self.group = group
+        self.consumer = f'{socket.gethostname()}:{os.getpid()}'
+        self.warmer = warmer
+        self.drop_tagged = redis.register_script(DROP_TAGGED_SCRIPT)
+        self._warmup: asyncio.Task | None = None
+
+    async def run(self) -> None:
+        """Consume events published after the start until cancelled."""
+
+        consumers = [self._consume_shared()]
+
+        if self.local_cache is not None:
+            consumers.append(self._consume_local())
+
+        await asyncio.gather(*consumers)
+
+    async def _consume_shared(self) -> None:
+        """Drop keys from Redis on the events of the consumer group."""
+
+        # Events published before the first start are not replayed.
+        group_start = '$'
+        group_created = False
+        invalidated = False
+
+        while True:
+            try:
+                if not group_created:
+                    await self._create_group(group_start)
+                    group_created = True
+
+                response = await self.redis.xreadgroup(
+                    self.group,
+                    self.consumer,
+                    {self.stream: '>'},
+                    count=READ_BATCH_SIZE,
+                    block=READ_BLOCK_IN_MILLISECONDS
+                )
+                messages = [
+                    message
+                    for _, stream_messages in response
+                    for message in stream_messages
+                ]
+
+                if not messages:
+                    _, messages, *_ = await self.redis.xautoclaim(
+                        self.stream,
+                        self.group,
+                        self.consumer,
+                        min_idle_time=CLAIM_IDLE_IN_MILLISECONDS,
+                        count=READ_BATCH_SIZE
+                    )
+
+                if not messages and invalidated:
+                    # The ETL has been quiet for a while: warm up
+                    # the caches dropped by its last loads.
+                    invalidated = False
+                    self._warm_up()
+
+                for message_id, fields in messages:
+                    await self.invalidate(*self._parse(fields))
+                    await self.redis.xack(self.stream, self.group, message_id)
+                    invalidated = True
+            except asyncio.CancelledError:
+                raise
+            except (RedisError, KeyError, ValueError) as exc:
+                logging.exception('Cache invalidation failed: %s', exc)
+
+                if str(exc).startswith('NOGROUP'):
+                    # Redis has lost its data: the stream, if any,
+                    # only holds events published since.
+                    group_start = '0'
+                    group_created = False
+
+                await asyncio.sleep(RETRY_PAUSE_IN_SECONDS)
+
+    async def _consume_local(self) -> None:
+        """Drop keys from the in-process cache on every event."""
+
+        last_id = '$'
+
+        while True:
+            try:
+                response = await self.redis.xread(
+                    {self.stream: last_id},
+                    count=READ_BATCH_SIZE,
+                    block=READ_BLOCK_IN_MILLISECONDS
+                )
+
+                for _, messages in response:
+                    for message_id, fields in messages:
+                        last_id = message_id
+                        self.drop_local(*self._parse(fields))
+            except asyncio.CancelledError:
+                raise
+            except (RedisError, KeyError, ValueError) as exc:
+                logging.exception('Local cache invalidation failed: %s', exc)
+                await asyncio.sleep(RETRY_PAUSE_IN_SECONDS)
+
+    async def _create_group(self, start_id: str) -> None:
+        try:
+            await self.redis.xgroup_create(
+                self.stream, self.group, id=start_id, mkstream=True
+            )
+        except ResponseError as exc:
+            if not str(exc).startswith('BUSYGROUP'):
+                raise
+
+    @staticmethod
+    def _parse(fields: dict[bytes, bytes]) -> tuple[str, list[str]]:
+        return fields[b'entity'].decode(), json.loads(fields[b'ids'])
+
+    def _warm_up(self) -> None:
+        """Start the warm-up unless disabled or already running."""
+
+        if self.warmer is None or (
+            self._warmup is not None and not self._warmup.done()
+        ):
+            return
+
+        self._warmup = asyncio.create_task(self.warmer.run())
+
+    async def invalidate(self, entity: str, ids: list[str]) -> None:
+        """Drop Redis keys depending on the entities given."""
+
+        keys = self._entity_keys(entity, ids)
+        tags = [
+            entity_tag_key(entity, id_) for id_ in ids
+        ] + [tag_key(tag) for tag in DEPENDENT_TAGS.get(entity, ())]
+
+        if keys:
+            await self.redis.unlink(*keys)
+
+        dropped = await self.drop_tagged(tags)
+
+        logging.info(
+            'Cache invalidated for %d %s entities: %d keys dropped',
+            len(ids), entity, len(keys) + dropped
+        )
+
+    def drop_local(self, entity: str, ids: list[str]) -> None:
+        """Drop in-process cache keys depending on the entities given."""
+
+        patterns = self._entity_keys(entity, ids) | {
+            pattern.format(id=id_)
+            for pattern in ENTITY_KEYS.get(entity, ())
+            for id_ in ids
+        }
+
+        for tag in DEPENDENT_TAGS.get(entity, ()):
+            patterns.update(TAGGED_KEYS[tag])
+
+        self.local_cache.delete_matching(*patterns)
+
+    @staticmethod
+    def _entity_keys(entity: str, ids: list[str]) -> set[str]:
+        return {
+            pattern.format(id=id_)
+            for pattern in DEPENDENT_KEYS.get(entity, ())
+            for id_ in ids
+        }
+
+
+cache_invalidator = CacheInvalidator(
+    redis,
+    local_cache,
+    settings.CACHE_INVALIDATION_STREAM,
+    settings.CACHE_INVALIDATION_GROUP,
+    cache_warmer if settings.WARMUP_AFTER_INVALIDATION else None
+)
@@ -1,19 +1,64 @@
 import json
+import logging
+import time
 from functools import lru_cache
+from operator import itemgetter
+from typing import Callable
 from uuid import UUID
 
 from elasticsearch import AsyncElasticsearch, NotFoundError
 from fastapi import Depends
+from redis.exceptions import RedisError
 
 from core.config import settings
-from db.elastic import AsyncSearchAbstract, elastic, get_elastic
-from db.redis import AsyncCacheAbstract, get_redis, redis
+from core.deadline import no_deadline
+from db.elastic import (HITS_FILTER_PATH, AsyncSearchAbstract, elastic,
+                        get_elastic)
+from db.local_cache import local_cache
+from db.redis import (AsyncCacheAbstract, RedisCacheBase, get_redis,
+                      redis)
 from models.models import FilmFull, FilmShort
-from redis.asyncio import Redis
+from utils.cursor import search_after
+from utils.fields import include_fields
+from utils.film_ranking import (RANKED_FILMS_SCRIPT, READY_KEY,
+                                SHORT_FILMS_KEY, ranking_key)
+from utils.list_window import WINDOW_SIZE, get_page, normalize_query
+from utils.search_films import SHORT_FILM_FIELDS
+from utils.single_flight import SingleFlight
 
 
 FILM_CACHE_EXPIRE_IN_SECONDS = settings.REDIS_CACHE_EXPIRES_IN_SECONDS
+FILM_RANKING_ENABLED = settings.FILM_RANKING_ENABLED
 INDEX_NAME = settings.ES_MOVIE_INDEX
+SEARCH_QUERIES_KEY = 'search_queries'
+SEARCH_QUERIES_MAX_COUNT = 10_000
+# The least frequent queries are trimmed once the count is exceeded
+# by a tenth, so that a new query gets more than one hit to make it.
+SEARCH_QUERIES_TRIM_COUNT = SEARCH_QUERIES_MAX_COUNT * 11 // 10
+# Queries are counted per period, so that queries frequent long ago
+# give way to the new ones.
+SEARCH_QUERIES_PERIOD_SECONDS = 60 * 60
+
+
+def search_queries_key(period: int) -> str:
+    """Return the key of the search query counts of a period."""
+
+    return f'{SEARCH_QUERIES_KEY}:{period}'
+
+
+def search_queries_period() -> int:
+    """Return the number of the current search query counting period."""
+
+    return int(time.time() // SEARCH_QUERIES_PERIOD_SECONDS)
+
+
+def film_key(film_id: str, fields: tuple[str, ...] | None = None) -> str:
+    """Return the cache key of a film or of the fields given of it."""
+
+    if fields is None:
+        return f'film:{film_id}'
+
+    return f'film:{film_id}:{",".join(fields)}'
 
 
 class ElasticService(AsyncSearchAbstract):
@@ -23,15 +68,38 @@ class ElasticService(AsyncSearchAbstract):
         self.elastic = elastic
         self.index_name = index_name
 
-    async def _get_single_object(self, film_id: str) -> FilmFull | None:
-        """Retrieve a film instance from Elasticsearch DB."""
+    async def _get_single_object(
+        self,
+        film_id: str,
+        fields: tuple[str, ...] | None = None
+    ) -> FilmFull | None:
+        """Retrieve a film instance, or the fields given of it,
+        from Elasticsearch DB.
+        """
 
         try:
-            doc = await self.elastic.get(index=self.index_name, id=film_id)
+            doc = await self.elastic.get(
+                index=self.index_name, id=film_id, source_includes=fields
+            )
         except NotFoundError:
             return None
+
+        if fields is not None:
+            # A part of a film can not be validated.
+            return FilmFull.construct(**doc['_source'])
+
         return FilmFull(**doc['_source'])
 
+    async def _get_many_objects(self, film_ids: list[str]) -> list[FilmFull]:
+        """Retrieve the films found by IDs with a single request."""
+
+        result = await self.elastic.mget(index=self.index_name, ids=film_ids)
+
+        return [
+            FilmFull(**doc['_source'])
+            for doc in result['docs'] if doc.get('found')
+        ]
+
     async def _get_list_of_objects(
         self,
         search_query: dict
@@ -40,95 +108,170 @@ class ElasticService(AsyncSearchAbstract):
 
         result = await self.elastic.search(
             index=self.index_name,
-            body=search_query
+            body=search_query,
+            source_includes=SHORT_FILM_FIELDS,
+            filter_path=HITS_FILTER_PATH
         )
         total = result['hits']['total']['value']
-        hits = result['hits']['hits']
+        hits = result['hits'].get('hits', [])
 
-        if not hits:
-            return total, []
+        return total, [FilmShort.construct(**hit['_source']) for hit in hits]
 
-        try:
-            films = [hits[i]['_source'] for i in range(search_query['size'])]
-        except IndexError:
-            films = [hit['_source'] for hit in hits]
+    async def _get_list_after(
+        self,
+        search_query: dict,
+        size: int,
+        cursor: str
+    ) -> tuple[int, list[FilmShort], str | None]:
+        """Return a page of movies following the cursor."""
+
+        total, hits, next_cursor = await search_after(
+            self.elastic,
+            self.index_name,
+            {**search_query, '_source': SHORT_FILM_FIELDS},
+            size,
+            cursor
+        )
 
-        return total, [FilmShort(**film) for film in films]
+        films = [FilmShort.construct(**hit['_source']) for hit in hits]
 
+        return total, films, next_cursor
 
-class RedisService(AsyncCacheAbstract):
-    """Class to represent cache service with Redis."""
 
-    def __init__(self, redis: Redis):
-        self.redis = redis
+class RedisService(RedisCacheBase):
+    """Class to represent cache service with Redis."""
 
-    async def _get_single_object(self, film_id: str) -> FilmFull | None:
+    async def _get_single_object(
+        self,
+        film_id: str,
+        fields: tuple[str, ...] | None = None
+    ) -> FilmFull | None:
         """Retrieve a film instance from Redis cache. """
 
-        cache_key = f'film:{film_id}'
-        data = await self.redis.get(cache_key)
+        return await self._get_cached(
+            film_key(film_id, fields), self._film_parser(fields)
+        )
 
-        if not data:
-            return None
+    @staticmethod
+    def _film_parser(
+        fields: tuple[str, ...] | None
+    ) -> Callable[[bytes], FilmFull]:
+        """Return a parser of a cached film or of its fields given."""
 
-        return FilmFull.parse_raw(data)
+        if fields is None:
+            return FilmFull.parse_raw
+
+        return lambda data: FilmFull.construct(**json.loads(data))
 
     async def _get_list_of_objects(
         self,
-        page: int,
-        size: int,
-        query: str = None,
-        genre: UUID = None
+        list_key: str,
+        window: int
     ) -> tuple[int, list[FilmShort]]:
-        """Retrieve films from Redis cache. """
+        """Retrieve a window of a film list from Redis cache. """
 
-        cache_key = f'films:{page}:{size}:{query}:{genre}'
-        data = await self.redis.get(cache_key)
+        cache_key = f'films:{list_key}:{window}'
+        data = await self._get_cached(cache_key, self._parse_films)
 
         if not data:
             return 0, None
 
+        return data
+
+    @staticmethod
+    def _parse_films(data: bytes) -> tuple[int, list[FilmShort]]:
+        """Parse cached films data."""
+
         films_data = json.loads(data)
         films = [FilmShort.parse_raw(film) for film in films_data['films']]
         total = films_data['total']
 
         return total, films
 
-    async def _put_single_object(self, film: FilmFull):
-        """Save a film instance to Redis cache."""
+    async def _get_ranked_films(
+        self,
+        genre: UUID | None,
+        start: int,
+        stop: int
+    ) -> tuple[int, list[FilmShort]] | None:
+        """Retrieve the films ranked from `start` to `stop` by rating,
+        of a genre or of all, from the rankings kept by the ETL.
+
+        Returns None if the rankings are not built yet or Redis fails.
+        """
 
-        cache_key = f'film:{str(film.id)}'
+        try:
+            reply = await ranked_films(
+                [
+                    ranking_key(str(genre) if genre else None),
+                    SHORT_FILMS_KEY,
+                    READY_KEY,
+                ],
+                [start, stop]
+            )
+        except RedisError as exc:
+            logging.warning('Failed to read the film rankings: %s', exc)
+            return None
+
+        if reply is None:
+            return None
+
+        total, films = reply
+
+        return total, [
+            FilmShort.parse_raw(film) for film in films if film is not None
+        ]
+
+    async def _put_single_object(
+        self,
+        film: FilmFull,
+        fields: tuple[str, ...] | None = None
+    ):
+        """Save a film instance, or the fields given of it,
+        to Redis cache.
+        """
 
-        await self.redis.set(
-            cache_key,
-            film.json(),
+        await self._put_cached(
+            film_key(str(film.id), fields),
+            film,
+            film.json(include=include_fields(fields)),
+            FILM_CACHE_EXPIRE_IN_SECONDS
+        )
+
+    async def _put_many_objects(self, films: list[FilmFull]) -> None:
+        """Save film instances to Redis cache with one round trip."""
+
+        await self._put_many_cached(
+            [(f'film:{film.id}', film, film.json()) for film in films],
             FILM_CACHE_EXPIRE_IN_SECONDS
         )
 
     async def _put_list_of_objects(
         self,
-        page: int,
-        size: int,
+        list_key: str,
+        window: int,
         total: int,
-        films: list[FilmShort],
-        query: str = None,
-        genre: UUID = None
+        films: list[FilmShort]
     ) -> None:
-        """Save films to Redis cache."""
+        """Save a window of a film list to Redis cache."""
 
-        cache_key = f'films:{page}:{size}:{query}:{genre}'
+        cache_key = f'films:{list_key}:{window}'
         data = {
             'total': total,
             'films': [film.json() for film in films]
         }
         json_str = json.dumps(data)
 
-        await self.redis.set(
-            cache_key, json_str, FILM_CACHE_EXPIRE_IN_SECONDS
+        await self._put_cached(
+            cache_key, (total, films), json_str, FILM_CACHE_EXPIRE_IN_SECONDS
         )
 
 
-cache_service = RedisService(redis)
+single_flight = SingleFlight(
+    redis if settings.SINGLE_FLIGHT_REDIS_LOCK else None
+)
+cache_service = RedisService(redis, local_cache, single_flight)
+ranked_films = redis.register_script(RANKED_FILMS_SCRIPT)
 search_service = ElasticService(elastic, INDEX_NAME)
 
 
@@ -154,57 +297,27 @@ class FilmService:
         """
         Retrieve films instances to list films
         in accordance with filtration conditions.
-        """
-
-        total, films = await cache_service._get_list_of_objects(
-            page, size, genre
-        )
 
-        if not films:
-            start_index = (page - 1) * size
-
-            if not genre:
-                search_query = {
-                    "query": {"match_all": {}},
-                    "sort": [{"imdb_rating": {"order": "desc"}}],
-                    "from": start_index,
-                    "size": size
-                }
-            else:
-                search_query = {
-                    "query": {
-                        "nested": {
-                            "path": "genres",
-                            "query": {
-                                "bool": {
-                                    "filter": [
-                                        {
-                                            "term": {"genres.id": genre}
-                                        }
-                                    ]
-                                }
-                            }
-                        }
-                    },
-                    "sort": [{"imdb_rating": {"order": "desc"}}],
-                    "from": start_index,
-                    "size": size
-                }
+        The page is read from the rankings of films the ETL keeps
+        in Redis, from ElasticSearch until they are built.
+        """
 
-            total, films = await search_service._get_list_of_objects(
-                search_query
+        if FILM_RANKING_ENABLED:
+            start = (page - 1) * size
+            ranked = await cache_service._get_ranked_films(
+                genre, start, start + size - 1
             )
 
-            if not films:
-                return 0, None
+            if ranked is not None:
+                return ranked if ranked[1] else (0, [])
 
-            await cache_service._put_list_of_objects(
-                page, size, total, films, genre
+        return await get_page(
+            page,
+            size,
+            lambda window: self._get_window(
+                f'genre:{genre}', self._films_query(genre), window
             )
-
-            return total, films
-
-        return total, films
+        )
 
     async def search_films(
         self,
@@ -217,49 +330,233 @@ class FilmService:
         in accordance with search conditions.
         """
 
-        total, films = await cache_service._get_list_of_objects(
-            page, size, query
+        return await get_page(
+            page,
+            size,
+            lambda window: self._get_window(
+                f'search:{normalize_query(query)}',
+                self._search_query(query),
+                window
+            )
+        )
+
+    async def count_search_query(self, query: str) -> None:
+        """Count the search query to warm up the most frequent ones.
+
+        Called after the response is sent, so a failure is only logged.
+        """
+
+        cache_key = search_queries_key(search_queries_period())
+
+        try:
+            with no_deadline():
+                async with redis.pipeline(transaction=False) as pipe:
+                    pipe.zincrby(cache_key, 1, normalize_query(query))
+                    pipe.expire(cache_key, SEARCH_QUERIES_PERIOD_SECONDS * 2)
+                    pipe.zcard(cache_key)
+                    *_, count = await pipe.execute()
+
+                if count > SEARCH_QUERIES_TRIM_COUNT:
+                    await redis.zremrangebyrank(
+                        cache_key, 0, -SEARCH_QUERIES_MAX_COUNT - 1
+                    )
+        except RedisError as exc:
+            logging.warning('Failed to count the search query: %s', exc)
+
+    async def get_frequent_search_queries(self, count: int) -> list[str]:
+        """Return the most frequent search queries of the current
+        and the previous periods.
+        """
+
+        period = search_queries_period()
+        queries = await redis.zunion(
+            [search_queries_key(period - 1), search_queries_key(period)],
+            withscores=True
         )
+        queries.sort(key=itemgetter(1), reverse=True)
+
+        return [query.decode() for query, _ in queries[:count]]
+
+    async def _get_window(
+        self,
+        list_key: str,
+        search_query: dict,
+        window: int
+    ) -> tuple[int, list[FilmShort]]:
+        """Retrieve a window of a film list."""
+
+        return await cache_service._get_or_load(
+            f'films:{list_key}:{window}',
+            cache_service._parse_films,
+            lambda: self._load_window(list_key, search_query, window),
+            recheck=lambda: self._recheck_window(list_key, window)
+        )
+
+    async def _load_window(
+        self,
+        list_key: str,
+        search_query: dict,
+        window: int
+    ) -> tuple[int, list[FilmShort]]:
+        """
+        Retrieve a window of a film list from Elasticsearch
+        and put it to the cache.
+        """
+
+        total, films = await search_service._get_list_of_objects({
+            **search_query,
+            "from": window * WINDOW_SIZE,
+            "size": WINDOW_SIZE
+        })
 
         if not films:
-            start_index = (page - 1) * size
-            search_query = {
-                "query": {"match": {"title": query}},
-                "sort": [
-                    {"_score": {"order": "desc"}},
-                    {"imdb_rating": {"order": "desc"}},
-                ],
-                "from": start_index,
-                "size": size
+            return 0, []
+
+        await cache_service._put_list_of_objects(
+            list_key, window, total, films
+        )
+
+        return total, films
+
+    async def _recheck_window(
+        self,
+        list_key: str,
+        window: int
+    ) -> tuple[int, list[FilmShort]] | None:
+        """Return a window of a film list cached by another worker."""
+
+        total, films = await cache_service._get_list_of_objects(
+            list_key, window
+        )
+
+        return (total, films) if films is not None else None
+
+    async def get_films_by_cursor(
+        self,
+        cursor: str,
+        size: int,
+        genre: UUID
+    ) -> tuple[int, list[FilmShort], str | None]:
+        """
+        Retrieve the page of films following the cursor
+        in accordance with filtration conditions.
+        """
+
+        return await search_service._get_list_after(
+            self._films_query(genre), size, cursor
+        )
+
+    async def search_films_by_cursor(
+        self,
+        cursor: str,
+        size: int,
+        query: str
+    ) -> tuple[int, list[FilmShort], str | None]:
+        """
+        Retrieve the page of films following the cursor
+        in accordance with search conditions.
+        """
+
+        return await search_service._get_list_after(
+            self._search_query(query), size, cursor
+        )
+
+    @staticmethod
+    def _films_query(genre: UUID) -> dict:
+        """Return a query to list films by genre sorted by rating."""
+
+        if not genre:
+            return {
+                "query": {"match_all": {}},
+                "sort": [{"imdb_rating": {"order": "desc"}}],
             }
 
-            total, films = await search_service._get_list_of_objects(
-                search_query
-            )
+        return {
+            "query": {
+                "nested": {
+                    "path": "genres",
+                    "query": {
+                        "bool": {
+                            "filter": [
+                                {
+                                    "term": {"genres.id": genre}
+                                }
+                            ]
+                        }
+                    }
+                }
+            },
+            "sort": [{"imdb_rating": {"order": "desc"}}],
+        }
 
-            if not films:
-                return 0, None
+    @staticmethod
+    def _search_query(query: str) -> dict:
+        """Return a query to search films by title."""
 
-            await cache_service._put_list_of_objects(
-                page, size, total, films, query
-            )
+        return {
+            "query": {"match": {"title": query}},
+            "sort": [
+                {"_score": {"order": "desc"}},
+                {"imdb_rating": {"order": "desc"}},
+            ],
+        }
 
-            return total, films
+    async def get_by_id(
+        self,
+        film_id: str,
+        fields: tuple[str, ...] | None = None
+    ) -> FilmFull | None:
+        """
+        Return a film instance in accordance with ID given,
+        only the fields given of it if any.
+        """
 
-        return total, films
+        return await cache_service._get_or_load(
+            film_key(film_id, fields),
+            cache_service._film_parser(fields),
+            lambda: self._load_film(film_id, fields),
+            recheck=lambda: cache_service._get_single_object(film_id, fields)
+        )
+
+    async def get_by_ids(self, film_ids: list[str]) -> list[FilmFull]:
+        """Return the film instances found by the IDs given in order."""
 
-    async def get_by_id(self, film_id: str) -> FilmFull | None:
-        """Return a film instance in accordance with ID given."""
+        films = await cache_service._get_or_load_many(
+            [f'film:{film_id}' for film_id in film_ids],
+            FilmFull.parse_raw,
+            self._load_films
+        )
 
-        film = await cache_service._get_single_object(film_id)
+        return list(films.values())
 
-        if not film:
-            film = await search_service._get_single_object(film_id)
+    async def _load_films(self, cache_keys: list[str]) -> dict[str, FilmFull]:
+        """Retrieve films from Elasticsearch and put them to the cache."""
 
-            if not film:
-                return None
+        films = await search_service._get_many_objects(
+            [cache_key.removeprefix('film:') for cache_key in cache_keys]
+        )
+        found = {f'film:{film.id}': film for film in films}
+        await cache_service._put_many_objects(films)
+        await cache_service._put_many_not_found(
+            [cache_key for cache_key in cache_keys if cache_key not in found]
+        )
+
+        return found
+
+    async def _load_film(
+        self,
+        film_id: str,
+        fields: tuple[str, ...] | None = None
+    ) -> FilmFull | None:
+        """Retrieve a film from Elasticsearch and put it to the cache."""
+
+        film = await search_service._get_single_object(film_id, fields)
+
+        if not film:
+            await cache_service._put_not_found(film_key(film_id, fields))
+            return None
 
-            await cache_service._put_single_object(film)
+        await cache_service._put_single_object(film, fields)
 
         return film
 
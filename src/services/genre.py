@@ -2,17 +2,26 @@ import json
 import logging
 from functools import lru_cache
 
-from elasticsearch import AsyncElasticsearch, NotFoundError
+from elasticsearch import (ApiError, AsyncElasticsearch, NotFoundError,
+                           TransportError)
 from fastapi import Depends
 
 from core.config import settings
-from db.elastic import AsyncSearchAbstract, elastic, get_elastic
-from db.redis import AsyncCacheAbstract, get_redis, redis
+from core.degraded import mark_degraded
+from db.elastic import (HITS_FILTER_PATH, AsyncSearchAbstract, elastic,
+                        get_elastic)
+from db.local_cache import local_cache
+from db.redis import (AsyncCacheAbstract, RedisCacheBase, get_redis,
+                      redis)
 from models.genre import Genre
 from redis.asyncio import Redis
+from utils.cursor import search_after
+from utils.list_window import WINDOW_SIZE, get_page
+from utils.single_flight import SingleFlight
 
 GENRE_CACHE_EXPIRE_IN_SECONDS = settings.REDIS_CACHE_EXPIRES_IN_SECONDS
 INDEX_NAME = settings.ES_GENRE_INDEX
+GENRE_FIELDS = ['id', 'name']
 
 
 class ElasticService(AsyncSearchAbstract):
@@ -43,91 +52,108 @@ class ElasticService(AsyncSearchAbstract):
 
         result = await self.elastic.search(
             index=self.index_name,
-            body=search_query
+            body=search_query,
+            source_includes=GENRE_FIELDS,
+            filter_path=HITS_FILTER_PATH
         )
         total = result['hits']['total']['value']
-        hits = result['hits']['hits']
+        hits = result['hits'].get('hits', [])
 
-        if not hits:
-            return total, []
+        return total, [Genre.construct(**hit['_source']) for hit in hits]
 
-        try:
-            genres = [hits[i]['_source'] for i in range(search_query['size'])]
-        except IndexError:
-            genres = [hit['_source'] for hit in hits]
+    async def _get_list_after(
+        self,
+        search_query: dict,
+        size: int,
+        cursor: str
+    ) -> tuple[int, list[Genre], str | None]:
+        """
+        Request to ElasticSearch to get the page of genres
+        following the cursor.
+        """
 
-        return total, [Genre(**genre) for genre in genres]
+        total, hits, next_cursor = await search_after(
+            self.elastic,
+            self.index_name,
+            {**search_query, '_source': GENRE_FIELDS},
+            size,
+            cursor
+        )
+        genres = [Genre.construct(**hit['_source']) for hit in hits]
 
+        return total, genres, next_cursor
 
-class RedisService(AsyncCacheAbstract):
-    """Class to represent cache service with Redis."""
 
-    def __init__(self, redis: Redis):
-        self.redis = redis
+class RedisService(RedisCacheBase):
+    """Class to represent cache service with Redis."""
 
     async def _get_single_object(self, genre_id: str) -> Genre | None:
         """Request to Redis to get genre data from the cache."""
 
         cache_key = f'genre:{genre_id}'
-        data = await self.redis.get(cache_key)
-
-        if not data:
-            return None
 
-        return Genre.parse_raw(data)
+        return await self._get_cached(cache_key, Genre.parse_raw)
 
     async def _get_list_of_objects(
         self,
-        page: int,
-        page_size: int
+        window: int
     ) -> tuple[int, list[Genre]]:
-        """Retrieve genres from Redis cache."""
+        """Retrieve a window of the genre list from Redis cache."""
 
-        cache_key = f'genres:{page}:{page_size}'
-        data = await self.redis.get(cache_key)
+        cache_key = f'genres:{window}'
+        data = await self._get_cached(cache_key, self._parse_genres)
 
         if not data:
             return 0, None
 
+        return data
+
+    @staticmethod
+    def _parse_genres(data: bytes) -> tuple[int, list[Genre]]:
+        """Parse cached genres data."""
+
         genres_data = json.loads(data)
-        films = [Genre.parse_raw(genre) for genre in genres_data['genres']]
+        genres = [Genre.parse_raw(genre) for genre in genres_data['genres']]
         total = genres_data['total']
 
-        return total, films
+        return total, genres
 
     async def _put_single_object(self, genre: Genre) -> None:
         """Put genre data into the Redis cache."""
 
         cache_key = f'genre:{str(genre.id)}'
 
-        await self.redis.set(
+        await self._put_cached(
             cache_key,
+            genre,
             genre.json(),
             GENRE_CACHE_EXPIRE_IN_SECONDS,
         )
 
     async def _put_list_of_objects(
         self,
-        page: int,
-        page_size: int,
+        window: int,
         total: int,
         genres: list[Genre]
     ) -> None:
-        """Save genres to Redis cache."""
+        """Save a window of the genre list to Redis cache."""
 
-        cache_key = f'genres:{page}:{page_size}'
+        cache_key = f'genres:{window}'
         data = {
             'total': total,
             'genres': [genre.json() for genre in genres]
         }
         json_str = json.dumps(data)
 
-        await self.redis.set(
-            cache_key, json_str, GENRE_CACHE_EXPIRE_IN_SECONDS
+        await self._put_cached(
+            cache_key, (total, genres), json_str, GENRE_CACHE_EXPIRE_IN_SECONDS
         )
 
 
-cache_service = RedisService(redis)
+single_flight = SingleFlight(
+    redis if settings.SINGLE_FLIGHT_REDIS_LOCK else None
+)
+cache_service = RedisService(redis, local_cache, single_flight)
 search_service = ElasticService(elastic, INDEX_NAME)
 
 
@@ -147,15 +173,23 @@ class GenreService:
     async def get_by_id(self, genre_id: str) -> Genre | None:
         """Returns data about the genre by its id."""
 
-        genre = await cache_service._get_single_object(genre_id)
+        return await cache_service._get_or_load(
+            f'genre:{genre_id}',
+            Genre.parse_raw,
+            lambda: self._load_genre(genre_id),
+            recheck=lambda: cache_service._get_single_object(genre_id)
+        )
 
-        if not genre:
-            genre = await search_service._get_single_object(genre_id)
+    async def _load_genre(self, genre_id: str) -> Genre | None:
+        """Get the genre from ElasticSearch and put it into the cache."""
 
-            if not genre:
-                return None
+        genre = await search_service._get_single_object(genre_id)
 
-            await cache_service._put_single_object(genre)
+        if not genre:
+            await cache_service._put_not_found(f'genre:{genre_id}')
+            return None
+
+        await cache_service._put_single_object(genre)
 
         return genre
 
@@ -166,36 +200,69 @@ class GenreService:
     ) -> tuple[int, list[Genre]]:
         """Returns a list of genre data."""
 
-        total, genre_data = await cache_service._get_list_of_objects(
-            page, page_size
-        )
+        return await get_page(page, page_size, self._get_genre_window)
 
-        if not genre_data:
-            start_index = (page - 1) * page_size
-            query = {
-                "query": {"match_all": {}},
-                "from": start_index,
-                "size": page_size
-            }
-
-            try:
-                total, genre_data = await search_service._get_list_of_objects(
-                    query
-                )
-            except Exception as exc:
-                logging.exception('An error occured: %s', exc)
-
-            if not genre_data:
-                return 0, None
-
-            await cache_service._put_list_of_objects(
-                page, page_size, total, genre_data
+    async def _get_genre_window(self, window: int) -> tuple[int, list[Genre]]:
+        """Returns a window of the genre list."""
+
+        try:
+            return await cache_service._get_or_load(
+                f'genres:{window}',
+                cache_service._parse_genres,
+                lambda: self._load_genre_window(window),
+                recheck=lambda: self._recheck_genre_window(window)
             )
+        except (ApiError, TransportError) as exc:
+            # Rejections of the request are answered as they are.
+            logging.exception('An error occured: %s', exc)
+            mark_degraded('partial')
+
+        return 0, []
+
+    async def _load_genre_window(
+        self,
+        window: int
+    ) -> tuple[int, list[Genre]]:
+        """
+        Get a window of the genre list from ElasticSearch
+        and put it into the cache.
+        """
+
+        query = {
+            "query": {"match_all": {}},
+            "from": window * WINDOW_SIZE,
+            "size": WINDOW_SIZE
+        }
+        total, genre_data = await search_service._get_list_of_objects(query)
 
-            return total, genre_data
+        if not genre_data:
+            return 0, []
+
+        await cache_service._put_list_of_objects(window, total, genre_data)
 
         return total, genre_data
 
+    async def get_genre_list_by_cursor(
+        self,
+        cursor: str,
+        page_size: int
+    ) -> tuple[int, list[Genre], str | None]:
+        """Returns the page of genre data following the cursor."""
+
+        return await search_service._get_list_after(
+            {"query": {"match_all": {}}}, page_size, cursor
+        )
+
+    async def _recheck_genre_window(
+        self,
+        window: int
+    ) -> tuple[int, list[Genre]] | None:
+        """Return a window of the genre list cached by another worker."""
+
+        total, genre_data = await cache_service._get_list_of_objects(window)
+
+        return (total, genre_data) if genre_data is not None else None
+
 
 @lru_cache
 def get_genre_service(
@@ -1,20 +1,52 @@
 import json
 import logging
 from functools import lru_cache
+from typing import Callable
 
-from elasticsearch import AsyncElasticsearch, NotFoundError
+from elasticsearch import (ApiError, AsyncElasticsearch, NotFoundError,
+                           TransportError)
 from fastapi import Depends
 
 from core.config import settings
-from db.elastic import AsyncSearchAbstract, elastic, get_elastic
-from db.redis import AsyncCacheAbstract, get_redis, redis
+from core.degraded import mark_degraded
+from db.elastic import (HITS_FILTER_PATH, AsyncSearchAbstract, elastic,
+                        get_elastic)
+from db.local_cache import local_cache
+from db.redis import RedisCacheBase, get_redis, redis
 from models.film import FilmPersonRoles, PersonShortFilmInfo
 from models.person import PersonFull
 from redis.asyncio import Redis
-from utils.search_films import get_films, get_roles
+from utils.cursor import search_after
+from utils.fields import include_fields
+from utils.list_window import WINDOW_SIZE, get_page, normalize_query
+from utils.search_films import get_films_by_ids
+from utils.single_flight import SingleFlight
 
 PERSON_CACHE_EXPIRE_IN_SECONDS = settings.REDIS_CACHE_EXPIRES_IN_SECONDS
 INDEX_NAME = settings.ES_PERSON_INDEX
+PERSON_FIELDS = ['id', 'full_name', 'films']
+
+
+def person_key(person_id: str, fields: tuple[str, ...] | None = None) -> str:
+    """Return the cache key of a person or of the fields given of one."""
+
+    if fields is None:
+        return f'person:{person_id}'
+
+    return f'person:{person_id}:{",".join(fields)}'
+
+
+def _decode_person(source: dict) -> PersonFull:
+    """Build a person of trusted index data skipping validation."""
+
+    return PersonFull.construct(
+        id=source['id'],
+        full_name=source['full_name'],
+        films=[
+            FilmPersonRoles.construct(**film)
+            for film in source.get('films', [])
+        ]
+    )
 
 
 class ElasticService(AsyncSearchAbstract):
@@ -24,29 +56,42 @@ class ElasticService(AsyncSearchAbstract):
         self.elastic = elastic
         self.index_name = index_name
 
-    async def _get_single_object(self, person_id: str) -> PersonFull | None:
-        """Request to ElasticSearch to get person data."""
+    async def _get_single_object(
+        self,
+        person_id: str,
+        fields: tuple[str, ...] | None = None
+    ) -> PersonFull | None:
+        """Request to ElasticSearch to get person data,
+        only the fields given if any.
+        """
 
         try:
-            doc = await self.elastic.get(index=INDEX_NAME, id=person_id)
+            doc = await self.elastic.get(
+                index=INDEX_NAME, id=person_id, source_includes=fields
+            )
         except NotFoundError:
             return None
 
-        person = doc['_source']
-        _, films = await get_films(self.elastic, person['full_name'])
-        films_roles = await get_roles(films, person['full_name'])
-
-        return PersonFull(
-            id=person['id'],
-            full_name=person['full_name'],
-            films=[
-                FilmPersonRoles(
-                    id=film.id,
-                    roles=film.roles,
-                ) for film in films_roles
-            ]
+        if fields is not None:
+            return PersonFull.construct(**doc['_source'])
+
+        return PersonFull(**doc['_source'])
+
+    async def _get_many_objects(
+        self,
+        person_ids: list[str]
+    ) -> list[PersonFull]:
+        """Request to ElasticSearch to get data of several persons."""
+
+        result = await self.elastic.mget(
+            index=INDEX_NAME, ids=person_ids, source_includes=PERSON_FIELDS
         )
 
+        return [
+            _decode_person(doc['_source'])
+            for doc in result['docs'] if doc.get('found')
+        ]
+
     async def _get_list_of_objects(
         self,
         query: str,
@@ -60,66 +105,80 @@ class ElasticService(AsyncSearchAbstract):
 
         response = await self.elastic.search(
             index=self.index_name, query=query, from_=from_page,
-            size=page_size
+            size=page_size, source_includes=PERSON_FIELDS,
+            filter_path=HITS_FILTER_PATH
         )
         total = response['hits']['total']['value']
-        results = response['hits']['hits']
-
-        if not results:
-            return total, []
-
-        data = []
-
-        for item in results:
-            person = item['_source']
-            _, films = await get_films(self.elastic, person['full_name'])
-            films_roles = await get_roles(films, person['full_name'])
-            data.append(
-                PersonFull(
-                    id=person['id'],
-                    full_name=person['full_name'],
-                    films=[
-                        FilmPersonRoles(
-                            id=film.id,
-                            roles=film.roles,
-                        ) for film in films_roles
-                    ]
-                )
-            )
+        results = response['hits'].get('hits', [])
 
-        return total, data
+        return total, [_decode_person(item['_source']) for item in results]
+
+    async def _get_list_after(
+        self,
+        query: dict,
+        page_size: int,
+        cursor: str
+    ) -> tuple[int, list[PersonFull], str | None]:
+        """
+        Request to ElasticSearch to get the page of persons found
+        in accordance with the query following the cursor.
+        """
 
+        total, results, next_cursor = await search_after(
+            self.elastic,
+            self.index_name,
+            {"query": query, "_source": PERSON_FIELDS},
+            page_size,
+            cursor
+        )
+        data = [_decode_person(item['_source']) for item in results]
 
-class RedisService(AsyncCacheAbstract):
-    """Class to represent cache service with Redis."""
+        return total, data, next_cursor
 
-    def __init__(self, redis: Redis):
-        self.redis = redis
 
-    async def _get_single_object(self, person_id) -> PersonFull | None:
+class RedisService(RedisCacheBase):
+    """Class to represent cache service with Redis."""
+
+    async def _get_single_object(
+        self,
+        person_id,
+        fields: tuple[str, ...] | None = None
+    ) -> PersonFull | None:
         """Request to Redis to get person data from the cache."""
 
-        cache_key = f'person:{person_id}'
-        data = await self.redis.get(cache_key)
+        return await self._get_cached(
+            person_key(person_id, fields), self._person_parser(fields)
+        )
+
+    @staticmethod
+    def _person_parser(
+        fields: tuple[str, ...] | None
+    ) -> Callable[[bytes], PersonFull]:
+        """Returns a parser of cached person data or of its fields."""
 
-        if not data:
-            return None
+        if fields is None:
+            return PersonFull.parse_raw
 
-        return PersonFull.parse_raw(data)
+        return lambda data: PersonFull.construct(**json.loads(data))
 
     async def _get_list_of_objects(
         self,
-        page: int,
-        size: int,
-        query: str = None
+        query: str | None,
+        window: int
     ) -> tuple[int, list[PersonFull]]:
-        """Get person list data from Redis cache."""
+        """Get a window of person list data from Redis cache."""
 
-        cache_key = f'persons:{page}:{size}:{query}'
-        data = await self.redis.get(cache_key)
+        cache_key = f'persons:{query}:{window}'
+        data = await self._get_cached(cache_key, self._parse_persons)
 
         if not data:
-            return 0, []
+            return 0, None
+
+        return data
+
+    @staticmethod
+    def _parse_persons(data: bytes) -> tuple[int, list[PersonFull]]:
+        """Parse cached person list data."""
 
         persons_data = json.loads(data)
         persons = [
@@ -129,36 +188,50 @@ class RedisService(AsyncCacheAbstract):
 
         return total, persons
 
-    async def _put_single_object(self, person: PersonFull) -> None:
-        """Put person data into the Redis cache."""
-
-        cache_key = f'person:{str(person.id)}'
+    async def _put_single_object(
+        self,
+        person: PersonFull,
+        fields: tuple[str, ...] | None = None
+    ) -> None:
+        """Put person data, or the fields given of it, into the cache."""
 
-        await self.redis.set(
-            cache_key,
-            person.json(),
+        await self._put_cached(
+            person_key(str(person.id), fields),
+            person,
+            person.json(include=include_fields(fields)),
             PERSON_CACHE_EXPIRE_IN_SECONDS,
         )
 
+    async def _put_many_objects(self, persons: list[PersonFull]) -> None:
+        """Put data of several persons into Redis cache at once."""
+
+        await self._put_many_cached(
+            [
+                (f'person:{person.id}', person, person.json())
+                for person in persons
+            ],
+            PERSON_CACHE_EXPIRE_IN_SECONDS
+        )
+
     async def _put_list_of_objects(
         self,
-        page: int,
-        size: int,
+        query: str | None,
+        window: int,
         total: int,
-        persons: list[PersonFull],
-        query: str = None,
+        persons: list[PersonFull]
     ) -> None:
-        """Put person list data into Redis cache."""
+        """Put a window of person list data into Redis cache."""
 
-        cache_key = f'persons:{page}:{size}:{query}'
+        cache_key = f'persons:{query}:{window}'
         data = {
             'total': total,
             'persons': [person.json() for person in persons]
         }
         json_str = json.dumps(data)
 
-        await self.redis.set(
+        await self._put_cached(
             cache_key,
+            (total, persons),
             json_str,
             PERSON_CACHE_EXPIRE_IN_SECONDS
         )
@@ -170,11 +243,19 @@ class RedisService(AsyncCacheAbstract):
         """Get person film list data from Redis cache."""
 
         cache_key = f'person_films:{person_id}'
-        data = await self.redis.get(cache_key)
+        data = await self._get_cached(cache_key, self._parse_person_films)
 
         if not data:
             return 0, []
 
+        return data
+
+    @staticmethod
+    def _parse_person_films(
+        data: bytes
+    ) -> tuple[int, list[PersonShortFilmInfo]]:
+        """Parse cached person film list data."""
+
         films_data = json.loads(data)
         films = [
             PersonShortFilmInfo.parse_raw(film)
@@ -199,15 +280,19 @@ class RedisService(AsyncCacheAbstract):
         }
         json_str = json.dumps(data)
 
-        await self.redis.set(
+        await self._put_cached(
             cache_key,
+            (total, films),
             json_str,
             PERSON_CACHE_EXPIRE_IN_SECONDS
         )
 
 
 search_service = ElasticService(elastic, INDEX_NAME)
-cache_service = RedisService(redis)
+single_flight = SingleFlight(
+    redis if settings.SINGLE_FLIGHT_REDIS_LOCK else None
+)
+cache_service = RedisService(redis, local_cache, single_flight)
 
 
 class PersonService:
@@ -223,18 +308,66 @@ class PersonService:
         self.redis = redis
         self.index_name = index_name
 
-    async def get_by_id(self, person_id: str) -> PersonFull | None:
-        """Returns data about the person by his id."""
+    async def get_by_id(
+        self,
+        person_id: str,
+        fields: tuple[str, ...] | None = None
+    ) -> PersonFull | None:
+        """Returns data about the person by his id,
+        only the fields given if any.
+        """
+
+        return await cache_service._get_or_load(
+            person_key(person_id, fields),
+            cache_service._person_parser(fields),
+            lambda: self._load_person(person_id, fields),
+            recheck=lambda: cache_service._get_single_object(
+                person_id, fields
+            )
+        )
+
+    async def get_by_ids(self, person_ids: list[str]) -> list[PersonFull]:
+        """Returns data about the persons found by ids in order."""
 
-        person = await cache_service._get_single_object(person_id)
+        persons = await cache_service._get_or_load_many(
+            [f'person:{person_id}' for person_id in person_ids],
+            PersonFull.parse_raw,
+            self._load_persons
+        )
 
-        if not person:
-            person = await search_service._get_single_object(person_id)
+        return list(persons.values())
+
+    async def _load_persons(
+        self,
+        cache_keys: list[str]
+    ) -> dict[str, PersonFull]:
+        """Get persons from ElasticSearch and put them into the cache."""
+
+        persons = await search_service._get_many_objects(
+            [cache_key.removeprefix('person:') for cache_key in cache_keys]
+        )
+        found = {f'person:{person.id}': person for person in persons}
+        await cache_service._put_many_objects(persons)
+        await cache_service._put_many_not_found(
+            [cache_key for cache_key in cache_keys if cache_key not in found]
+        )
+
+        return found
+
+    async def _load_person(
+        self,
+        person_id: str,
+        fields: tuple[str, ...] | None = None
+    ) -> PersonFull | None:
+        """Get the person from ElasticSearch and put it into the cache."""
+
+        person = await search_service._get_single_object(person_id, fields)
 
-            if not person:
-                return None
+        if not person:
+            await cache_service._put_not_found(person_key(person_id, fields))
+            return None
 
-            await cache_service._put_single_object(person)
+        await cache_service._put_single_object(person, fields)
 
         return person
 
@@ -246,69 +379,155 @@ class PersonService:
     ) -> tuple[int, list[PersonFull]]:
         """Returns a list of person data with filtering and sorting."""
 
-        total, data = await cache_service._get_list_of_objects(
-            page, page_size, search_query
+        return await get_page(
+            page,
+            page_size,
+            lambda window: self._get_person_window(search_query, window)
         )
 
-        if not data:
-            if search_query:
-                query = {
-                    "match_phrase_prefix": {"full_name": search_query}
-                }
-            else:
-                query = {"match_all": {}}
-
-            from_page = (page - 1) * page_size
-
-            try:
-                total, data = await search_service._get_list_of_objects(
-                    query=query, page_size=page_size, from_page=from_page
-                )
-            except Exception as exc:
-                logging.exception('An error occured: %s', exc)
-
-            await cache_service._put_list_of_objects(
-                page, page_size, total, data, search_query
+    async def _get_person_window(
+        self,
+        search_query: str | None,
+        window: int
+    ) -> tuple[int, list[PersonFull]]:
+        """Returns a window of person list data."""
+
+        query_key = normalize_query(search_query)
+
+        try:
+            return await cache_service._get_or_load(
+                f'persons:{query_key}:{window}',
+                cache_service._parse_persons,
+                lambda: self._load_person_window(search_query, window),
+                recheck=lambda: self._recheck_person_window(query_key, window)
             )
+        except (ApiError, TransportError) as exc:
+            # Rejections of the request are answered as they are.
+            logging.exception('An error occured: %s', exc)
+            mark_degraded('partial')
+
+        return 0, []
 
-            return total, data
+    async def _load_person_window(
+        self,
+        search_query: str | None,
+        window: int
+    ) -> tuple[int, list[PersonFull]]:
+        """
+        Get a window of person list data from ElasticSearch
+        and put it into the cache.
+        """
+
+        total, data = await search_service._get_list_of_objects(
+            query=self._persons_query(search_query),
+            page_size=WINDOW_SIZE,
+            from_page=window * WINDOW_SIZE
+        )
+
+        if not data:
+            return 0, []
+
+        await cache_service._put_list_of_objects(
+            normalize_query(search_query), window, total, data
+        )
 
         return total, data
 
+    async def get_person_list_by_cursor(
+        self,
+        cursor: str,
+        page_size: int,
+        search_query: str | None
+    ) -> tuple[int, list[PersonFull], str | None]:
+        """Returns the page of person data following the cursor."""
+
+        return await search_service._get_list_after(
+            self._persons_query(search_query), page_size, cursor
+        )
+
+    @staticmethod
+    def _persons_query(search_query: str | None) -> dict:
+        """Returns a query to search persons by name."""
+
+        if search_query:
+            return {"match_phrase_prefix": {"full_name": search_query}}
+
+        return {"match_all": {}}
+
+    async def _recheck_person_window(
+        self,
+        query_key: str | None,
+        window: int
+    ) -> tuple[int, list[PersonFull]] | None:
+        """Return a window of person list data cached by another worker."""
+
+        total, data = await cache_service._get_list_of_objects(
+            query_key, window
+        )
+
+        return (total, data) if data is not None else None
+
     async def get_person_films_list(
         self,
         person_id: str
     ) -> tuple[int, list[PersonShortFilmInfo]]:
         """Data about films in which the person took part."""
 
-        total, films_data = await cache_service._person_films_from_cache(
-            person_id
-        )
+        # None is cached for a person that does not exist.
+        return await cache_service._get_or_load(
+            f'person_films:{person_id}',
+            cache_service._parse_person_films,
+            lambda: self._load_person_films(person_id),
+            recheck=lambda: self._recheck_person_films(person_id)
+        ) or (0, [])
+
+    async def _load_person_films(
+        self,
+        person_id: str
+    ) -> tuple[int, list[PersonShortFilmInfo]] | None:
+        """Get the person's films from ElasticSearch and cache them."""
 
-        if not films_data:
-            try:
-                doc = await self.elastic.get(index=INDEX_NAME, id=person_id)
-            except NotFoundError:
-                return 0, []
-
-            person = doc['_source']
-            total, films = await get_films(self.elastic, person['full_name'])
-            films_data = []
-
-            for film in films:
-                obj = PersonShortFilmInfo(
-                    id=film['id'],
-                    title=film['title'],
-                    imdb_rating=film['imdb_rating'],
-                )
-                films_data.append(obj)
-
-            await cache_service._put_person_films_to_cache(
-                person_id, total, films_data
+        try:
+            doc = await self.elastic.get(
+                index=INDEX_NAME, id=person_id, source_includes=['films.id']
+            )
+        except NotFoundError:
+            await cache_service._put_not_found(f'person_films:{person_id}')
+            return None
+
+        films = await get_films_by_ids(
+            self.elastic,
+            [film['id'] for film in doc['_source'].get('films', [])]
+        )
+        total = len(films)
+        films_data = []
+
+        for film in films:
+            obj = PersonShortFilmInfo(
+                id=film['id'],
+                title=film['title'],
+                imdb_rating=film['imdb_rating'],
             )
+            films_data.append(obj)
+
+        await cache_service._put_person_films_to_cache(
+            person_id, total, films_data
+        )
 
         return total, films_data
 
+    async def _recheck_person_films(
+        self,
+        person_id: str
+    ) -> tuple[int, list[PersonShortFilmInfo]] | None:
+        """Return the person's films cached by another worker, if any."""
+
+        total, films_data = await cache_service._person_films_from_cache(
+            person_id
+        )
+
+        return (total, films_data) if films_data else None
+
 
 @lru_cache
 def get_person_service(
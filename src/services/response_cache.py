@@ -0,0 +1,251 @@
+from hashlib import blake2b
+from http import HTTPStatus
+from operator import itemgetter
+
+import orjson
+from fastapi import Request, Response
+from pydantic import BaseModel
+from redis.asyncio import Redis
+
+from core.compression import ENCODINGS, choose_encoding, compress, weak_etag
+from core.config import settings
+from core.deadline import no_deadline
+from core.degraded import is_degraded
+from core.metrics import observe_cache
+from core.timing import phase
+from db.local_cache import LocalCache, local_cache
+from db.redis import add_to_tags, rate_limiter, redis
+
+RESPONSE_CACHE_EXPIRE_IN_SECONDS = settings.REDIS_CACHE_EXPIRES_IN_SECONDS
+RESPONSE_CACHE_PRECOMPRESS = settings.RESPONSE_CACHE_PRECOMPRESS
+JSON_MEDIA_TYPE = 'application/json'
+
+
+def make_etag(body: bytes) -> str:
+    """Return a strong entity tag of a response body."""
+
+    return f'"{blake2b(body, digest_size=16).hexdigest()}"'
+
+
+def etag_matches(if_none_match: str | None, etag: str) -> bool:
+    """Check the If-None-Match header against an entity tag.
+
+    The comparison is weak, as required for If-None-Match.
+    """
+
+    if not if_none_match:
+        return False
+
+    if if_none_match.strip() == '*':
+        return True
+
+    return any(
+        tag.strip().removeprefix('W/') == etag
+        for tag in if_none_match.split(',')
+    )
+
+
+class ResponseCache:
+    """Class to represent a cache of rendered response bodies.
+
+    A hit is sent to the client as is, without parsing the cached data
+    into models and serializing them back. The entity tag of the body
+    is cached alongside, so that a conditional request is answered
+    with 304 Not Modified without reading the body at all.
+    """
+
+    def __init__(
+        self,
+        redis: Redis,
+        local_cache: LocalCache | None = None
+    ) -> None:
+        self.redis = redis
+        self.local_cache = local_cache
+
+    @staticmethod
+    def _cache_key(request: Request) -> str:
+        """Return a cache key of the request path and query parameters.
+
+        Parameters are sorted by name only, so that values of a repeated
+        one, like the ids of a batch, keep their order.
+        """
+
+        query = '&'.join(
+            f'{key}={value}'
+            for key, value in sorted(
+                request.query_params.multi_items(), key=itemgetter(0)
+            )
+        )
+
+        return f'response:{request.url.path}?{query}'
+
+    @staticmethod
+    def _encoding(request: Request) -> str | None:
+        """Return the encoding of the pre-compressed body to send."""
+
+        if not RESPONSE_CACHE_PRECOMPRESS:
+            return None
+
+        return choose_encoding(request.headers.get('accept-encoding'))
+
+    async def get(self, request: Request) -> Response | None:
+        """Return a cached response to the request, if any."""
+
+        cache_key = self._cache_key(request)
+        if_none_match = request.headers.get('if-none-match')
+        encoding = self._encoding(request)
+        local_key = f'{cache_key}#{encoding}' if encoding else cache_key
+        entry = None
+
+        if self.local_cache is not None:
+            entry = self.local_cache.get(local_key)
+
+        # The rate limit of the client is checked along with the lookup.
+        if entry is None and if_none_match:
+            async with self.redis.pipeline(transaction=False) as pipe:
+                pipe.hget(cache_key, 'etag')
+                etag, = await rate_limiter.execute(pipe)
+
+            if etag is not None and etag_matches(
+                if_none_match, etag.decode()
+            ):
+                observe_cache(cache_key, 'not_modified')
+                return self._not_modified(etag.decode(), if_none_match)
+
+        if entry is None:
+            fields = ['body', 'etag'] + ([encoding] if encoding else [])
+
+            async with self.redis.pipeline(transaction=False) as pipe:
+                pipe.hmget(cache_key, *fields)
+                (body, etag, *encoded), = await rate_limiter.execute(pipe)
+
+            if body is None:
+                observe_cache(cache_key, 'miss')
+                return None
+
+            etag = etag.decode() if etag else make_etag(body)
+
+            # Bodies too small to compress have no compressed variants.
+            if encoded and encoded[0] is not None:
+                entry = encoded[0], etag, encoding
+            else:
+                entry = body, etag, None
+
+            if self.local_cache is not None:
+                self.local_cache.set(local_key, entry, len(entry[0]))
+
+        # A hit of the local cache costs a round trip for the check.
+        await rate_limiter.check()
+
+        content, etag, content_encoding = entry
+        observe_cache(cache_key, 'hit')
+
+        if etag_matches(if_none_match, etag):
+            return self._not_modified(etag, if_none_match)
+
+        return self._response(content, etag, content_encoding)
+
+    async def render(
+        self,
+        request: Request,
+        model: BaseModel,
+        include: set | dict | None = None
+    ) -> Response:
+        """Render the fields to `include` of the response model
+        and save the body to the cache.
+
+        The body is saved along with its compressed variants, so that
+        it is compressed once rather than on every hit. A degraded
+        response is not saved, not to be served after ElasticSearch
+        recovers.
+        """
+
+        with phase('serialize'):
+            body = orjson.dumps(model.dict(include=include))
+
+        etag = make_etag(body)
+        variants = {}
+
+        if not is_degraded():
+            if (
+                RESPONSE_CACHE_PRECOMPRESS
+                and len(body) >= settings.COMPRESSION_MIN_SIZE
+            ):
+                variants = {
+                    encoding: compress(body, encoding)
+                    for encoding in ENCODINGS
+                }
+
+            await self._put(self._cache_key(request), body, etag, variants)
+
+        if_none_match = request.headers.get('if-none-match')
+
+        if etag_matches(if_none_match, etag):
+            return self._not_modified(etag, if_none_match)
+
+        encoding = self._encoding(request)
+
+        if encoding in variants:
+            return self._response(variants[encoding], etag, encoding)
+
+        return self._response(body, etag)
+
+    async def _put(
+        self,
+        cache_key: str,
+        body: bytes,
+        etag: str,
+        variants: dict[str, bytes]
+    ) -> None:
+        if self.local_cache is not None:
+            self.local_cache.set(cache_key, (body, etag, None), len(body))
+
+            for encoding, content in variants.items():
+                self.local_cache.set(
+                    f'{cache_key}#{encoding}',
+                    (content, etag, encoding),
+                    len(content)
+                )
+
+        async with self.redis.pipeline(transaction=True) as pipe:
+            pipe.hset(
+                cache_key, mapping={'body': body, 'etag': etag, **variants}
+            )
+            pipe.expire(cache_key, RESPONSE_CACHE_EXPIRE_IN_SECONDS)
+            add_to_tags(pipe, cache_key)
+
+            # The response is ready, caching it is worth the wait.
+            with no_deadline():
+                await pipe.execute()
+
+    @staticmethod
+    def _response(
+        content: bytes,
+        etag: str,
+        encoding: str | None = None
+    ) -> Response:
+        # The body depends on Accept-Encoding even when sent as is,
+        # so that shared caches do not serve it to other clients.
+        headers = {'ETag': etag, 'Vary': 'Accept-Encoding'}
+
+        if encoding is not None:
+            headers['ETag'] = weak_etag(etag)
+            headers['Content-Encoding'] = encoding
+
+        return Response(
+            content=content, media_type=JSON_MEDIA_TYPE, headers=headers
+        )
+
+    @staticmethod
+    def _not_modified(etag: str, if_none_match: str) -> Response:
+        # The tag is weak if the client got a compressed body.
+        if weak_etag(etag) in if_none_match:
+            etag = weak_etag(etag)
+
+        return Response(
+            status_code=HTTPStatus.NOT_MODIFIED,
+            headers={'ETag': etag, 'Vary': 'Accept-Encoding'}
+        )
+
+
+response_cache = ResponseCache(redis, local_cache)
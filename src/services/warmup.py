@@ -0,0 +1,165 @@
+"""Pre-warming of the caches with the most requested data.
+
+Run at the API startup, after ETL loads and from the command line:
+
+    python -m services.warmup
+"""
+
+import asyncio
+import logging
+import math
+import time
+from typing import Awaitable
+
+from redis.asyncio import Redis
+
+from core.config import settings
+from db.elastic import elastic
+from db.redis import redis
+from models.genre import Genre
+from models.models import FilmFull
+from services import film, genre
+from utils.list_window import WINDOW_SIZE
+
+COOLDOWN_KEY = 'warmup:cooldown'
+
+
+class CacheWarmer:
+    """Class to represent the cache warm-up.
+
+    Loads the top rated films, all genres, the first pages of the film
+    list of each genre and the most frequent film searches.
+    """
+
+    def __init__(self, redis: Redis, concurrency: int) -> None:
+        self.redis = redis
+        self.concurrency = concurrency
+        self.film_service = film.FilmService(
+            film.cache_service, film.search_service, film.INDEX_NAME
+        )
+        self.genre_service = genre.GenreService(
+            genre.search_service, genre.cache_service, genre.INDEX_NAME
+        )
+
+    async def run(self, force: bool = False) -> None:
+        """Warm up the caches unless warmed up during the cooldown.
+
+        The cooldown also keeps the workers starting together
+        from warming up the same data.
+        """
+
+        if not force and not await self.redis.set(
+            COOLDOWN_KEY, 1, nx=True, ex=settings.WARMUP_COOLDOWN_SECONDS
+        ):
+            return
+
+        started = time.monotonic()
+        genres = await self._warm_genres()
+        windows = math.ceil(
+            settings.WARMUP_LIST_PAGES * settings.WARMUP_PAGE_SIZE
+            / WINDOW_SIZE
+        )
+        lists = [
+            (f'genre:{genre_id}', self.film_service._films_query(genre_id))
+            for genre_id in [None, *(item.id for item in genres)]
+        ]
+        queries = await self.film_service.get_frequent_search_queries(
+            settings.WARMUP_SEARCH_QUERIES
+        )
+        lists.extend(
+            (f'search:{query}', self.film_service._search_query(query))
+            for query in queries
+        )
+        jobs = [self._warm_top_films()] + [
+            self.film_service._load_window(list_key, search_query, window)
+            for list_key, search_query in lists
+            for window in range(windows)
+        ]
+
+        semaphore = asyncio.Semaphore(self.concurrency)
+
+        async def bounded(job: Awaitable) -> None:
+            async with semaphore:
+                await job
+
+        results = await asyncio.gather(
+            *(bounded(job) for job in jobs), return_exceptions=True
+        )
+        failed = [
+            result for result in results if isinstance(result, Exception)
+        ]
+
+        for exc in failed[:1]:
+            logging.error('Cache warm-up failed to load: %s', exc)
+
+        logging.info(
+            'Cache warmed up in %.2fs: %d genres, %d film lists, '
+            '%d of %d jobs failed',
+            time.monotonic() - started, len(genres), len(lists),
+            len(failed), len(jobs)
+        )
+
+    async def _warm_genres(self) -> list[Genre]:
+        """Put all genres and the genre list into the cache."""
+
+        genres = []
+        window = 0
+
+        while True:
+            try:
+                _, window_genres = await self.genre_service._load_genre_window(
+                    window
+                )
+            except Exception as exc:
+                logging.error('Cache warm-up failed to load genres: %s', exc)
+                break
+
+            genres.extend(window_genres)
+
+            if len(window_genres) < WINDOW_SIZE:
+                break
+
+            window += 1
+
+        async with self.redis.pipeline(transaction=False) as pipe:
+            cache = genre.RedisService(pipe)
+
+            for item in genres:
+                await cache._put_single_object(item)
+
+            await pipe.execute()
+
+        return genres
+
+    async def _warm_top_films(self) -> None:
+        """Put the top rated films into the cache."""
+
+        response = await elastic.search(
+            index=film.INDEX_NAME,
+            query={"match_all": {}},
+            sort=[{"imdb_rating": {"order": "desc"}}],
+            size=settings.WARMUP_TOP_FILMS
+        )
+
+        async with self.redis.pipeline(transaction=False) as pipe:
+            cache = film.RedisService(pipe)
+
+            for hit in response['hits']['hits']:
+                await cache._put_single_object(FilmFull(**hit['_source']))
+
+            await pipe.execute()
+
+
+cache_warmer = CacheWarmer(redis, settings.WARMUP_CONCURRENCY)
+
+
+async def main() -> None:
+    try:
+        await cache_warmer.run(force=True)
+    finally:
+        await redis.close()
+        await elastic.close()
+
+
+if __name__ == '__main__':
+    asyncio.run(main())
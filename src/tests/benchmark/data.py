@@ -0,0 +1,98 @@
+"""A reproducible data set shaped like the ETL output."""
+
+import random
+import uuid
+
+WORDS = [
+    'star', 'war', 'love', 'night', 'dark', 'city', 'last', 'king', 'dead',
+    'lost', 'man', 'woman', 'story', 'return', 'blood', 'time', 'world',
+    'secret', 'house', 'game', 'dream', 'fire', 'ice', 'heart', 'shadow',
+    'river', 'road', 'ghost', 'queen', 'empire', 'storm', 'moon', 'sun',
+    'island', 'code', 'silent', 'black', 'white', 'red', 'golden', 'iron',
+    'wild', 'hunter', 'legend', 'fall', 'rise', 'day', 'summer',
+]
+FIRST_NAMES = [
+    'John', 'Anna', 'Peter', 'Maria', 'George', 'Emma', 'Harrison', 'Lucy',
+    'Mark', 'Carrie', 'James', 'Olivia', 'Robert', 'Sophie', 'David', 'Kate',
+]
+LAST_NAMES = [
+    'Smith', 'Ford', 'Hamill', 'Fisher', 'Lucas', 'Brown', 'Taylor', 'Lee',
+    'Walker', 'Young', 'King', 'Wright', 'Hill', 'Green', 'Baker', 'Hall',
+]
+GENRES = [
+    'Action', 'Adventure', 'Animation', 'Comedy', 'Crime', 'Documentary',
+    'Drama', 'Family', 'Fantasy', 'History', 'Horror', 'Music', 'Mystery',
+    'Romance', 'Sci-Fi', 'Thriller', 'War', 'Western',
+]
+ROLES = ['actor', 'writer', 'director']
+
+
+def _uuid(rng: random.Random) -> str:
+    return str(uuid.UUID(int=rng.getrandbits(128), version=4))
+
+
+def make_data(
+    films: int,
+    persons: int,
+    seed: int = 0
+) -> dict[str, list[dict]]:
+    """Return documents of the movies, genres and persons indices."""
+
+    rng = random.Random(seed)
+    genres = [
+        {'id': _uuid(rng), 'name': name, 'description': f'{name} films'}
+        for name in GENRES
+    ]
+    people = [
+        {
+            'id': _uuid(rng),
+            'full_name': (
+                f'{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}'
+            ),
+            'films': [],
+        }
+        for _ in range(persons)
+    ]
+    movies = []
+
+    for _ in range(films):
+        film = {
+            'id': _uuid(rng),
+            'title': ' '.join(
+                rng.choice(WORDS) for _ in range(rng.randint(1, 4))
+            ).capitalize(),
+            'imdb_rating': round(rng.uniform(1, 10), 1),
+            'description': ' '.join(rng.choice(WORDS) for _ in range(60)),
+            'genres': [
+                {'id': genre['id'], 'name': genre['name']}
+                for genre in rng.sample(genres, rng.randint(1, 3))
+            ],
+            'actors_names': [],
+            'writers_names': [],
+        }
+
+        for role, count in zip(ROLES, (rng.randint(3, 10), 2, 1)):
+            cast = rng.sample(people, count)
+            film[f'{role}s'] = [
+                {'id': person['id'], 'name': person['full_name']}
+                for person in cast
+            ]
+
+            if role != 'director':
+                film[f'{role}s_names'] = [
+                    person['full_name'] for person in cast
+                ]
+
+            for person in cast:
+                roles = person['films'][-1:]
+
+                if roles and roles[0]['id'] == film['id']:
+                    roles[0]['roles'].append(role)
+                else:
+                    person['films'].append(
+                        {'id': film['id'], 'roles': [role]}
+                    )
+
+        movies.append(film)
+
+    return {'movies': movies, 'genres': genres, 'persons': people}
@@ -0,0 +1,308 @@
+"""An in-memory stand-in for Elasticsearch.
+
+Understands the requests the API services make: get, mget, search
+with the match_all, match, match_phrase_prefix and nested genre filter
+queries, sorting, from/size and search_after with points in time.
+
+FakeNode serves them to the real client in place of the HTTP node,
+so that serialization, the transport and the wrappers of the client
+in `db.elastic` are measured as well.
+"""
+
+import itertools
+import json
+from urllib.parse import parse_qsl, urlsplit
+
+from elastic_transport import (ApiResponseMeta, BaseAsyncNode, HttpHeaders,
+                               NodeConfig)
+from elastic_transport._node import NodeApiResponse
+from elasticsearch import NotFoundError
+
+
+def _not_found(message: str) -> NotFoundError:
+    meta = ApiResponseMeta(
+        status=404,
+        http_version='1.1',
+        headers=HttpHeaders(),
+        duration=0.0,
+        node=NodeConfig('http', 'localhost', 9200),
+    )
+
+    return NotFoundError(message, meta, {'error': message})
+
+
+def _tokens(text: str | None) -> list[str]:
+    return (text or '').lower().split()
+
+
+def _project(source: dict, includes: list[str] | None) -> dict:
+    """Return the source filtered by `_source` includes."""
+
+    if not includes:
+        return source
+
+    projected = {}
+
+    for field in includes:
+        name, _, nested = field.partition('.')
+
+        if name not in source:
+            continue
+
+        if not nested:
+            projected[name] = source[name]
+        else:
+            projected[name] = [
+                {nested: item[nested]} for item in source[name]
+            ]
+
+    return projected
+
+
+class FakeElasticsearch:
+    """Serve documents of each index from memory."""
+
+    def __init__(self, indices: dict[str, list[dict]]) -> None:
+        self.indices = {
+            name: {doc['id']: doc for doc in docs}
+            for name, docs in indices.items()
+        }
+        self._pits: dict[str, str] = {}
+        self._pit_ids = itertools.count()
+
+    async def get(
+        self,
+        index: str,
+        id: str,
+        source_includes: list[str] | None = None,
+        **kwargs
+    ) -> dict:
+        doc = self.indices[index].get(id)
+
+        if doc is None:
+            raise _not_found(f'{index}/{id}')
+
+        return {'_id': id, 'found': True, '_source': _project(
+            doc, source_includes
+        )}
+
+    async def mget(
+        self,
+        index: str,
+        ids: list[str],
+        source_includes: list[str] | None = None,
+        **kwargs
+    ) -> dict:
+        docs = []
+
+        for id_ in ids:
+            doc = self.indices[index].get(id_)
+            docs.append(
+                {'_id': id_, 'found': False} if doc is None else
+                {'_id': id_, 'found': True,
+                 '_source': _project(doc, source_includes)}
+            )
+
+        return {'docs': docs}
+
+    async def open_point_in_time(self, index: str, **kwargs) -> dict:
+        pit_id = f'pit-{next(self._pit_ids)}'
+        self._pits[pit_id] = index
+
+        return {'id': pit_id}
+
+    async def close_point_in_time(self, id: str, **kwargs) -> dict:
+        if self._pits.pop(id, None) is None:
+            raise _not_found(id)
+
+        return {'succeeded': True}
+
+    async def search(
+        self,
+        index: str | None = None,
+        body: dict | None = None,
+        source_includes: list[str] | None = None,
+        filter_path: list[str] | None = None,
+        **kwargs
+    ) -> dict:
+        request = {**(body or {})}
+
+        for name in ('query', 'sort', 'size', 'from_', 'search_after'):
+            if kwargs.get(name) is not None:
+                request[name.rstrip('_')] = kwargs[name]
+
+        if 'pit' in request:
+            index = self._pits.get(request['pit']['id'])
+
+            if index is None:
+                raise _not_found(request['pit']['id'])
+
+        if isinstance(request.get('_source'), list):
+            source_includes = request['_source']
+
+        hits = []
+
+        for doc in self.indices[index].values():
+            score = self._score(request.get('query'), doc)
+
+            if score:
+                hits.append((score, doc))
+
+        sort = request.get('sort') or [{'_score': {'order': 'desc'}}]
+        hits.sort(key=lambda hit: self._sort_values(sort, *hit))
+        total = len(hits)
+
+        if request.get('search_after'):
+            after = request['search_after']
+            hits = [
+                hit for hit in hits
+                if self._sort_values(sort, *hit) > tuple(after)
+            ]
+
+        start = request.get('from', 0)
+        page = hits[start:start + request.get('size', 10)]
+
+        response = {
+            'hits': {
+                'total': {'value': total},
+                'hits': [{
+                    '_id': doc['id'],
+                    '_score': score,
+                    '_source': _project(doc, source_includes),
+                    'sort': list(self._sort_values(sort, score, doc)),
+                } for score, doc in page],
+            },
+        }
+
+        if 'pit' in request:
+            response['pit_id'] = request['pit']['id']
+
+        return response
+
+    async def close(self) -> None:
+        pass
+
+    def _score(self, query: dict | None, doc: dict) -> float:
+        """Return the relevance of a document, 0 if it does not match."""
+
+        if not query or 'match_all' in query:
+            return 1.0
+
+        if 'match' in query:
+            (field, text), = query['match'].items()
+            words = set(_tokens(doc.get(field)))
+
+            return float(sum(token in words for token in _tokens(text)))
+
+        if 'match_phrase_prefix' in query:
+            (field, text), = query['match_phrase_prefix'].items()
+            value = ' '.join(_tokens(doc.get(field)))
+            phrase = ' '.join(_tokens(text))
+
+            return float(f' {phrase}' in f' {value}')
+
+        if 'nested' in query:
+            path = query['nested']['path']
+            filters = query['nested']['query']['bool']['filter']
+            items = doc.get(path) or []
+
+            return float(all(
+                any(
+                    item.get(field.split('.', 1)[1]) == str(value)
+                    for item in items
+                )
+                for term in filters
+                for field, value in term['term'].items()
+            ))
+
+        raise ValueError(f'Unsupported query: {query}')
+
+    @staticmethod
+    def _sort_values(sort: list[dict], score: float, doc: dict) -> tuple:
+        """Return sort values, descending ones negated, with a tiebreaker."""
+
+        values = []
+
+        for clause in sort:
+            (field, options), = clause.items()
+            value = score if field == '_score' else (doc.get(field) or 0)
+            values.append(-value if options['order'] == 'desc' else value)
+
+        values.append(doc['id'])
+
+        return tuple(values)
+
+
+class FakeNode(BaseAsyncNode):
+    """A node of the client answering requests from `backend`."""
+
+    backend: FakeElasticsearch | None = None
+
+    async def perform_request(
+        self,
+        method: str,
+        target: str,
+        body: bytes | None = None,
+        headers: HttpHeaders | None = None,
+        request_timeout=None
+    ) -> NodeApiResponse:
+        url = urlsplit(target)
+        params = dict(parse_qsl(url.query))
+        path = [part for part in url.path.split('/') if part]
+        request = json.loads(body) if body else {}
+
+        try:
+            status = 200
+            response = await self._dispatch(method, path, params, request)
+        except NotFoundError as exc:
+            status, response = 404, exc.body
+
+        meta = ApiResponseMeta(
+            status=status,
+            http_version='1.1',
+            headers=HttpHeaders({
+                'content-type': 'application/json',
+                'x-elastic-product': 'Elasticsearch',
+            }),
+            duration=0.0,
+            node=self.config,
+        )
+
+        return NodeApiResponse(meta, json.dumps(response).encode())
+
+    async def close(self) -> None:
+        pass
+
+    async def _dispatch(
+        self,
+        method: str,
+        path: list[str],
+        params: dict[str, str],
+        request: dict
+    ) -> dict:
+        includes = params.get('_source_includes')
+        source_includes = includes.split(',') if includes else None
+
+        match path:
+            case [index, '_doc', id_]:
+                return await self.backend.get(
+                    index, id_, source_includes=source_includes
+                )
+            case [index, '_mget']:
+                return await self.backend.mget(
+                    index, request['ids'], source_includes=source_includes
+                )
+            case ['_pit']:
+                return await self.backend.close_point_in_time(request['id'])
+            case [index, '_pit']:
+                return await self.backend.open_point_in_time(index)
+            case ['_search']:
+                return await self.backend.search(
+                    body=request, source_includes=source_includes
+                )
+            case [index, '_search']:
+                return await self.backend.search(
+                    index, body=request, source_includes=source_includes
+                )
+
+        raise ValueError(f'Unsupported request: {method} {"/".join(path)}')
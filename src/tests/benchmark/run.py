@@ -0,0 +1,289 @@
+"""Throughput and latency benchmark of the API.
+
+Runs the app in-process against fakeredis and an in-memory
+Elasticsearch node behind the real client, drives a mix of requests
+at a fixed concurrency and reports RPS and latency percentiles per endpoint.
+
+    cd src
+    PYTHONPATH=.:.. python -m tests.benchmark.run --requests 20000
+    PYTHONPATH=.:.. python -m tests.benchmark.run --output new.json \\
+        --baseline old.json
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import os
+import random
+import time
+import uuid
+from collections import defaultdict, deque
+
+for name, value in {
+    'PROJECT_NAME': 'movies-benchmark',
+    'REDIS_HOST': 'localhost',
+    'REDIS_PORT': '6379',
+    'ELASTIC_SCHEME': 'http',
+    'ELASTIC_HOST': 'localhost',
+    'ELASTIC_PORT': '9200',
+    'ES_MOVIE_INDEX': 'movies',
+    'ES_GENRE_INDEX': 'genres',
+    'ES_PERSON_INDEX': 'persons',
+    'CACHE_INVALIDATION_ENABLED': 'false',
+    'WARMUP_ON_STARTUP': 'false',
+    'SLOW_REQUEST_THRESHOLD_MS': '60000',
+    # All requests come from one client.
+    'RATE_LIMIT_ENABLED': 'false',
+}.items():
+    os.environ.setdefault(name, value)
+
+import httpx  # noqa: E402
+from fakeredis.aioredis import FakeRedis  # noqa: E402
+
+from core.config import settings  # noqa: E402
+from db import elastic, redis  # noqa: E402
+from tests.benchmark.data import WORDS, make_data  # noqa: E402
+from tests.benchmark.fake_es import FakeElasticsearch, FakeNode  # noqa: E402
+
+# Share of each endpoint in the request mix.
+MIX = {
+    'film_detail': 26,
+    'film_list': 16,
+    'film_search': 18,
+    'film_cursor': 6,
+    'film_batch': 6,
+    'genre_list': 4,
+    'genre_detail': 4,
+    'person_search': 8,
+    'person_detail': 6,
+    'person_films': 6,
+}
+
+# Batches of films requested at once, at most.
+BATCH_SIZE = 20
+# Share of cursor requests following a cursor given before.
+FOLLOW_SHARE = 0.7
+
+
+def install_stand_ins(data: dict[str, list[dict]]) -> None:
+    """Replace the clients before the services bind them on import.
+
+    The Elasticsearch client is the one of the app, only its node
+    is replaced, so that its wrappers are measured too.
+    """
+
+    FakeNode.backend = FakeElasticsearch({
+        settings.ES_MOVIE_INDEX: data['movies'],
+        settings.ES_GENRE_INDEX: data['genres'],
+        settings.ES_PERSON_INDEX: data['persons'],
+    })
+    elastic.elastic = elastic.InstrumentedElasticsearch(
+        [{
+            'scheme': settings.ELASTIC_SCHEME,
+            'host': settings.ELASTIC_HOST,
+            'port': settings.ELASTIC_PORT,
+        }],
+        node_class=FakeNode,
+    )
+    redis.redis = redis.InstrumentedRedis(
+        connection_pool=FakeRedis().connection_pool
+    )
+
+
+class Workload:
+    """Generate requests skewed towards popular items like real traffic."""
+
+    def __init__(self, data: dict[str, list[dict]], seed: int) -> None:
+        self.rng = random.Random(seed)
+        self.data = data
+        self.endpoints = list(MIX)
+        self.weights = list(MIX.values())
+        # Next pages of cursor requests sent before.
+        self.cursors: deque[tuple[str, dict]] = deque(maxlen=100)
+
+    def _popular(self, items: list):
+        # Pareto distributed index: a few items get most of the requests.
+        index = int(self.rng.paretovariate(1.2)) - 1
+
+        return items[index % len(items)]
+
+    def next(self) -> tuple[str, str, dict | list]:
+        endpoint = self.rng.choices(self.endpoints, self.weights)[0]
+        film = self._popular(self.data['movies'])
+        person = self._popular(self.data['persons'])
+        genre = self._popular(self.data['genres'])
+        page = {'page_number': self._popular(range(1, 6))}
+        query = ' '.join(
+            self._popular(WORDS) for _ in range(self.rng.randint(1, 2))
+        )
+
+        if (
+            endpoint == 'film_cursor'
+            and self.cursors
+            and self.rng.random() < FOLLOW_SHARE
+        ):
+            return endpoint, *self.cursors.popleft()
+
+        batch = [
+            ('ids', self._popular(self.data['movies'])['id'])
+            for _ in range(self.rng.randint(1, BATCH_SIZE))
+        ]
+        # The last one is not there.
+        batch[-1] = ('ids', str(uuid.UUID(int=self.rng.getrandbits(128))))
+
+        return endpoint, *{
+            'film_detail': (f'/api/v1/films/{film["id"]}', {}),
+            'film_list': ('/api/v1/films/', {'genre': genre['id'], **page}),
+            'film_search': ('/api/v1/films/search', {'query': query, **page}),
+            'film_cursor': self.rng.choice([
+                ('/api/v1/films/', {'genre': genre['id'], 'cursor': '*'}),
+                ('/api/v1/films/search', {'query': query, 'cursor': '*'}),
+            ]),
+            'film_batch': ('/api/v1/films/batch', batch),
+            'genre_list': ('/api/v1/genres/', {}),
+            'genre_detail': (f'/api/v1/genres/{genre["id"]}', {}),
+            'person_search': (
+                '/api/v1/persons/search',
+                {'query': person['full_name'].split()[0]}
+            ),
+            'person_detail': (f'/api/v1/persons/{person["id"]}', {}),
+            'person_films': (f'/api/v1/persons/{person["id"]}/film', {}),
+        }[endpoint]
+
+    def follow(self, url: str, params: dict, response: httpx.Response) -> None:
+        """Remember the next page of a cursor request to ask for it later."""
+
+        next_cursor = response.json().get('next_cursor')
+
+        if next_cursor:
+            self.cursors.append((url, {**params, 'cursor': next_cursor}))
+
+
+def percentile(values: list[float], share: float) -> float:
+    """Return the nearest-rank percentile of sorted values."""
+
+    return values[min(len(values) - 1, int(share * len(values)))]
+
+
+def summarize(
+    latencies: dict[str, list[float]],
+    errors: dict[str, int],
+    elapsed: float
+) -> dict[str, dict]:
+    results = {}
+    latencies['total'] = [
+        value for values in latencies.values() for value in values
+    ]
+    errors['total'] = sum(errors.values())
+
+    for endpoint, values in latencies.items():
+        values.sort()
+        results[endpoint] = {
+            'requests': len(values),
+            'errors': errors.get(endpoint, 0),
+            'rps': len(values) / elapsed,
+            'p50_ms': percentile(values, 0.50) * 1000,
+            'p95_ms': percentile(values, 0.95) * 1000,
+            'p99_ms': percentile(values, 0.99) * 1000,
+        }
+
+    return results
+
+
+def report(results: dict[str, dict], baseline: dict | None) -> None:
+    columns = ('requests', 'errors', 'rps', 'p50_ms', 'p95_ms', 'p99_ms')
+    print(f'{"endpoint":<15}' + ''.join(f'{name:>18}' for name in columns))
+
+    for endpoint, result in results.items():
+        cells = []
+
+        for name in columns:
+            cell = f'{result[name]:.1f}'
+
+            if baseline and endpoint in baseline and baseline[endpoint][name]:
+                change = result[name] / baseline[endpoint][name] - 1
+                cell += f' ({change:+.0%})'
+
+            cells.append(f'{cell:>18}')
+
+        print(f'{endpoint:<15}' + ''.join(cells))
+
+
+async def run(args: argparse.Namespace) -> dict[str, dict]:
+    data = make_data(args.films, args.persons, args.seed)
+    install_stand_ins(data)
+
+    import main
+
+    workload = Workload(data, args.seed)
+    latencies: dict[str, list[float]] = defaultdict(list)
+    errors: dict[str, int] = defaultdict(int)
+    transport = httpx.ASGITransport(app=main.app)
+
+    async with main.lifespan(main.app), httpx.AsyncClient(
+        transport=transport, base_url='http://benchmark'
+    ) as client:
+        async def worker(requests: int, measure: bool) -> None:
+            for _ in range(requests):
+                endpoint, url, params = workload.next()
+                started = time.perf_counter()
+                response = await client.get(url, params=params)
+                elapsed = time.perf_counter() - started
+
+                if endpoint == 'film_cursor' and response.is_success:
+                    workload.follow(url, params, response)
+
+                if not measure:
+                    continue
+
+                latencies[endpoint].append(elapsed)
+
+                # All requests of the mix are valid.
+                if not response.is_success:
+                    errors[endpoint] += 1
+
+        await asyncio.gather(*(
+            worker(args.warmup // args.concurrency, False)
+            for _ in range(args.concurrency)
+        ))
+        started = time.perf_counter()
+        await asyncio.gather(*(
+            worker(args.requests // args.concurrency, True)
+            for _ in range(args.concurrency)
+        ))
+        elapsed = time.perf_counter() - started
+
+    return summarize(latencies, errors, elapsed)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--requests', type=int, default=10000)
+    parser.add_argument('--warmup', type=int, default=2000,
+                        help='requests sent before measuring')
+    parser.add_argument('--concurrency', type=int, default=32)
+    parser.add_argument('--films', type=int, default=5000)
+    parser.add_argument('--persons', type=int, default=2000)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', help='save the results as JSON')
+    parser.add_argument('--baseline', help='JSON results to compare with')
+    args = parser.parse_args()
+
+    logging.disable(logging.WARNING)
+    results = asyncio.run(run(args))
+    baseline = None
+
+    if args.baseline:
+        with open(args.baseline) as file:
+            baseline = json.load(file)
+
+    report(results, baseline)
+
+    if args.output:
+        with open(args.output, 'w') as file:
+            json.dump(results, file, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -8,10 +8,14 @@ from tests.functional.utils import models
 def make_get_request(session_client: aiohttp.ClientSession) -> callable:
     """Send get request to api endpoint and return the response."""
 
-    async def inner(url: str, params: dict = {}) -> models.HTTPResponse:
+    async def inner(
+        url: str, params: dict = {}, headers: dict = {}
+    ) -> models.HTTPResponse:
         """Function logic."""
 
-        async with session_client.get(url=url, params=params) as response:
+        async with session_client.get(
+            url=url, params=params, headers=headers
+        ) as response:
             if response.content_type == 'application/json':
                 body = await response.json()
             else:
@@ -19,7 +23,12 @@ def make_get_request(session_client: aiohttp.ClientSession) -> callable:
             status = response.status
 
             return models.HTTPResponse(
-                body=body, status=status
+                body=body,
+                status=status,
+                headers={
+                    key.lower(): value
+                    for key, value in response.headers.items()
+                }
             )
 
     return inner
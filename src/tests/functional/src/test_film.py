@@ -1,3 +1,4 @@
+import asyncio
 import json
 
 import pytest
@@ -108,17 +109,25 @@ async def test_films_by_genre_redis_cache(
         'page_number': 1,
         'page_size': 10
     }
-    genre_id, page, size = query_data.values()
+    genre_id = query_data['genre']
 
     await make_get_request(url, query_data)
 
-    redis_key = f'films:{page}:{size}:{genre_id}:None'
+    # The whole first window of results is cached, not only the page
+    redis_key = f'films:genre:{genre_id}:0'
     data = await redis_client.get(redis_key)
     data = json.loads(data)
 
     assert data is not None
     assert data['total'] == 50
-    assert len(data['films']) == 10
+    assert len(data['films']) == 50
+
+    # Another page size within the window is served from the same entry
+    query_data['page_size'] = 25
+    response = await make_get_request(url, query_data)
+
+    assert len(response.body['results']) == 25
+    assert await redis_client.keys('films:*') == [redis_key.encode()]
 
 
 @pytest.mark.parametrize(
@@ -152,7 +161,7 @@ async def test_film_detail_cache(
     redis_key = f'film:{film_id}'
     data = json.loads(await redis_client.get(redis_key))
 
-    assert len(await redis_client.keys('*')) == 1
+    assert len(await redis_client.keys('film:*')) == 1
     assert data == expected_answer['response_body']
 
 
@@ -170,3 +179,321 @@ async def test_films_by_genre_invalid_request(query_data, expected_status):
     response = await requests.get(url, params=query_data)
 
     assert response.status_code == expected_status
+
+
+async def test_films_cursor_pagination(
+    es_write_data: callable,
+    make_get_request: callable
+) -> None:
+    """
+    Walks the film API endpoint page by page in cursor mode
+    and validates that every film is returned exactly once
+    and that a cursor is refused for another search.
+    """
+
+    es_data = await es_queries.make_test_es_movie_data(
+        existing_film_query=parametrize.FILM_QUERY_EXIST,
+        existing_person_query=parametrize.PERSON_SINGLE_QUERY_EXIST
+    )
+    await es_write_data(es_data, test_settings.es_movie_index)
+
+    url = test_settings.service_url + 'films/'
+    query_data = {'cursor': '*', 'page_size': 15}
+    film_ids = []
+
+    while query_data['cursor']:
+        response = await make_get_request(url, query_data)
+        body, status = response.body, response.status
+
+        assert status == 200
+        assert body['total'] == 50
+
+        if not film_ids:
+            first_cursor = body['next_cursor']
+
+            assert body['next'] == (
+                f'/films?page_size=15&cursor={first_cursor}'
+            )
+
+        film_ids.extend(film['id'] for film in body['results'])
+        query_data['cursor'] = body['next_cursor']
+
+    assert len(film_ids) == 50
+    assert len(set(film_ids)) == 50
+
+    response = await make_get_request(url, {'cursor': 'not-a-cursor'})
+
+    assert response.status == 400
+
+    response = await make_get_request(
+        url + 'search', {'query': 'Star', 'cursor': first_cursor}
+    )
+
+    assert response.status == 400
+
+
+@pytest.mark.parametrize(
+    'film_id, expected_answer',
+    [parametrize.film_detail_parameters[0]]
+)
+async def test_film_detail_response_cache(
+    redis_client: redis.Redis,
+    es_write_data: callable,
+    make_get_request: callable,
+    film_id: str,
+    expected_answer: dict
+) -> None:
+    """
+    Sends a request to the film detail API endpoint twice
+    and verifies that the rendered response is cached and served as is,
+    varying by Accept-Encoding even when not compressed.
+    """
+
+    es_data = await es_queries.make_test_es_movie_data(
+        existing_film_query=parametrize.FILM_QUERY_EXIST,
+        existing_person_query=parametrize.PERSON_SINGLE_QUERY_EXIST
+    )
+    await es_write_data(es_data, test_settings.es_movie_index)
+
+    url = test_settings.service_url + f'films/{film_id}'
+    await make_get_request(url)
+
+    redis_key = f'response:/api/v1/films/{film_id}?'
+    body = await redis_client.hget(redis_key, 'body')
+
+    assert json.loads(body) == expected_answer['response_body']
+
+    response = await make_get_request(
+        url, headers={'Accept-Encoding': 'identity'}
+    )
+
+    assert response.status == expected_answer['status']
+    assert response.body == expected_answer['response_body']
+    assert 'content-encoding' not in response.headers
+    assert response.headers['vary'] == 'Accept-Encoding'
+
+
+@pytest.mark.parametrize(
+    'film_id, expected_answer',
+    [parametrize.film_detail_parameters[0]]
+)
+async def test_film_detail_not_modified(
+    es_write_data: callable,
+    make_get_request: callable,
+    film_id: str,
+    expected_answer: dict
+) -> None:
+    """
+    Sends a conditional request to the film detail API endpoint
+    with the entity tag received and verifies the 304 response.
+    """
+
+    es_data = await es_queries.make_test_es_movie_data(
+        existing_film_query=parametrize.FILM_QUERY_EXIST,
+        existing_person_query=parametrize.PERSON_SINGLE_QUERY_EXIST
+    )
+    await es_write_data(es_data, test_settings.es_movie_index)
+
+    url = test_settings.service_url + f'films/{film_id}'
+    response = await make_get_request(url)
+    etag = response.headers['etag']
+
+    assert response.status == expected_answer['status']
+
+    response = await make_get_request(url, headers={'If-None-Match': etag})
+
+    assert response.status == 304
+    assert response.headers['etag'] == etag
+
+    response = await make_get_request(
+        url, headers={'If-None-Match': '"outdated"'}
+    )
+
+    assert response.status == expected_answer['status']
+    assert response.body == expected_answer['response_body']
+
+
+@pytest.mark.parametrize(
+    'film_id, expected_answer',
+    [parametrize.film_detail_parameters[1]]
+)
+async def test_film_detail_not_found_cache(
+    redis_client: redis.Redis,
+    make_get_request: callable,
+    film_id: str,
+    expected_answer: dict
+) -> None:
+    """
+    Sends a request to the film detail API endpoint with a missing id
+    and verifies that the miss is cached under the film key.
+    """
+
+    url = test_settings.service_url + f'films/{film_id}'
+    await make_get_request(url)
+
+    assert await redis_client.get(f'film:{film_id}') == b'not_found'
+
+    response = await make_get_request(url)
+
+    assert response.status == expected_answer['status']
+    assert response.body == expected_answer['response_body']
+
+
+@pytest.mark.parametrize(
+    'film_id, expected_answer',
+    [parametrize.film_detail_parameters[0]]
+)
+async def test_film_batch_response(
+    es_write_data: callable,
+    redis_client: redis.Redis,
+    make_get_request: callable,
+    film_id: str,
+    expected_answer: dict
+) -> None:
+    """
+    Sends a request to the film batch API endpoint with an existing
+    and a missing id, validates the given response and verifies that
+    the miss is cached under the film key.
+    """
+
+    es_data = await es_queries.make_test_es_movie_data(
+        existing_film_query=parametrize.FILM_QUERY_EXIST,
+        existing_person_query=parametrize.PERSON_SINGLE_QUERY_EXIST
+    )
+    await es_write_data(es_data, test_settings.es_movie_index)
+
+    missing_id = parametrize.film_detail_parameters[1][0]
+    url = test_settings.service_url + 'films/batch'
+    response = await make_get_request(
+        url, params=[('ids', film_id), ('ids', missing_id)]
+    )
+
+    assert response.status == expected_answer['status']
+    assert response.body == {
+        'results': [expected_answer['response_body']],
+        'not_found': [missing_id],
+    }
+    assert await redis_client.get(f'film:{missing_id}') == b'not_found'
+
+
+@pytest.mark.parametrize(
+    'film_id, expected_answer',
+    [parametrize.film_detail_parameters[0]]
+)
+async def test_film_detail_fields(
+    es_write_data: callable,
+    make_get_request: callable,
+    film_id: str,
+    expected_answer: dict
+) -> None:
+    """
+    Sends a request to the film detail API endpoint with the fields
+    selected and verifies that only they are returned.
+    """
+
+    es_data = await es_queries.make_test_es_movie_data(
+        existing_film_query=parametrize.FILM_QUERY_EXIST,
+        existing_person_query=parametrize.PERSON_SINGLE_QUERY_EXIST
+    )
+    await es_write_data(es_data, test_settings.es_movie_index)
+
+    url = test_settings.service_url + f'films/{film_id}'
+    response = await make_get_request(
+        url, params={'fields': 'title,imdb_rating'}
+    )
+    expected_body = expected_answer['response_body']
+
+    assert response.status == expected_answer['status']
+    assert response.body == {
+        field: expected_body[field] for field in ('id', 'title', 'imdb_rating')
+    }
+
+    response = await make_get_request(url, params={'fields': 'budget'})
+
+    assert response.status == 400
+
+
+@pytest.mark.parametrize(
+    'film_id, expected_answer',
+    parametrize.film_detail_parameters
+)
+async def test_film_detail_request_timeout(
+    es_write_data: callable,
+    make_get_request: callable,
+    film_id: str,
+    expected_answer: dict
+) -> None:
+    """
+    Sends requests to the film detail API endpoint with time budgets
+    and verifies that a request is served within an ample budget
+    and given up with 504 once its budget is spent.
+    """
+
+    es_data = await es_queries.make_test_es_movie_data(
+        existing_film_query=parametrize.FILM_QUERY_EXIST,
+        existing_person_query=parametrize.PERSON_SINGLE_QUERY_EXIST
+    )
+    await es_write_data(es_data, test_settings.es_movie_index)
+
+    url = test_settings.service_url + f'films/{film_id}'
+    response = await make_get_request(
+        url, headers={'X-Request-Timeout': '5'}
+    )
+
+    assert response.status == expected_answer['status']
+    assert response.body == expected_answer['response_body']
+
+    # Spent before the first call to Redis.
+    response = await make_get_request(
+        url, headers={'X-Request-Timeout': '0.000001'}
+    )
+
+    assert response.status == 504
+    assert response.body == {'detail': 'Request time budget is spent'}
+
+
+@pytest.mark.parametrize(
+    'film_id, expected_answer',
+    [parametrize.film_detail_parameters[0]]
+)
+async def test_film_cache_invalidation(
+    es_write_data: callable,
+    redis_client: redis.Redis,
+    make_get_request: callable,
+    film_id: str,
+    expected_answer: dict
+) -> None:
+    """
+    Caches a film and the film list, publishes the change of the film
+    as the ETL does and verifies that both are dropped from the cache.
+    """
+
+    es_data = await es_queries.make_test_es_movie_data(
+        existing_film_query=parametrize.FILM_QUERY_EXIST,
+        existing_person_query=parametrize.PERSON_SINGLE_QUERY_EXIST
+    )
+    await es_write_data(es_data, test_settings.es_movie_index)
+
+    await make_get_request(test_settings.service_url + f'films/{film_id}')
+    await make_get_request(
+        test_settings.service_url + 'films/search',
+        {'query': 'star', 'page_number': 1, 'page_size': 10}
+    )
+
+    assert await redis_client.keys(f'film:{film_id}') != []
+    assert await redis_client.keys('films:*') != []
+
+    await redis_client.xadd(
+        'cache_invalidation', {'entity': 'film', 'ids': json.dumps([film_id])}
+    )
+
+    for _ in range(50):
+        if not await redis_client.keys(f'*{film_id}*') + (
+            await redis_client.keys('films:*')
+        ):
+            break
+
+        await asyncio.sleep(0.1)
+
+    assert await redis_client.keys(f'*{film_id}*') == []
+    assert await redis_client.keys('films:*') == []
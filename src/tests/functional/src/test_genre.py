@@ -85,7 +85,7 @@ async def test_genre_cache(
     redis_key = f'genre:{genre_id}'
     data = json.loads(await redis_client.get(redis_key))
 
-    assert len(await redis_client.keys('*')) == 1
+    assert len(await redis_client.keys('genre:*')) == 1
     assert data == expected_answer['response_body']
 
 
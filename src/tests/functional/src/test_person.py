@@ -43,8 +43,8 @@ async def test_person_film_list_response(
     assert status == expected_answer['status']
 
     if expected_answer['status'] == 200:
-        assert body['total'] == 50
-        assert len(body['results']) == 10
+        assert body['total'] == expected_answer['length']
+        assert len(body['results']) == expected_answer['body_length']
 
 
 @pytest.mark.parametrize(
@@ -118,7 +118,7 @@ async def test_person_film_list_redis_cache(
     url = test_settings.service_url + f'persons/{person_id}/film'
     await make_get_request(url)
 
-    assert len(await redis_client.keys('*')) == 1
+    assert len(await redis_client.keys('person_films:*')) == 1
 
     redis_key = f'person_films:{person_id}'
     data = await redis_client.get(redis_key)
@@ -162,7 +162,7 @@ async def test_get_person_by_id_redis_cache(
     url = test_settings.service_url + f'persons/{person_id}'
     await make_get_request(url)
 
-    assert len(await redis_client.keys('*')) == 1
+    assert len(await redis_client.keys('person:*')) == 1
 
     redis_key = f'person:{person_id}'
     data = await redis_client.get(redis_key)
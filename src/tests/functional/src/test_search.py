@@ -118,17 +118,17 @@ async def test_films_search_redis_cache(
         'page_number': 1,
         'page_size': 10
     }
-    query, page, size = query_data.values()
+    query = query_data['query'].lower()
 
     await make_get_request(url, query_data)
 
-    redis_key = f'films:{page}:{size}:{query}:None'
+    redis_key = f'films:search:{query}:0'
     data = await redis_client.get(redis_key)
     data = json.loads(data)
 
     assert data is not None
     assert data['total'] == 50
-    assert len(data['films']) == 10
+    assert len(data['films']) == 50
 
 
 @pytest.mark.parametrize(
@@ -161,12 +161,18 @@ async def test_persons_search_redis_cache(
     #     'page_number': 1,
     #     'page_size': 10
     # }
-    query, page, size = query_data.values()
+    query = query_data['query'].lower()
 
     await make_get_request(url, query_data)
 
-    redis_key = f'persons:{page}:{size}:{query}'
+    redis_key = f'persons:{query}:0'
     data = await redis_client.get(redis_key)
+
+    if expected_answer['length'] == 0:
+        # Empty results are not cached
+        assert data is None
+        return
+
     data = json.loads(data)
 
     assert data is not None
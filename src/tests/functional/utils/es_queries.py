@@ -2,18 +2,19 @@ import json
 import uuid
 
 
+FILM_IDS = [
+    'b8076788-de5b-426a-b78b-08e9dc819841'
+] + [str(uuid.uuid4()) for _ in range(49)]
+
+
 async def make_test_es_movie_data(
     existing_film_query: str,
     existing_person_query: str
 ) -> list:
     """Create test data for ElasticSearch."""
 
-    film_ids = [
-        'b8076788-de5b-426a-b78b-08e9dc819841'
-    ] + [str(uuid.uuid4()) for _ in range(49)]
-
     return [{
-        'id': film_ids[i],
+        'id': FILM_IDS[i],
         'imdb_rating': 8.5,
         'genres': [
             {
@@ -63,9 +64,13 @@ async def make_test_es_persons_data(
     return [{
         'id': str(uuid.uuid4()),
         'full_name': existing_multiple_query,
+        'films': [],
     } for _ in range(20)] + [{
         'id': '32b50c6b-4907-292f-b652-6ef2ee8b43f8',
         'full_name': existing_single_query,
+        'films': [
+            {'id': film_id, 'roles': ['actor']} for film_id in FILM_IDS
+        ],
     }]
 
 
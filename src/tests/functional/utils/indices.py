@@ -165,6 +165,18 @@ PERSONS_INDEX_SETTINGS = {
             'full_name': {
                 'type': 'text',
                 'analyzer': 'ru_en'
+            },
+            'films': {
+                'type': 'nested',
+                'dynamic': 'strict',
+                'properties': {
+                    'id': {
+                        'type': 'keyword'
+                    },
+                    'roles': {
+                        'type': 'keyword'
+                    }
+                }
             }
         }
     }
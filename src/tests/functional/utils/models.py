@@ -6,6 +6,7 @@ from pydantic import BaseModel
 class HTTPResponse(BaseModel):
     body: Any
     status: int
+    headers: dict[str, str] = {}
 
 
 class Genre(BaseModel):
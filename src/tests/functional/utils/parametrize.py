@@ -247,7 +247,7 @@ person_films_parameters = [
         {
             'status': HTTPStatus.OK,
             'length': 50,
-            'body_length': 10
+            'body_length': 50
         }
     ),
     (
@@ -268,7 +268,7 @@ person_detail_parameters = [
             'status': HTTPStatus.OK,
             'id': '32b50c6b-4907-292f-b652-6ef2ee8b43f8',
             'full_name': PERSON_SINGLE_QUERY_EXIST,
-            'length': 10
+            'length': 50
         }
     ),
     (
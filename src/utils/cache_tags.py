@@ -0,0 +1,112 @@
+"""Tags of cache keys.
+
+A cache key depending on any entity of a kind, like a window of a film
+list, is added to the Redis set of its tag when it is written, so that
+the cache invalidation drops the members of the set rather than scans
+the keyspace for the keys. A key derived from a single entity, like
+a part of a film or a rendered response, is added to the set
+of the entity.
+"""
+
+import re
+from fnmatch import translate
+
+TAG_PREFIX = 'tag:'
+
+# Patterns of the keys of each tag. `[?]` matches the literal question
+# mark both in Redis and in `fnmatch` patterns.
+TAGGED_KEYS = {
+    'films': (
+        'films:*',
+        'response:/api/v1/films/[?]*',
+        'response:/api/v1/films/batch[?]*',
+        'response:/api/v1/films/search[?]*',
+    ),
+    'person_films': (
+        'person_films:*',
+        'response:/api/v1/persons/*/film[?]*',
+    ),
+    'persons': (
+        'persons:*',
+        'response:/api/v1/persons/batch[?]*',
+        'response:/api/v1/persons/search[?]*',
+    ),
+    'genres': (
+        'genres:*',
+        'response:/api/v1/genres/[?]*',
+    ),
+}
+
+# Patterns of the keys derived from a single entity of each kind
+# by its id, other than the key of the entity itself.
+ENTITY_KEYS = {
+    'film': (
+        'film:{id}:*',
+        'response:/api/v1/films/{id}[?]*',
+    ),
+    'person': (
+        'person:{id}:*',
+        'response:/api/v1/persons/{id}[?]*',
+        'response:/api/v1/persons/{id}/film[?]*',
+    ),
+    'genre': (
+        'response:/api/v1/genres/{id}[?]*',
+    ),
+}
+
+# Ids are UUIDs, so that routes like /films/search are not taken
+# for entities.
+ID_PATTERN = (
+    '(?P<id>[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12})'
+)
+
+_MATCHERS = [
+    (tag, re.compile('|'.join(translate(pattern) for pattern in patterns)))
+    for tag, patterns in TAGGED_KEYS.items()
+]
+
+
+def _compile_entity_pattern(pattern: str) -> re.Pattern:
+    regex = (
+        re.escape(pattern)
+        .replace(re.escape('{id}'), ID_PATTERN)
+        .replace(re.escape('[?]'), re.escape('?'))
+        .replace(re.escape('*'), '.*')
+    )
+
+    return re.compile(regex + r'\Z', re.DOTALL)
+
+
+_ENTITY_MATCHERS = [
+    (entity, _compile_entity_pattern(pattern))
+    for entity, patterns in ENTITY_KEYS.items()
+    for pattern in patterns
+]
+
+
+def tag_key(tag: str) -> str:
+    """Return the key of the set of the keys of a tag."""
+
+    return TAG_PREFIX + tag
+
+
+def entity_tag_key(entity: str, entity_id: str) -> str:
+    """Return the key of the set of the keys derived from an entity."""
+
+    return tag_key(f'{entity}:{entity_id}')
+
+
+def key_tags(cache_key: str) -> list[str]:
+    """Return the keys of the tag sets a cache key belongs to."""
+
+    tags = [
+        tag_key(tag) for tag, matcher in _MATCHERS if matcher.match(cache_key)
+    ]
+
+    for entity, matcher in _ENTITY_MATCHERS:
+        match = matcher.match(cache_key)
+
+        if match is not None:
+            tags.append(entity_tag_key(entity, match['id']))
+
+    return tags
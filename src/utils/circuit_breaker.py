@@ -0,0 +1,164 @@
+"""A circuit breaker failing fast while a backend is unhealthy."""
+
+import time
+from collections import deque
+from typing import Any, Awaitable, Callable
+
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half_open'
+
+
+class CircuitOpenError(Exception):
+    """The call was rejected without reaching the backend."""
+
+    def __init__(self, retry_after: float) -> None:
+        super().__init__(f'Circuit is open, retry in {retry_after:.1f}s')
+        self.retry_after = retry_after
+
+
+class CircuitBreaker:
+    """Stop calling a backend which fails or is slow too often.
+
+    Outcomes of calls are counted in one second buckets over a sliding
+    window. Once the window has enough calls and the share of failed
+    or slow ones reaches its threshold, the circuit opens and calls
+    fail fast with CircuitOpenError. After `open_seconds` the circuit
+    half-opens and lets `probes` calls through: if all of them succeed
+    in time it closes, otherwise it opens again.
+    """
+
+    def __init__(
+        self,
+        is_failure: Callable[[Exception], bool],
+        window_seconds: int = 10,
+        min_calls: int = 20,
+        error_rate: float = 0.5,
+        slow_call_seconds: float = 1.0,
+        slow_call_rate: float = 0.5,
+        open_seconds: float = 10,
+        probes: int = 3,
+        on_change: Callable[[str], None] | None = None
+    ) -> None:
+        self.is_failure = is_failure
+        self.window_seconds = window_seconds
+        self.min_calls = min_calls
+        self.error_rate = error_rate
+        self.slow_call_seconds = slow_call_seconds
+        self.slow_call_rate = slow_call_rate
+        self.open_seconds = open_seconds
+        self.probes = probes
+        self.on_change = on_change
+        self.state = CLOSED
+        # [second, calls, failures, slow calls]
+        self._buckets: deque[list[int]] = deque()
+        self._opened_at = 0.0
+        self._probes_started = 0
+        self._probes_passed = 0
+
+    @property
+    def retry_after(self) -> float:
+        """Seconds until the circuit half-opens."""
+
+        return max(
+            self._opened_at + self.open_seconds - time.monotonic(), 0
+        )
+
+    async def call(
+        self,
+        func: Callable[..., Awaitable[Any]],
+        *args,
+        **kwargs
+    ) -> Any:
+        """Call the backend unless the circuit is open."""
+
+        self._before_call()
+        started = time.monotonic()
+
+        try:
+            result = await func(*args, **kwargs)
+        except Exception as exc:
+            self._record(self.is_failure(exc), time.monotonic() - started)
+            raise
+        except BaseException:
+            # A cancelled probe must give its place to another one.
+            if self.state == HALF_OPEN:
+                self._probes_started -= 1
+            raise
+
+        self._record(False, time.monotonic() - started)
+
+        return result
+
+    def _before_call(self) -> None:
+        if self.state == OPEN:
+            if self.retry_after > 0:
+                raise CircuitOpenError(self.retry_after)
+
+            self._set_state(HALF_OPEN)
+            self._probes_started = 0
+            self._probes_passed = 0
+
+        if self.state == HALF_OPEN:
+            if self._probes_started >= self.probes:
+                raise CircuitOpenError(0)
+
+            self._probes_started += 1
+
+    def _record(self, failed: bool, seconds: float) -> None:
+        slow = seconds >= self.slow_call_seconds
+
+        if self.state == HALF_OPEN:
+            if failed or slow:
+                self._open()
+                return
+
+            self._probes_passed += 1
+
+            if self._probes_passed >= self.probes:
+                self._buckets.clear()
+                self._set_state(CLOSED)
+
+            return
+
+        # A call started before the circuit opened.
+        if self.state == OPEN:
+            return
+
+        second = int(time.monotonic())
+
+        if not self._buckets or self._buckets[-1][0] != second:
+            self._buckets.append([second, 0, 0, 0])
+
+        while self._buckets[0][0] <= second - self.window_seconds:
+            self._buckets.popleft()
+
+        bucket = self._buckets[-1]
+        bucket[1] += 1
+        bucket[2] += failed
+        bucket[3] += slow
+
+        calls = sum(bucket[1] for bucket in self._buckets)
+
+        if calls < self.min_calls:
+            return
+
+        failures = sum(bucket[2] for bucket in self._buckets)
+        slow_calls = sum(bucket[3] for bucket in self._buckets)
+
+        if (
+            failures >= self.error_rate * calls
+            or slow_calls >= self.slow_call_rate * calls
+        ):
+            self._open()
+
+    def _open(self) -> None:
+        self._opened_at = time.monotonic()
+        self._buckets.clear()
+        self._set_state(OPEN)
+
+    def _set_state(self, state: str) -> None:
+        self.state = state
+
+        if self.on_change is not None:
+            self.on_change(state)
@@ -3,3 +3,19 @@ FILM_NOT_FOUND = 'Film not found'
 PERSON_NOT_FOUND = 'Person not found'
 
 GENRE_NOT_FOUND = 'Genre not found'
+
+INVALID_CURSOR = 'Invalid or expired cursor'
+
+ADMIN_TOKEN_REQUIRED = 'Admin token required'
+
+PROFILER_RUNNING = 'Profiler is already running'
+
+SEARCH_UNAVAILABLE = 'Search is temporarily unavailable'
+
+INVALID_FIELDS = 'Unknown fields'
+
+SERVICE_OVERLOADED = 'Too many requests in progress, retry later'
+
+REQUEST_TIMED_OUT = 'Request time budget is spent'
+
+TOO_MANY_REQUESTS = 'Too many requests, retry later'
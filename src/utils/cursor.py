@@ -0,0 +1,148 @@
+"""Cursor pagination with Elasticsearch search_after and point in time.
+
+A cursor carries a fingerprint of the index and the query it pages
+through, so that it is refused for any other search, and is signed
+with CURSOR_SECRET, so that it is refused if made up by a client.
+"""
+
+import base64
+import hmac
+from hashlib import blake2b
+from urllib.parse import urlencode
+
+import orjson
+from elasticsearch import AsyncElasticsearch, BadRequestError, NotFoundError
+
+from core.config import settings
+
+FIRST_PAGE_CURSOR = '*'
+SIGNATURE_SIZE = 16
+
+
+class InvalidCursorError(ValueError):
+    """Raised when a cursor is malformed, made for another search
+    or its point in time expired.
+    """
+
+
+def query_fingerprint(index_name: str, search_query: dict) -> str:
+    """Return a short digest of the index and the query of a search."""
+
+    data = orjson.dumps(
+        [index_name, search_query], option=orjson.OPT_SORT_KEYS
+    )
+
+    return blake2b(data, digest_size=8).hexdigest()
+
+
+def encode_cursor(pit_id: str, search_after: list, fingerprint: str) -> str:
+    """Pack a point in time id, sort values and the fingerprint
+    of the search into an opaque string.
+    """
+
+    data = orjson.dumps(
+        {'pit': pit_id, 'after': search_after, 'query': fingerprint}
+    )
+
+    return base64.urlsafe_b64encode(_sign(data) + data).decode().rstrip('=')
+
+
+def _sign(data: bytes) -> bytes:
+    return blake2b(
+        data, key=settings.CURSOR_SECRET.encode()[:64],
+        digest_size=SIGNATURE_SIZE
+    ).digest()
+
+
+def decode_cursor(cursor: str) -> tuple[str, list, str]:
+    """Unpack a cursor made by `encode_cursor`."""
+
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        raw = base64.urlsafe_b64decode(padded)
+        signature, raw = raw[:SIGNATURE_SIZE], raw[SIGNATURE_SIZE:]
+
+        if not hmac.compare_digest(signature, _sign(raw)):
+            raise InvalidCursorError(cursor)
+
+        data = orjson.loads(raw)
+        return data['pit'], data['after'], data['query']
+    except (ValueError, KeyError, TypeError):
+        raise InvalidCursorError(cursor)
+
+
+def next_page_link(path: str, next_cursor: str | None, **params) -> str | None:
+    """Return the link to the page following the cursor, None on the last
+    page. Parameters which are None are left out.
+    """
+
+    if next_cursor is None:
+        return None
+
+    query = urlencode({
+        **{name: value for name, value in params.items() if value is not None},
+        'cursor': next_cursor,
+    })
+
+    return f'{path}?{query}'
+
+
+async def search_after(
+    elastic: AsyncElasticsearch,
+    index_name: str,
+    search_query: dict,
+    size: int,
+    cursor: str
+) -> tuple[int, list[dict], str | None]:
+    """
+    Return the total, the hits of the page following the cursor
+    and the cursor of the next page, None on the last page.
+    """
+
+    fingerprint = query_fingerprint(index_name, search_query)
+
+    if cursor == FIRST_PAGE_CURSOR:
+        pit = await elastic.open_point_in_time(
+            index=index_name, keep_alive=settings.ES_PIT_KEEP_ALIVE
+        )
+        pit_id, after = pit['id'], None
+    else:
+        pit_id, after, cursor_fingerprint = decode_cursor(cursor)
+
+        if cursor_fingerprint != fingerprint:
+            raise InvalidCursorError(cursor)
+
+    # Elasticsearch appends a shard doc tiebreaker to the sort
+    # of point in time searches, so that hits are totally ordered.
+    body = {
+        'sort': [{'_score': {'order': 'desc'}}],
+        **search_query,
+        'size': size,
+        'pit': {'id': pit_id, 'keep_alive': settings.ES_PIT_KEEP_ALIVE},
+    }
+
+    if after:
+        body['search_after'] = after
+
+    try:
+        result = await elastic.search(body=body)
+    except (NotFoundError, BadRequestError):
+        # The point in time has expired or the sort values do not fit
+        # the query.
+        raise InvalidCursorError(cursor)
+
+    total = result['hits']['total']['value']
+    hits = result['hits']['hits']
+    pit_id = result.get('pit_id', pit_id)
+
+    if len(hits) < size:
+        try:
+            await elastic.close_point_in_time(id=pit_id)
+        except NotFoundError:
+            pass
+
+        return total, hits, None
+
+    return total, hits, encode_cursor(
+        pit_id, hits[-1]['sort'], fingerprint
+    )
@@ -0,0 +1,66 @@
+"""Selection of the fields returned with the `fields` query parameter."""
+
+from http import HTTPStatus
+from typing import Annotated
+
+from fastapi import HTTPException, Query
+from pydantic import BaseModel
+
+from utils.constants import INVALID_FIELDS
+
+
+class FieldsQuery:
+    """A dependency parsing the `fields` query parameter of a model.
+
+    Returns the names of the fields requested, sorted and with `id`
+    always included, or None if all of them are requested.
+    """
+
+    def __init__(self, model: type[BaseModel]) -> None:
+        self.allowed = set(model.__fields__)
+
+    def __call__(
+        self,
+        fields: Annotated[
+            str | None,
+            Query(description='Comma separated fields to return')
+        ] = None
+    ) -> tuple[str, ...] | None:
+        if fields is None:
+            return None
+
+        selected = {
+            field.strip() for field in fields.split(',') if field.strip()
+        }
+        unknown = selected - self.allowed
+
+        if unknown:
+            raise HTTPException(
+                status_code=HTTPStatus.BAD_REQUEST,
+                detail=f'{INVALID_FIELDS}: {", ".join(sorted(unknown))}'
+            )
+
+        return tuple(sorted(selected | {'id'}))
+
+
+def include_fields(fields: tuple[str, ...] | None) -> set[str] | None:
+    """Return the `include` of a model keeping the fields given."""
+
+    return set(fields) if fields is not None else None
+
+
+def include_results(
+    model: type[BaseModel],
+    fields: tuple[str, ...] | None
+) -> dict | None:
+    """Return the `include` of a list model keeping the fields given
+    of its results and all of its other fields.
+    """
+
+    if fields is None:
+        return None
+
+    return {
+        **{name: True for name in model.__fields__ if name != 'results'},
+        'results': {'__all__': set(fields)},
+    }
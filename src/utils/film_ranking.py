@@ -0,0 +1,42 @@
+"""Redis keys of the film rankings kept up to date by the ETL.
+
+The ETL keeps a sorted set of all films and one of each genre scored
+by `imdb_rating`, and a hash of short film payloads by id, so that
+films are listed by rating without querying ElasticSearch. The ready
+key is set once the rankings hold all of the indexed films.
+
+The module is imported by the ETL too and depends on nothing.
+"""
+
+RANKING_KEY = 'film_rating'
+READY_KEY = 'film_rating:ready'
+SHORT_FILMS_KEY = 'film_short'
+# Genre ids of each ranked film, to move it out of the genres it
+# no longer belongs to.
+FILM_GENRES_KEY = 'film_genres'
+
+# Returns the number of films ranked and the payloads of the ranks
+# from ARGV[1] to ARGV[2], or nil if the rankings are not built yet.
+RANKED_FILMS_SCRIPT = """
+if redis.call('EXISTS', KEYS[3]) == 0 then
+    return false
+end
+
+local ids = redis.call('ZREVRANGE', KEYS[1], ARGV[1], ARGV[2])
+local films = {}
+
+if #ids > 0 then
+    films = redis.call('HMGET', KEYS[2], unpack(ids))
+end
+
+return {redis.call('ZCARD', KEYS[1]), films}
+"""
+
+
+def ranking_key(genre_id: str | None = None) -> str:
+    """Return the key of the ranking of a genre, or of all films."""
+
+    if genre_id is None:
+        return RANKING_KEY
+
+    return f'{RANKING_KEY}:genre:{genre_id}'
@@ -0,0 +1,56 @@
+"""Serving pages of any size from cached windows of list results."""
+
+import asyncio
+from typing import Any, Awaitable, Callable
+
+from core.config import settings
+
+WINDOW_SIZE = settings.LIST_CACHE_WINDOW_SIZE
+
+
+def normalize_query(query: str | None) -> str | None:
+    """Return a search query in the form used in cache keys."""
+
+    if query is None:
+        return None
+
+    return ' '.join(query.lower().split())
+
+
+async def get_page(
+    page: int,
+    size: int,
+    get_window: Callable[[int], Awaitable[tuple[int, list[Any]]]]
+) -> tuple[int, list[Any]]:
+    """Return the total and the objects of a page sliced from windows.
+
+    A window is a block of `WINDOW_SIZE` consecutive results,
+    `get_window` returns the total and the objects of a window
+    by its number.
+    """
+
+    start = (page - 1) * size
+    first_window = start // WINDOW_SIZE
+    last_window = (start + size - 1) // WINDOW_SIZE
+    total, objects = await get_window(first_window)
+
+    # The total tells which of the further windows hold any results,
+    # those are loaded at once.
+    last_window = min(last_window, max(total - 1, 0) // WINDOW_SIZE)
+
+    if len(objects) == WINDOW_SIZE and last_window > first_window:
+        windows = await asyncio.gather(*(
+            get_window(window)
+            for window in range(first_window + 1, last_window + 1)
+        ))
+        objects = objects + [
+            obj for _, window_objects in windows for obj in window_objects
+        ]
+
+    offset = start - first_window * WINDOW_SIZE
+    objects = objects[offset:offset + size]
+
+    if not objects:
+        return 0, []
+
+    return total, objects
@@ -0,0 +1,158 @@
+"""Request coalescing for cache misses."""
+
+import asyncio
+from typing import Any, Awaitable, Callable
+
+from redis.asyncio import Redis
+from redis.exceptions import LockError
+
+from core.admission import no_admission
+from core.config import settings
+from core.deadline import no_deadline
+from core.rate_limit import no_rate_limit
+
+
+class SingleFlight:
+    """Run at most one loader per key, other callers await its result.
+
+    A loader runs outside of the request which started it: it is not
+    charged to its client, holds no admission slot of it and goes on
+    after its time budget is spent. Callers check their own limits
+    before they start or join a load.
+
+    If a Redis client is given, the loader additionally runs under
+    a Redis lock, so that workers of other processes wait for the
+    cache to be filled instead of querying the search engine again.
+    """
+
+    def __init__(self, redis: Redis | None = None) -> None:
+        self.redis = redis
+        self._calls: dict[str, asyncio.Task] = {}
+
+    async def do(
+        self,
+        key: str,
+        loader: Callable[[], Awaitable[Any]],
+        recheck: Callable[[], Awaitable[Any]] | None = None
+    ) -> Any:
+        """Return the result of `loader` shared among concurrent callers.
+
+        `recheck` is called after waiting for the Redis lock
+        to pick up a value cached by another worker meanwhile.
+        """
+
+        task = self._calls.get(key)
+
+        if task is None:
+            # The loader runs in its own task, so that a cancelled
+            # caller does not cancel the load for everybody else.
+            task = asyncio.ensure_future(self._run(key, loader, recheck))
+            self._calls[key] = task
+            task.add_done_callback(lambda done: self._forget(key, done))
+
+        return await asyncio.shield(task)
+
+    async def do_many(
+        self,
+        keys: list[str],
+        loader: Callable[[list[str]], Awaitable[dict[str, Any]]]
+    ) -> dict[str, Any]:
+        """Return the results by key of `loader` shared among concurrent
+        callers, of `do` and of this method alike.
+
+        `loader` is called once with the keys not being loaded already
+        and returns the results by key, leaving out the keys which have
+        none. It runs without the Redis lock, as locking many keys
+        at once is prone to deadlocks.
+        """
+
+        batch = [key for key in dict.fromkeys(keys) if key not in self._calls]
+
+        if batch:
+            task = asyncio.ensure_future(self._run_many(batch, loader))
+
+            for key in batch:
+                pick = asyncio.ensure_future(self._pick(task, key))
+                self._calls[key] = pick
+                pick.add_done_callback(
+                    lambda done, key=key: self._forget(key, done)
+                )
+
+        results = await asyncio.shield(
+            asyncio.gather(*(self._calls[key] for key in keys))
+        )
+
+        return {
+            key: result for key, result in zip(keys, results)
+            if result is not None
+        }
+
+    @staticmethod
+    async def _pick(task: asyncio.Task, key: str) -> Any:
+        """Return the result of a batch load for one of its keys."""
+
+        return (await task).get(key)
+
+    async def _run_many(
+        self,
+        keys: list[str],
+        loader: Callable[[list[str]], Awaitable[dict[str, Any]]]
+    ) -> dict[str, Any]:
+        with no_deadline(), no_rate_limit(), no_admission():
+            return await loader(keys)
+
+    def _forget(self, key: str, task: asyncio.Task) -> None:
+        """Drop a finished call so that the next miss loads anew."""
+
+        self._calls.pop(key, None)
+
+        if not task.cancelled():
+            # Mark the exception as retrieved even if every caller
+            # has gone away before the load finished.
+            task.exception()
+
+    async def _run(
+        self,
+        key: str,
+        loader: Callable[[], Awaitable[Any]],
+        recheck: Callable[[], Awaitable[Any]] | None
+    ) -> Any:
+        """Call the loader, under a Redis lock if enabled."""
+
+        with no_deadline(), no_rate_limit(), no_admission():
+            return await self._load(key, loader, recheck)
+
+    async def _load(
+        self,
+        key: str,
+        loader: Callable[[], Awaitable[Any]],
+        recheck: Callable[[], Awaitable[Any]] | None
+    ) -> Any:
+        if self.redis is None:
+            return await loader()
+
+        lock = self.redis.lock(
+            f'lock:{key}',
+            timeout=settings.SINGLE_FLIGHT_LOCK_TIMEOUT,
+            blocking_timeout=settings.SINGLE_FLIGHT_LOCK_TIMEOUT,
+        )
+
+        try:
+            acquired = await lock.acquire()
+        except LockError:
+            acquired = False
+
+        try:
+            if recheck is not None:
+                result = await recheck()
+
+                if result:
+                    return result
+
+            return await loader()
+        finally:
+            if acquired:
+                try:
+                    await lock.release()
+                except LockError:
+                    pass